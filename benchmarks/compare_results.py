@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# vim: set fileencoding=utf-8
+
+# Copyright © 2024 Pavel Tisnovsky
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Comparison of two files with benchmark results, for example from two commits.
+
+Benchmarks are matched by schema, path and all settings. Exit code is 1 when
+throughput of any benchmark dropped by more than the threshold.
+"""
+
+import json
+from argparse import ArgumentParser
+
+# settings that need to be the same to compare two benchmarks
+BENCHMARK_KEYS = ("schema", "path", "messages", "invalid_ratio", "report_size", "compile", "jobs")
+
+
+def load_results(filename):
+    """Load benchmark results indexed by benchmark settings."""
+    with open(filename) as fin:
+        results = json.load(fin)
+    return results.get("commit"), {tuple(r[key] for key in BENCHMARK_KEYS): r
+                                   for r in results["results"]}
+
+
+def relative_change(old, new):
+    """Compute relative change between two values, in percents."""
+    if old is None or new is None or old == 0:
+        return None
+    return 100.0 * (new - old) / old
+
+
+def compare(old_results, new_results, threshold):
+    """Compare matching benchmarks and return list of rows and flag if there is a regression."""
+    rows = []
+    regression = False
+    for key, old in old_results.items():
+        new = new_results.get(key)
+        if new is None:
+            continue
+        throughput = relative_change(old["messages_per_second"], new["messages_per_second"])
+        p99 = relative_change(old["latency_p99"], new["latency_p99"])
+        rss = relative_change(old["peak_rss"], new["peak_rss"])
+        regressed = throughput is not None and throughput < -threshold
+        regression = regression or regressed
+        rows.append((key, throughput, p99, rss, regressed))
+    return rows, regression
+
+
+def format_change(change):
+    """Format relative change for display."""
+    return f"{change:+.1f}%" if change is not None else "n/a"
+
+
+def main():
+    """Compare two files with benchmark results."""
+    parser = ArgumentParser(description="Comparison of two files with benchmark results")
+    parser.add_argument("old", help="results of the baseline")
+    parser.add_argument("new", help="results to compare with the baseline")
+    parser.add_argument("-t", "--threshold", dest="threshold", type=float, default=10.0,
+                        help="maximum allowed drop of throughput in percents")
+    args = parser.parse_args()
+
+    old_commit, old_results = load_results(args.old)
+    new_commit, new_results = load_results(args.new)
+    rows, regression = compare(old_results, new_results, args.threshold)
+
+    print(f"Baseline: {old_commit}, compared: {new_commit}")
+    print(f"{'Schema':<36} {'Path':<17} {'Messages':>10} {'Throughput':>11} {'p99':>9} "
+          f"{'Peak RSS':>9}")
+    for key, throughput, p99, rss, regressed in rows:
+        print(f"{key[0]:<36} {key[1]:<17} {key[2]:>10} {format_change(throughput):>11} "
+              f"{format_change(p99):>9} {format_change(rss):>9}"
+              f"{'  REGRESSION' if regressed else ''}")
+
+    if regression:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
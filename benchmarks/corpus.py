@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+# vim: set fileencoding=utf-8
+
+# Copyright © 2024 Pavel Tisnovsky
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Generators of synthetic corpora of messages for all topic schemas.
+
+Messages are derived from correct messages stored in schemas/test_data. IDs,
+timestamps and numbers are randomized, the number of items in reports (or
+SQS messages) is configurable, and the selected ratio of messages is made
+invalid by replacing one field with a value refused by the schema.
+
+Generated corpora are deterministic for the given seed.
+"""
+
+import datetime
+import json
+import random
+import sys
+import uuid
+from os import path
+
+# directory with schemas and correct messages used as templates
+SCHEMAS_DIR = path.join(path.dirname(path.abspath(__file__)), "..", "schemas")
+TEST_DATA_DIR = path.join(SCHEMAS_DIR, "test_data")
+
+# schema modules with messages stored as JSON, one message per line
+JSON_SCHEMAS = ("ccx_ocp_results", "parquet_input_rule_hits",
+                "platform_upload_announce_messages", "sqs_messages")
+
+# fields that are replaced in invalid messages, together with invalid values
+INVALID_VALUES = {
+    "ccx_ocp_results": (
+        (("OrgID",), -1),
+        (("ClusterName",), "not-an-uuid"),
+        (("LastChecked",), "2020-13-45T00:00:00.000000Z"),
+        (("Report", "system", "hostname"), 42),
+    ),
+    "parquet_input_rule_hits": (
+        (("path",), "archives/compressed/foo.tar.gz"),
+        (("metadata", "cluster_id"), "xyzzy"),
+        (("report", "analysis_metadata", "start"), "yesterday"),
+    ),
+    "platform_upload_announce_messages": (
+        (("size",), -1),
+        (("request_id",), "xyzzy"),
+        (("url",), "http://example.com/"),
+        (("timestamp",), "now"),
+    ),
+    "sqs_messages": (
+        (("ResponseMetadata", "HTTPStatusCode"), -1),
+        (("ResponseMetadata", "RequestId"), "xyzzy"),
+    ),
+}
+
+# all timestamps are generated in this range
+EPOCH = datetime.datetime(2020, 1, 1)
+TIMESTAMP_RANGE = 3 * 365 * 24 * 3600
+
+
+def load_template(schema_name):
+    """Load correct message used as a template for the given schema."""
+    with open(path.join(TEST_DATA_DIR, schema_name + ".json")) as fin:
+        return json.load(fin)
+
+
+def random_uuid(rng):
+    """Generate random UUID version 4 in canonical form."""
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def random_datetime(rng):
+    """Generate random datetime in the supported range."""
+    return EPOCH + datetime.timedelta(seconds=rng.randrange(TIMESTAMP_RANGE),
+                                      microseconds=rng.randrange(1000000))
+
+
+def repeated(items, count):
+    """Construct list with given number of items, repeating the original ones."""
+    if not items:
+        return []
+    return [items[i % len(items)] for i in range(count)]
+
+
+def vary_ccx_ocp_results(message, rng, report_size):
+    """Randomize message for ccx_ocp_results schema."""
+    message["OrgID"] = rng.randrange(1, 100000000)
+    message["ClusterName"] = random_uuid(rng)
+    message["LastChecked"] = random_datetime(rng).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+    message["Report"]["reports"] = repeated(message["Report"]["reports"], report_size)
+
+
+def vary_parquet_input_rule_hits(message, rng, report_size):
+    """Randomize message for parquet_input_rule_hits schema."""
+    cluster_id = random_uuid(rng)
+    collected_at = random_datetime(rng)
+    message["path"] = (f"archives/compressed/{cluster_id[:2]}/{cluster_id}/"
+                       f"{collected_at:%Y%m}/{collected_at:%d}/{collected_at:%H%M%S}.tar.gz")
+    message["metadata"]["cluster_id"] = cluster_id
+    message["metadata"]["external_organization"] = str(rng.randrange(1, 100000000))
+    analysis_metadata = message["report"]["analysis_metadata"]
+    analysis_metadata["start"] = collected_at.isoformat(timespec="microseconds") + "+00:00"
+    finish = collected_at + datetime.timedelta(seconds=1)
+    analysis_metadata["finish"] = finish.isoformat(timespec="microseconds") + "+00:00"
+    message["report"]["reports"] = repeated(message["report"]["reports"], report_size)
+
+
+def vary_platform_upload_announce_messages(message, rng, report_size):
+    """Randomize message for platform_upload_announce_messages schema."""
+    message["account"] = str(rng.randrange(1, 100000000))
+    message["principal"] = str(rng.randrange(1, 100000000))
+    message["request_id"] = f"{rng.getrandbits(128):032x}"
+    message["size"] = rng.randrange(1, 100000000)
+    message["timestamp"] = random_datetime(rng).strftime("%Y-%m-%dT%H:%M:%S.%f") + "123Z"
+
+
+def vary_sqs_messages(message, rng, report_size):
+    """Randomize message for sqs_messages schema."""
+    messages = repeated(message["Messages"], report_size)
+    message["Messages"] = [dict(item, MessageId=random_uuid(rng)) for item in messages]
+    request_id = random_uuid(rng)
+    message["ResponseMetadata"]["RequestId"] = request_id
+    message["ResponseMetadata"]["HTTPHeaders"]["x-amzn-requestid"] = request_id
+
+
+VARY_FUNCTIONS = {
+    "ccx_ocp_results": vary_ccx_ocp_results,
+    "parquet_input_rule_hits": vary_parquet_input_rule_hits,
+    "platform_upload_announce_messages": vary_platform_upload_announce_messages,
+    "sqs_messages": vary_sqs_messages,
+}
+
+
+def invalidate(message, schema_name, rng):
+    """Replace one field in message by value refused by the schema."""
+    keys, value = rng.choice(INVALID_VALUES[schema_name])
+    node = message
+    for key in keys[:-1]:
+        node = node[key]
+    node[keys[-1]] = value
+
+
+def generate_messages(schema_name, count, invalid_ratio=0.0, report_size=1, seed=42):
+    """Generate messages for the given schema.
+
+    Yields tuples with message and flag if the message is valid.
+    """
+    rng = random.Random(seed)
+    template = json.dumps(load_template(schema_name))
+    vary = VARY_FUNCTIONS[schema_name]
+
+    for _ in range(count):
+        # decoding of the template is much faster than deep copy
+        message = json.loads(template)
+        vary(message, rng, report_size)
+        valid = rng.random() >= invalid_ratio
+        if not valid:
+            invalidate(message, schema_name, rng)
+        yield message, valid
+
+
+def write_corpus(filename, schema_name, count, invalid_ratio=0.0, report_size=1, seed=42):
+    """Write messages into file, one message per line, and return number of invalid ones."""
+    invalid = 0
+    with open(filename, "w") as fout:
+        for message, valid in generate_messages(schema_name, count, invalid_ratio,
+                                                report_size, seed):
+            fout.write(json.dumps(message))
+            fout.write("\n")
+            invalid += not valid
+    return invalid
+
+
+def write_rule_hits_parquet(filename, count, invalid_ratio=0.0, seed=42, row_group_size=10000):
+    """Write rule hits into Parquet file readable by parquet package, return number of invalid ones.
+
+    PyArrow is needed to write Parquet files.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    rng = random.Random(seed)
+    columns = {"cluster_id": [], "rule_id": [], "collected_at": [], "archive_path": []}
+    invalid = 0
+    for _ in range(count):
+        cluster_id = random_uuid(rng)
+        collected_at = random_datetime(rng).replace(microsecond=0)
+        columns["cluster_id"].append(cluster_id.encode("ascii"))
+        columns["rule_id"].append(b"pods_check|POD_ISSUE")
+        columns["collected_at"].append(collected_at)
+        columns["archive_path"].append(
+            (f"archives/compressed/{cluster_id[:2]}/{cluster_id}/"
+             f"{collected_at:%Y%m}/{collected_at:%d}/{collected_at:%H%M%S}.tar.gz").encode("ascii"))
+        if rng.random() < invalid_ratio:
+            columns["rule_id"][-1] = b"wrong rule"
+            invalid += 1
+
+    table = pa.table({
+        "cluster_id": pa.array(columns["cluster_id"], pa.binary()),
+        "rule_id": pa.array(columns["rule_id"], pa.binary()),
+        "collected_at": pa.array(columns["collected_at"], pa.timestamp("ms")),
+        "archive_path": pa.array(columns["archive_path"], pa.binary()),
+    })
+    # files without compression and with version 1 data pages are readable
+    # by the parquet package used by validators
+    pq.write_table(table, filename, row_group_size=row_group_size, compression="NONE",
+                   use_dictionary=False, data_page_version="1.0", version="1.0")
+    return invalid
+
+
+def main():
+    """Generate corpus for schema given on command line."""
+    if len(sys.argv) < 4:
+        print("Usage: corpus.py SCHEMA COUNT OUTPUT_FILE [INVALID_RATIO] [REPORT_SIZE]")
+        sys.exit(1)
+
+    schema_name = sys.argv[1]
+    count = int(sys.argv[2])
+    invalid_ratio = float(sys.argv[4]) if len(sys.argv) > 4 else 0.0
+    report_size = int(sys.argv[5]) if len(sys.argv) > 5 else 1
+
+    if schema_name == "parquet_output_rule_hits":
+        invalid = write_rule_hits_parquet(sys.argv[3], count, invalid_ratio)
+    else:
+        invalid = write_corpus(sys.argv[3], schema_name, count, invalid_ratio, report_size)
+    print(f"Generated {count} messages, {invalid} of them invalid")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# vim: set fileencoding=utf-8
+
+# Copyright © 2024 Pavel Tisnovsky
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unit tests for corpus generators and helpers used by benchmarks."""
+
+import importlib
+import json
+
+import pytest
+from compare_results import compare
+from corpus import JSON_SCHEMAS, generate_messages, write_corpus
+from run_benchmarks import LatencyRecorder
+from voluptuous import Invalid
+
+
+@pytest.mark.parametrize("schema_name", JSON_SCHEMAS)
+def test_generate_messages(schema_name):
+    """Check that generated messages are accepted or refused by schema as expected."""
+    schema = importlib.import_module(schema_name).schema
+    invalid = 0
+
+    for message, valid in generate_messages(schema_name, 200, invalid_ratio=0.3, report_size=3):
+        if valid:
+            schema(message)
+        else:
+            invalid += 1
+            with pytest.raises(Invalid):
+                schema(message)
+
+    assert 20 < invalid < 100
+
+
+@pytest.mark.parametrize("schema_name", JSON_SCHEMAS)
+def test_generate_messages_deterministic(schema_name):
+    """Check that the same corpus is generated for the same seed."""
+    first = list(generate_messages(schema_name, 10, 0.5, seed=1))
+    second = list(generate_messages(schema_name, 10, 0.5, seed=1))
+    assert first == second
+
+
+def test_generate_messages_report_size():
+    """Check that reports contain the requested number of items."""
+    for message, _ in generate_messages("ccx_ocp_results", 3, report_size=7):
+        assert len(message["Report"]["reports"]) == 7
+    for message, _ in generate_messages("sqs_messages", 3, report_size=0):
+        assert message["Messages"] == []
+
+
+def test_write_corpus(tmpdir):
+    """Check that corpus is written one message per line."""
+    filename = tmpdir.join("corpus.json")
+    invalid = write_corpus(filename, "platform_upload_announce_messages", 50, 0.5)
+
+    with open(filename) as fin:
+        lines = fin.readlines()
+    assert len(lines) == 50
+    assert all(isinstance(json.loads(line), dict) for line in lines)
+    assert 0 < invalid < 50
+
+
+def test_latency_recorder():
+    """Check percentiles computed by latency recorder with bounded memory."""
+    recorder = LatencyRecorder(size=100)
+    assert recorder.percentile(50) is None
+
+    for i in range(1, 101):
+        recorder.record(i)
+    assert recorder.percentile(50) == 50
+    assert recorder.percentile(99) == 99
+    assert recorder.percentile(100) == 100
+
+    for i in range(1000):
+        recorder.record(i)
+    assert len(recorder.samples) == 100
+    assert recorder.count == 1100
+
+
+def test_compare():
+    """Check detection of regressions between two results."""
+    key = ("ccx_ocp_results", "multiple", 1000, 0.0, 1, False, 1)
+    old = {key: {"messages_per_second": 1000.0, "latency_p99": 0.001, "peak_rss": 100}}
+    new = {key: {"messages_per_second": 800.0, "latency_p99": None, "peak_rss": 100}}
+
+    rows, regression = compare(old, new, 10.0)
+    assert regression
+    assert rows == [(key, -20.0, None, 0.0, True)]
+
+    rows, regression = compare(old, new, 25.0)
+    assert not regression
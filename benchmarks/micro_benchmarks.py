@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# vim: set fileencoding=utf-8
+
+# Copyright © 2024 Pavel Tisnovsky
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Micro-benchmarks comparing optimized validators with their original implementations.
+
+Validators with precompiled patterns, fast paths of UUID and timestamp
+validators, compiled schemas and orjson decoder are measured together with
+baselines that behave the same way (unit tests check that they do). Both
+functions are measured in interleaved rounds, so a temporary slowdown of the
+machine affects both measurements the same way. Just times of one call and
+speedups are printed, nothing is checked.
+"""
+
+import datetime
+import json
+import math
+import re
+import sys
+import timeit
+from argparse import ArgumentParser
+from os import path
+from uuid import UUID
+
+SCHEMAS_DIRECTORY = path.join(path.dirname(path.abspath(__file__)), "..", "schemas")
+sys.path.insert(0, SCHEMAS_DIRECTORY)
+
+import ccx_ocp_results  # noqa: E402
+import parquet_input_rule_hits  # noqa: E402
+import platform_upload_announce_messages  # noqa: E402
+import sqs_messages  # noqa: E402
+from common import JSON_DECODERS  # noqa: E402
+from schema_compiler import compile_schema  # noqa: E402
+from validators import (  # noqa: E402
+    keyValueValidator,
+    md5Validator,
+    ruleFQDNValidator,
+    sha256Validator,
+    timestampValidator,
+    timestampValidatorMs,
+    timestampValidatorNoZ,
+    timestampValidatorOffset,
+    uuidInBytesValidator,
+    uuidValidator,
+)
+from voluptuous import Invalid  # noqa: E402
+
+UUID_VALUE = "90e1013c-a2f6-433b-af13-f7373dafa5ed"
+
+
+def uuid_baseline(value):
+    """Validate UUID the original way, by constructing UUID object."""
+    UUID(value, version=4)
+
+
+def uuid_in_bytes_baseline(value):
+    """Validate UUID stored in bytes the original way, by constructing UUID object."""
+    UUID(value.decode("utf-8"), version=4)
+
+
+def strptime_baseline(timeformat):
+    """Construct validator of timestamps using datetime.strptime."""
+    def validator(value):
+        if len(value) >= 26 and timeformat == "%Y-%m-%dT%H:%M:%S.%f":
+            value = value[0:26]
+        try:
+            datetime.datetime.strptime(value, timeformat)
+        except ValueError:
+            raise Invalid(f"invalid datetime value {value}")
+
+    return validator
+
+
+# validators with precompiled patterns compared with the original
+# implementation that compiled (or looked up) the pattern on every call
+PRECOMPILED_PATTERNS = (
+        (keyValueValidator,
+         lambda value: re.compile(r"[A-Z0-9]+([_][A-Z0-9]+)+").fullmatch(value),
+         "NODES_MINIMUM_REQUIREMENTS_NOT_MET"),
+        (ruleFQDNValidator,
+         lambda value: re.compile(r"([a-zA-Z0-9_]+[.])+[a-z0-9_]+").fullmatch(value),
+         "ccx_rules_ocp.external.rules.nodes_requirements_check.report"),
+        (md5Validator,
+         lambda value: re.fullmatch(r"^[a-f0-9]{32}$", value),
+         "6ad8bd0f6fa8a1f2b94a5f8e2a3c1a53"),
+        (sha256Validator,
+         lambda value: re.fullmatch(r"^[a-fA-F0-9]{64}$", value),
+         "e3b0c44298fc1c149afbf4c8996fb92427ae41e4649b934ca495991b7852b855"),
+        )
+
+# UUID validators with fast path compared with UUID constructor
+UUID_FAST_PATHS = (
+        (uuidValidator, uuid_baseline, UUID_VALUE),
+        (uuidInBytesValidator, uuid_in_bytes_baseline, UUID_VALUE.encode("ascii")),
+        )
+
+# timestamp validators compared with datetime.strptime
+TIMESTAMP_PARSERS = (
+        (timestampValidator, strptime_baseline("%Y-%m-%dT%H:%M:%SZ"), "2020-02-29T23:59:59Z"),
+        (timestampValidatorOffset, strptime_baseline("%Y-%m-%dT%H:%M:%S.%f+00:00"),
+         "2021-01-20T03:10:44.482612+00:00"),
+        (timestampValidatorNoZ, strptime_baseline("%Y-%m-%dT%H:%M:%S"), "2020-02-29T23:59:59"),
+        (timestampValidatorMs, strptime_baseline("%Y-%m-%dT%H:%M:%S.%f"),
+         "2020-12-09T16:17:42.822020204Z"),
+        )
+
+# schemas compiled into specialized validators, with correct messages
+TOPIC_SCHEMAS = (
+        (ccx_ocp_results, "ccx_ocp_results.json"),
+        (parquet_input_rule_hits, "parquet_input_rule_hits.json"),
+        (platform_upload_announce_messages, "platform_upload_announce_messages.json"),
+        (sqs_messages, "sqs_messages.json"),
+        )
+
+
+def measure_per_call(function, baseline, value, number, repeat):
+    """Measure the best time of one call of the function and of the baseline."""
+    timers = (timeit.Timer(lambda: function(value)), timeit.Timer(lambda: baseline(value)))
+    best = [math.inf, math.inf]
+    for _ in range(repeat):
+        for index, timer in enumerate(timers):
+            best[index] = min(best[index], timer.timeit(number=number))
+    return best[0] / number, best[1] / number
+
+
+def print_comparison(name, function, baseline, value, number, repeat):
+    """Measure function and baseline, print times of one call and speedup."""
+    optimized, original = measure_per_call(function, baseline, value, number, repeat)
+    print(f"{name:42} {optimized * 1e9:10.0f} ns {original * 1e9:10.0f} ns "
+          f"{original / optimized:8.2f}x")
+
+
+def load_test_data(filename, mode="r"):
+    """Read message stored in test_data directory."""
+    with open(path.join(SCHEMAS_DIRECTORY, "test_data", filename), mode) as fin:
+        return fin.read()
+
+
+def run_benchmarks(number, repeat):
+    """Run all micro-benchmarks and print their results."""
+    print(f"{'benchmark':42} {'optimized':>13} {'baseline':>13} {'speedup':>9}")
+    for validator, baseline, value in PRECOMPILED_PATTERNS + UUID_FAST_PATHS + TIMESTAMP_PARSERS:
+        print_comparison(validator.__name__, validator, baseline, value, number, repeat)
+
+    # whole messages are much slower to validate than single values
+    for module, filename in TOPIC_SCHEMAS:
+        message = json.loads(load_test_data(filename))
+        print_comparison(f"compiled {module.__name__}", compile_schema(module.schema),
+                         module.schema, message, max(number // 50, 1), repeat)
+
+    if "orjson" in JSON_DECODERS:
+        line = load_test_data("ccx_ocp_results.json", "rb")
+        print_comparison("orjson decoder", JSON_DECODERS["orjson"], json.loads, line,
+                         max(number // 5, 1), repeat)
+
+
+def main():
+    """Entry point to this script."""
+    parser = ArgumentParser(description="Micro-benchmarks of optimized validators")
+    parser.add_argument("-n", "--number", dest="number", type=int, default=10000,
+                        help="number of calls of one validator measured in one round")
+    parser.add_argument("-r", "--repeat", dest="repeat", type=int, default=9,
+                        help="number of interleaved rounds, the best one is used")
+    args = parser.parse_args()
+    run_benchmarks(args.number, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
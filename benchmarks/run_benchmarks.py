@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+# vim: set fileencoding=utf-8
+
+# Copyright © 2024 Pavel Tisnovsky
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmarks of validation of synthetic corpora for all topic schemas.
+
+For each schema and corpus size, the single-message path (one message per
+file), the multiple-message path (one message per line), and, for rule hits
+stored in Parquet files, both the row-based and columnar paths are measured.
+Each benchmark runs in a fresh process, so its peak RSS is not affected by
+other benchmarks.
+
+Results contain throughput in messages per second, p50 and p99 latency of
+one message, and peak RSS. They are stored as JSON together with the
+current commit, so results from different commits can be compared by
+compare_results.py.
+"""
+
+import contextlib
+import importlib
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+from os import path
+
+from corpus import JSON_SCHEMAS, write_corpus, write_rule_hits_parquet
+
+sys.path.insert(0, path.join(path.dirname(path.abspath(__file__)), "..", "schemas"))
+
+import common  # noqa: E402
+from schema_compiler import compile_schema  # noqa: E402
+
+# maximum number of latencies kept to compute percentiles
+RESERVOIR_SIZE = 100000
+
+# schema for rule hits stored in Parquet files
+PARQUET_SCHEMA = "parquet_output_rule_hits"
+
+
+class LatencyRecorder:
+
+    """Recorder of latencies with bounded memory (reservoir sampling)."""
+
+    def __init__(self, size=RESERVOIR_SIZE, seed=42):
+        """Initialize empty recorder."""
+        self.size = size
+        self.samples = []
+        self.count = 0
+        self.rng = random.Random(seed)
+        self.started = None
+
+    def record(self, seconds):
+        """Record one latency."""
+        self.count += 1
+        if len(self.samples) < self.size:
+            self.samples.append(seconds)
+        else:
+            index = self.rng.randrange(self.count)
+            if index < self.size:
+                self.samples[index] = seconds
+
+    def measured_decoder(self, decoder):
+        """Wrap JSON decoder, latency of message starts with its decoding."""
+        def decode(data):
+            self.started = time.perf_counter()
+            return decoder(data)
+
+        return decode
+
+    def measured_schema(self, validator):
+        """Wrap schema, latency of message ends when the validation is finished."""
+        def validate(payload):
+            # messages stored in Parquet files are not decoded
+            started = self.started if self.started is not None else time.perf_counter()
+            try:
+                return validator(payload)
+            finally:
+                self.record(time.perf_counter() - started)
+                self.started = None
+
+        return validate
+
+    def percentile(self, percent):
+        """Compute percentile of recorded latencies by nearest-rank method."""
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        rank = max(int(len(ordered) * percent / 100.0 + 0.5), 1)
+        return ordered[min(rank, len(ordered)) - 1]
+
+
+def peak_rss():
+    """Retrieve peak resident set size of this process in bytes."""
+    # maximum RSS reported by getrusage survives exec on Linux, so it would
+    # include memory used by the parent process before the fresh process was
+    # spawned, high water mark from /proc is reset by exec
+    try:
+        with open("/proc/self/status") as fin:
+            for line in fin:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # the value is in bytes on macOS, but in kilobytes on Linux
+    return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+def load_validator(schema_name, compiled):
+    """Load schema from schema module, compile it when requested."""
+    schema = importlib.import_module(schema_name).schema
+    return compile_schema(schema) if compiled else schema
+
+
+def validate_single_messages(validator, corpus_file, workdir, limit, recorder):
+    """Validate messages from corpus stored one message per file."""
+    filenames = []
+    with open(corpus_file) as fin:
+        for index, line in enumerate(fin):
+            if index >= limit:
+                break
+            filename = path.join(workdir, f"single_{index}.json")
+            with open(filename, "w") as fout:
+                fout.write(line)
+            filenames.append(filename)
+
+    report = {"processed": 0, "valid": 0, "invalid": 0, "error": 0}
+    for filename in filenames:
+        started = time.perf_counter()
+        common.merge_reports(report, common.validate_single_message(validator, filename, False))
+        recorder.record(time.perf_counter() - started)
+    return report
+
+
+def run_benchmark(benchmark):
+    """Run one benchmark and return its results, it is called in a fresh process."""
+    recorder = LatencyRecorder()
+    validator = load_validator(benchmark["schema"], benchmark["compile"])
+    kind = benchmark["path"]
+
+    if kind != "single":
+        common.set_json_decoder(recorder.measured_decoder(common.json_decoder))
+        validator = recorder.measured_schema(validator)
+
+    # messages about invalid data are not interesting for benchmarks
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        started = time.perf_counter()
+        if kind == "single":
+            report = validate_single_messages(validator, benchmark["corpus"],
+                                              benchmark["workdir"], benchmark["messages"],
+                                              recorder)
+        elif kind == "multiple":
+            report = common.validate_multiple_messages(validator, benchmark["corpus"], False,
+                                                       benchmark["jobs"])
+        elif kind == "parquet-rows":
+            report = common.validate_parquet_file(validator, benchmark["corpus"], False)
+        else:
+            # per-row latency is not measured, rows are validated column by column
+            report = common.validate_parquet_file_columnar(
+                    load_validator(benchmark["schema"], False), benchmark["corpus"], False)
+        elapsed = time.perf_counter() - started
+
+    p50 = recorder.percentile(50)
+    p99 = recorder.percentile(99)
+    return {
+        "schema": benchmark["schema"],
+        "path": kind,
+        "messages": report["processed"],
+        "invalid_ratio": benchmark["invalid_ratio"],
+        "report_size": benchmark["report_size"],
+        "compile": benchmark["compile"],
+        "jobs": benchmark["jobs"],
+        "seconds": elapsed,
+        "messages_per_second": report["processed"] / elapsed if elapsed > 0 else None,
+        "latency_p50": p50,
+        "latency_p99": p99,
+        "peak_rss": peak_rss(),
+        "report": report,
+    }
+
+
+def prepare_benchmarks(args, workdir):
+    """Generate corpora and construct list of benchmarks to run."""
+    benchmarks = []
+    for count in args.messages:
+        for schema_name in args.schemas:
+            common_settings = {"schema": schema_name, "messages": count,
+                               "invalid_ratio": args.invalid_ratio,
+                               "report_size": args.report_size,
+                               "compile": args.compile, "jobs": args.jobs,
+                               "workdir": workdir}
+            if schema_name == PARQUET_SCHEMA:
+                corpus = path.join(workdir, f"{schema_name}_{count}.parquet")
+                try:
+                    write_rule_hits_parquet(corpus, count, args.invalid_ratio, args.seed)
+                except ImportError:
+                    print("PyArrow is not installed, Parquet benchmarks are skipped")
+                    continue
+                paths = ("parquet-rows", "parquet-columnar")
+            else:
+                corpus = path.join(workdir, f"{schema_name}_{count}.json")
+                write_corpus(corpus, schema_name, count, args.invalid_ratio, args.report_size,
+                             args.seed)
+                paths = ("single", "multiple")
+
+            for kind in paths:
+                benchmark = dict(common_settings, path=kind, corpus=corpus)
+                # every message is stored in its own file in single-message path
+                if kind == "single":
+                    benchmark["messages"] = min(count, args.single_limit)
+                benchmarks.append(benchmark)
+    return benchmarks
+
+
+def current_commit():
+    """Retrieve hash of the current commit, if available."""
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def cli_arguments():
+    """Retrieve all CLI arguments."""
+    parser = ArgumentParser(description="Benchmarks of validation of synthetic corpora")
+    parser.add_argument("-n", "--messages", dest="messages", nargs="+", type=int,
+                        default=[1000], help="number of messages in corpora (1000 by default)")
+    parser.add_argument("-s", "--schemas", dest="schemas", nargs="+",
+                        default=list(JSON_SCHEMAS) + [PARQUET_SCHEMA],
+                        choices=list(JSON_SCHEMAS) + [PARQUET_SCHEMA],
+                        help="schemas to benchmark (all by default)")
+    parser.add_argument("--invalid-ratio", dest="invalid_ratio", type=float, default=0.0,
+                        help="ratio of invalid messages in corpora")
+    parser.add_argument("--report-size", dest="report_size", type=int, default=1,
+                        help="number of items in reports (or SQS messages) in one message")
+    parser.add_argument("--single-limit", dest="single_limit", type=int, default=1000,
+                        help="maximum number of messages validated by single-message path")
+    parser.add_argument("--seed", dest="seed", type=int, default=42,
+                        help="seed used to generate corpora")
+    parser.add_argument("-c", "--compile", dest="compile", action="store_true", default=False,
+                        help="compile schemas before validation")
+    parser.add_argument("-j", "--jobs", dest="jobs", type=int, default=1,
+                        help="number of worker processes used by multiple-message path")
+    parser.add_argument("-o", "--output", dest="output", default="benchmark_results.json",
+                        help="name of file to store results into")
+    return parser.parse_args()
+
+
+def main():
+    """Run all selected benchmarks and store the results."""
+    args = cli_arguments()
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        benchmarks = prepare_benchmarks(args, workdir)
+        # fresh process for each benchmark to measure its own peak RSS
+        context = multiprocessing.get_context("spawn")
+        for benchmark in benchmarks:
+            with context.Pool(1) as pool:
+                result = pool.apply(run_benchmark, (benchmark,))
+            results.append(result)
+            p99 = result["latency_p99"]
+            print(f"{result['schema']:<36} {result['path']:<17} {result['messages']:>10} msgs "
+                  f"{result['messages_per_second']:>12.1f} msgs/s  "
+                  f"p99: {p99 * 1e6 if p99 is not None else float('nan'):>10.1f} us  "
+                  f"peak RSS: {result['peak_rss'] / 2**20:.1f} MiB")
+
+    with open(args.output, "w") as fout:
+        json.dump({"commit": current_commit(),
+                   "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                   "python": platform.python_version(),
+                   "platform": platform.platform(),
+                   "results": results}, fout, indent=4)
+    print(f"Results stored into {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+# vim: set fileencoding=utf-8
+
+# Copyright © 2024 Pavel Tisnovsky
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Batch variants of validators checking whole columns of values at once.
+
+Every batch validator accepts a sequence of values and returns a mask of
+failures: a bytearray with 1 for each value refused by the corresponding
+scalar validator from the validators module, and 0 for accepted values.
+
+Values of the expected type are packed into one buffer, separated by newline
+characters, and the buffer is matched by one call of a regular expression
+that repeats the pattern for one value. Matching runs in C over the whole
+column, so the cost per value is much lower than a call of scalar validator.
+Values with fixed width (hashes and UUIDs) are checked even faster, block by
+block: values from one block are concatenated and the characters on fixed
+positions are compared with strided slices of the buffer, the other
+characters are removed by bytes.translate. Only blocks that fail are matched
+by the regular expression.
+
+The patterns accept only values surely accepted by the scalar validator, all
+other values (wrong type, newline in value, mismatch) are checked by the
+scalar validator itself, so the mask is always the same as if the scalar
+validator were called for every value.
+"""
+
+import re
+
+from validators import (
+    CEPH_PATH_RE,
+    RULE_ID_IN_BYTES_RE,
+    UUID_RE,
+    hexaString32Validator,
+    md5Validator,
+    pathToCephInBytesValidator,
+    pathToCephValidator,
+    posIntValidator,
+    ruleIDInBytesValidator,
+    timestampValidatorMs,
+    uuidInBytesValidator,
+    uuidValidator,
+)
+
+# number of values in one block checked by strided slices
+BLOCK_SIZE = 1024
+
+HEXA_DIGITS = b"0123456789abcdefABCDEF"
+LOWER_HEXA_DIGITS = b"0123456789abcdef"
+
+# positions of hyphens in UUID in canonical form
+UUID_HYPHENS = (8, 13, 18, 23)
+
+
+def repeated_pattern(pattern, value_type):
+    """Compile pattern matching any number of values, each one followed by newline."""
+    # the pattern for one value must not match newline character itself
+    repeated = "(?:" + pattern + "\n)*"
+    if value_type is bytes:
+        return re.compile(repeated.encode("ascii"))
+    return re.compile(repeated)
+
+
+# timestamps surely accepted by timestampValidatorMs: zero-padded fields,
+# year other than zero and no leap seconds; February 29th is left to the
+# scalar validator, only the first 26 characters are checked by it
+TIMESTAMP_MS_SURE = (r"(?!0000)[0-9]{4}-"
+                     r"(?:(?:0[1-9]|1[0-2])-(?:0[1-9]|1[0-9]|2[0-8])"
+                     r"|(?:0[13-9]|1[0-2])-(?:29|30)|(?:0[13578]|1[02])-31)"
+                     r"T(?:[01][0-9]|2[0-3]):[0-5][0-9]:[0-5][0-9]\.[0-9]{6}[^\n]*")
+
+UUID_PACKED_RE = repeated_pattern(UUID_RE.pattern, str)
+UUID_IN_BYTES_PACKED_RE = repeated_pattern(UUID_RE.pattern, bytes)
+HEXA_STRING_32_PACKED_RE = repeated_pattern(r"[0-9a-fA-F]{32}", str)
+MD5_PACKED_RE = repeated_pattern(r"[a-f0-9]{32}", str)
+TIMESTAMP_MS_PACKED_RE = repeated_pattern(TIMESTAMP_MS_SURE, str)
+RULE_ID_IN_BYTES_PACKED_RE = repeated_pattern(RULE_ID_IN_BYTES_RE.pattern.decode("ascii"), bytes)
+PATH_TO_CEPH_PACKED_RE = repeated_pattern(CEPH_PATH_RE.pattern, str)
+PATH_TO_CEPH_IN_BYTES_PACKED_RE = repeated_pattern(CEPH_PATH_RE.pattern, bytes)
+
+
+def failures(validator, values):
+    """Check values one by one by scalar validator and return mask of failures."""
+    mask = bytearray(len(values))
+    for index, value in enumerate(values):
+        try:
+            validator(value)
+        except Exception:
+            mask[index] = 1
+    return mask
+
+
+def packed_failures(values, value_type, packed_re, validator):
+    """Check values packed into one buffer, values not accepted are checked by validator."""
+    separator = b"\n" if value_type is bytes else "\n"
+    packed = [index for index, value in enumerate(values)
+              if type(value) is value_type and separator not in value]
+    buffer = separator.join([values[index] for index in packed]) + separator
+
+    # values that need to be checked by scalar validator: values that can't
+    # be packed and values not matched by the pattern
+    unsure = bytearray(1 for _ in values)
+    for index in packed:
+        unsure[index] = 0
+
+    match = packed_re.match
+    position = 0
+    record = 0
+    while record < len(packed):
+        end = match(buffer, position).end()
+        # all records up to the end of the match have been accepted
+        record += buffer.count(separator, position, end)
+        if record >= len(packed):
+            break
+        # skip the record that was not matched
+        index = packed[record]
+        unsure[index] = 1
+        position = end + len(values[index]) + 1
+        record += 1
+
+    mask = bytearray(len(values))
+    position = unsure.find(1)
+    while position >= 0:
+        try:
+            validator(values[position])
+        except Exception:
+            mask[position] = 1
+        position = unsure.find(1, position + 1)
+    return mask
+
+
+def fixed_width_valid(values, value_type, width, hyphens, alphabet):
+    """Check if all values have given type and width and consist of hyphens and alphabet only."""
+    if set(map(type, values)) != {value_type} or set(map(len, values)) != {width}:
+        return False
+    if value_type is bytes:
+        buffer = b"".join(values)
+    else:
+        try:
+            buffer = "".join(values).encode("ascii")
+        except UnicodeEncodeError:
+            return False
+
+    # hyphens on expected positions in all values
+    for position in hyphens:
+        if buffer[position::width] != b"-" * len(values):
+            return False
+    # and no other characters than the ones from alphabet
+    return len(buffer.translate(None, alphabet)) == len(hyphens) * len(values)
+
+
+def fixed_width_failures(values, value_type, width, hyphens, alphabet, packed_re, validator):
+    """Check values with fixed width block by block, blocks that fail are matched by pattern."""
+    mask = bytearray(len(values))
+    for start in range(0, len(values), BLOCK_SIZE):
+        block = values[start:start + BLOCK_SIZE]
+        if not fixed_width_valid(block, value_type, width, hyphens, alphabet):
+            mask[start:start + len(block)] = packed_failures(block, value_type, packed_re,
+                                                             validator)
+    return mask
+
+
+def posInt(values):
+    """Check values by posIntValidator, return mask of failures."""
+    return bytearray(type(value) is not int or value <= 0 for value in values)
+
+
+def hexaString32(values):
+    """Check values by hexaString32Validator, return mask of failures."""
+    return fixed_width_failures(values, str, 32, (), HEXA_DIGITS,
+                                HEXA_STRING_32_PACKED_RE, hexaString32Validator)
+
+
+def md5(values):
+    """Check values by md5Validator, return mask of failures."""
+    return fixed_width_failures(values, str, 32, (), LOWER_HEXA_DIGITS,
+                                MD5_PACKED_RE, md5Validator)
+
+
+def uuid(values):
+    """Check values by uuidValidator, return mask of failures."""
+    return fixed_width_failures(values, str, 36, UUID_HYPHENS, HEXA_DIGITS,
+                                UUID_PACKED_RE, uuidValidator)
+
+
+def uuidInBytes(values):
+    """Check values by uuidInBytesValidator, return mask of failures."""
+    return fixed_width_failures(values, bytes, 36, UUID_HYPHENS, HEXA_DIGITS,
+                                UUID_IN_BYTES_PACKED_RE, uuidInBytesValidator)
+
+
+def timestampMs(values):
+    """Check values by timestampValidatorMs, return mask of failures."""
+    return packed_failures(values, str, TIMESTAMP_MS_PACKED_RE, timestampValidatorMs)
+
+
+def ruleIDInBytes(values):
+    """Check values by ruleIDInBytesValidator, return mask of failures."""
+    return packed_failures(values, bytes, RULE_ID_IN_BYTES_PACKED_RE, ruleIDInBytesValidator)
+
+
+def pathToCeph(values):
+    """Check values by pathToCephValidator, return mask of failures."""
+    return packed_failures(values, str, PATH_TO_CEPH_PACKED_RE, pathToCephValidator)
+
+
+def pathToCephInBytes(values):
+    """Check values by pathToCephInBytesValidator, return mask of failures."""
+    return packed_failures(values, bytes, PATH_TO_CEPH_IN_BYTES_PACKED_RE,
+                           pathToCephInBytesValidator)
+
+
+# batch variants of scalar validators
+BATCH_VALIDATORS = {
+    posIntValidator: posInt,
+    hexaString32Validator: hexaString32,
+    md5Validator: md5,
+    uuidValidator: uuid,
+    uuidInBytesValidator: uuidInBytes,
+    timestampValidatorMs: timestampMs,
+    ruleIDInBytesValidator: ruleIDInBytes,
+    pathToCephValidator: pathToCeph,
+    pathToCephInBytesValidator: pathToCephInBytes,
+}
+
+
+def batch_failures(validator, values):
+    """Check values by batch variant of validator when it exists, return mask of failures."""
+    batch = BATCH_VALIDATORS.get(validator)
+    if batch is None:
+        return failures(validator, values)
+    return batch(values)
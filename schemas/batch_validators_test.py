@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# vim: set fileencoding=utf-8
+
+# Copyright © 2024 Pavel Tisnovsky
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unit tests for batch_validators module."""
+
+import pytest
+from batch_validators import (
+    BATCH_VALIDATORS,
+    BLOCK_SIZE,
+    UUID_PACKED_RE,
+    batch_failures,
+    failures,
+    packed_failures,
+)
+from validators import (
+    hexaString32Validator,
+    intTypeValidator,
+    uuidValidator,
+)
+
+UUID = "123e4567-e89b-12d3-a456-426614174000"
+MD5 = "0123456789abcdef0123456789abcdef"
+PATH = "archives/compressed/00/00000000-0000-0000-0000-000000000000/202102/08/002219.tar.gz"
+
+# values accepted and refused by the validators, including values of wrong types
+# and values that are accepted by scalar validators in unusual forms
+VALUES = [
+    # integers
+    1, 42, 0, -1, True, False, 2**70, 1.0, None,
+    # UUIDs
+    UUID, UUID.upper(), "{" + UUID + "}", "urn:uuid:" + UUID, UUID.replace("-", ""),
+    UUID[:-1], UUID + "0", UUID + "\n", "\n" + UUID, UUID[:8] + "_" + UUID[9:],
+    UUID[:10] + "٣" + UUID[11:], UUID.encode("ascii"), UUID.upper().encode("ascii"),
+    b"{" + UUID.encode("ascii") + b"}", UUID.encode("ascii") + b"\n",
+    # hashes
+    MD5, MD5.upper(), MD5[:-1], MD5 + "0", MD5[:-1] + "g", MD5 + "\n", MD5[:-1] + "٣",
+    MD5.encode("ascii"),
+    # timestamps
+    "2020-12-09T16:17:42.822020", "2020-12-09T16:17:42.822020204Z", "2020-12-31T00:00:00.000000",
+    "2020-11-31T00:00:00.000000", "2020-02-29T00:00:00.000000", "2021-02-29T00:00:00.000000",
+    "1900-02-29T00:00:00.000000", "2000-02-29T00:00:00.000000", "2020-04-30T23:59:59.999999",
+    "0000-01-01T00:00:00.000000", "2020-1-9T1:2:3.4", "2020-01-01T00:00:60.000000",
+    "2020-01-01t00:00:00.000000", "2020-01-01T24:00:00.000000", "2020-13-01T00:00:00.000000",
+    "2020-01-01T00:00:00.000000\n", "2020-01-01T00:00:00", "2020-01-01T00:00:00.000000",
+    # rule IDs and paths
+    b"ccx_rules_ocp.external.rules.nodes_kubelet_version_check|NODE_KUBELET_VERSION",
+    b"ccx_rules_ocp|NODE_KUBELET_VERSION", b"ccx_rules|node", b"\xff|\xfe", b"rule|\nKEY_X",
+    PATH, PATH.encode("ascii"), PATH[:-1], PATH + "\n", PATH.replace("00/", "0g/", 1),
+    # empty and other values
+    "", b"", "\n", [], {}, "٣",
+]
+
+
+@pytest.mark.parametrize("validator", list(BATCH_VALIDATORS))
+def test_batch_validators_same_as_scalar_ones(validator):
+    """Check that batch validators refuse the same values as scalar validators."""
+    batch = BATCH_VALIDATORS[validator]
+    assert batch(VALUES) == failures(validator, VALUES)
+    assert batch([]) == bytearray()
+
+
+@pytest.mark.parametrize("validator", list(BATCH_VALIDATORS))
+def test_batch_validators_single_values(validator):
+    """Check batch validators with columns containing just one value."""
+    batch = BATCH_VALIDATORS[validator]
+    for value in VALUES:
+        assert batch([value]) == failures(validator, [value]), value
+
+
+@pytest.mark.parametrize("validator", list(BATCH_VALIDATORS))
+def test_batch_validators_more_blocks(validator):
+    """Check batch validators with columns that are checked in more blocks."""
+    batch = BATCH_VALIDATORS[validator]
+    for value in VALUES:
+        values = [value] * (2 * BLOCK_SIZE + 1)
+        # some values are different in each block
+        values[0] = VALUES[0]
+        values[BLOCK_SIZE + 7] = VALUES[10]
+        values[-1] = VALUES[20]
+        assert batch(values) == failures(validator, values), value
+
+
+def test_packed_failures_skips_refused_values():
+    """Check that values refused by the pattern are checked by scalar validator."""
+    calls = []
+
+    def validator(value):
+        calls.append(value)
+        uuidValidator(value)
+
+    values = [UUID, "foo", UUID, "{" + UUID + "}", UUID, 42]
+    assert packed_failures(values, str, UUID_PACKED_RE, validator) == bytearray(
+        [0, 1, 0, 0, 0, 1])
+    # just values not matched by the pattern were checked by the validator
+    assert calls == ["foo", "{" + UUID + "}", 42]
+
+
+def test_batch_failures_without_batch_validator():
+    """Check that validators without batch variant are called for every value."""
+    values = [1, "1", None, 0]
+    assert intTypeValidator not in BATCH_VALIDATORS
+    assert batch_failures(intTypeValidator, values) == bytearray([0, 1, 1, 0])
+    assert batch_failures(hexaString32Validator, [MD5, "x"]) == bytearray([0, 1])
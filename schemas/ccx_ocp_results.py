@@ -17,7 +17,19 @@
 
 """Validator for messages stored in ccx.ocp.results topic."""
 
-from common import cli_arguments, print_report, validate_multiple_messages, validate_single_message
+from common import (
+    checkpoint_from_arguments,
+    cli_arguments,
+    max_errors_from_arguments,
+    prepare_validator,
+    print_profile,
+    print_report,
+    sampler_from_arguments,
+    sink_from_arguments,
+    validate_multiple_messages,
+    validate_single_message,
+)
+from validation_daemon import kafka_consumer, serve
 from validators import (
     keyValueValidator,
     posIntValidator,
@@ -99,46 +111,70 @@ passSchema = Schema(
         {
             })
 
+# Sub-schemas validated repeatedly for the same data, because the same rule
+# fires with the same details on many clusters
+memoized_schemas = (reportsSchema, skipsSchema, infoSchema)
+
+# Schema for "Report" node, the same report is stored in RDS
+reportSchema = Schema(
+        {
+            Required("system"): Schema(
+                {
+                    Required("metadata"): dict,
+                    Required("hostname"): Any(None, str),
+                }, extra=ALLOW_EXTRA),
+            Required("reports"): [reportsSchema],
+            Required("fingerprints"): [fingerprintsSchema],
+            Required("skips"): [skipsSchema],
+            Required("info"): [infoSchema],
+            Optional("pass"): [passSchema],
+         })
+
 # Schema for messages consumed from ccx.ocp.results Kafka topic
 schema = Schema(
         {
             Required("OrgID"): posIntValidator,
             Required("ClusterName"): uuidValidator,
             Required("LastChecked"): timestampValidatorMs,
-            Required("Report"): Schema(
-                {
-                    Required("system"): Schema(
-                        {
-                            Required("metadata"): dict,
-                            Required("hostname"): Any(None, str),
-                        }, extra=ALLOW_EXTRA),
-                    Required("reports"): [reportsSchema],
-                    Required("fingerprints"): [fingerprintsSchema],
-                    Required("skips"): [skipsSchema],
-                    Required("info"): [infoSchema],
-                    Optional("pass"): [passSchema],
-                 }),
+            Required("Report"): reportSchema,
             })
 
 
 def main():
     """Entry point to this script."""
     # Parse all CLI arguments.
-    args = cli_arguments()
+    args = cli_arguments(serve_mode=True, memoize=True)
     verbose = args.verbose
     multiple = args.multiple
     input_file = args.input
 
-    if multiple:
+    # validator is compiled and measured according to CLI arguments
+    validator = prepare_validator(schema, "ccx_ocp_results", args, memoized_schemas)
+
+    if args.serve:
+        # validate messages consumed from Kafka topic until interrupted
+        consumer = kafka_consumer(args.bootstrap_server, args.topic, args.group_id)
+        report = serve(validator, consumer, verbose, args.batch_size,
+                       sink=sink_from_arguments(args))
+    elif multiple:
         # process multiple messages stored in one input file
-        report = validate_multiple_messages(schema, input_file, verbose)
+        report = validate_multiple_messages(validator, input_file, verbose, args.jobs,
+                                            checkpoint_from_arguments(args),
+                                            args.dedup_cache,
+                                            max_errors_from_arguments(args),
+                                            sampler_from_arguments(args),
+                                            sink_from_arguments(args))
     else:
         # process single message stored in one input file
-        report = validate_single_message(schema, input_file, verbose)
+        report = validate_single_message(validator, input_file, verbose,
+                                         sink_from_arguments(args))
 
     # print report from schema validation
     print_report(report, args.nocolors)
 
+    # print profile of validation when requested
+    print_profile(args)
+
 
 if __name__ == "__main__":
     main()
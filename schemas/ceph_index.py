@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+# vim: set fileencoding=utf-8
+
+# Copyright © 2024 Pavel Tisnovsky
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Index of archives stored in Ceph bucket, built from paths to archives.
+
+Paths to archives (archives/compressed/<selector>/<cluster>/<yyyymm>/<dd>/<n>.tar.gz)
+are parsed into their components by one regular expression. The index is
+stored in SQLite database, in a table ordered by cluster and date, so archives
+of one cluster in one month or day are found without reading Parquet files
+again. Cluster UUID is stored as 16 bytes and the date as numbers, the path
+is reconstructed from components when it is retrieved.
+
+Parquet files are indexed column by column, one row group at a time. The
+index remembers size and modification time of indexed files, and files that
+have not been changed since they were indexed are skipped.
+"""
+
+import os
+import re
+import sqlite3
+from argparse import ArgumentParser
+from collections import namedtuple
+
+from common import read_parquet_row_groups
+from validators import (
+    CEPH_PATH_DAY,
+    CEPH_PATH_MONTH,
+    CEPH_PATH_PREFIX,
+    CEPH_PATH_SELECTOR,
+    CEPH_PATH_SEQUENCE,
+    CEPH_PATH_SUFFIX,
+    CEPH_PATH_UUID,
+)
+
+# the same paths are accepted as by pathToCephValidator, components are captured
+CEPH_PATH_COMPONENTS_RE = re.compile(
+        CEPH_PATH_PREFIX +
+        "/".join((f"(?P<selector>{CEPH_PATH_SELECTOR})",
+                  f"(?P<cluster>{CEPH_PATH_UUID})",
+                  f"(?P<month>{CEPH_PATH_MONTH})",
+                  f"(?P<day>{CEPH_PATH_DAY})",
+                  f"(?P<sequence>{CEPH_PATH_SEQUENCE})")) +
+        CEPH_PATH_SUFFIX)
+CEPH_PATH_COMPONENTS_IN_BYTES_RE = re.compile(CEPH_PATH_COMPONENTS_RE.pattern.encode("ascii"))
+
+# components of path to archive, all of them are strings
+CephPath = namedtuple("CephPath", ["selector", "cluster", "month", "day", "sequence"])
+
+# name of Parquet column with paths to archives
+ARCHIVE_PATH_COLUMN = "archive_path"
+
+INDEX_TABLES = (
+        """
+        CREATE TABLE IF NOT EXISTS archives (
+            cluster  BLOB NOT NULL,
+            month    INTEGER NOT NULL,
+            day      INTEGER NOT NULL,
+            sequence TEXT NOT NULL,
+            selector TEXT NOT NULL,
+            PRIMARY KEY (cluster, month, day, sequence, selector)
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS sources (
+            path     TEXT PRIMARY KEY,
+            size     INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL
+        )
+        """,
+        )
+
+
+def parse_ceph_path(value):
+    """Parse path to archive (string or bytes) into its components, None if it is not valid."""
+    if type(value) is str:
+        match = CEPH_PATH_COMPONENTS_RE.fullmatch(value)
+        return None if match is None else CephPath(*match.groups())
+    try:
+        match = CEPH_PATH_COMPONENTS_IN_BYTES_RE.fullmatch(value)
+    except TypeError:
+        # values of other types (None in Parquet columns) are never valid paths
+        return None
+    if match is None:
+        return None
+    # just ASCII characters are matched by the pattern
+    return CephPath(*(component.decode("ascii") for component in match.groups()))
+
+
+def ceph_path(components):
+    """Construct path to archive from its components."""
+    return (f"{CEPH_PATH_PREFIX}{components.selector}/{components.cluster}/"
+            f"{components.month}/{components.day}/{components.sequence}.tar.gz")
+
+
+def cluster_key(cluster):
+    """Convert cluster UUID into the form stored in index."""
+    return bytes.fromhex(cluster.replace("-", ""))
+
+
+def index_row(components):
+    """Convert components of path into row stored in index."""
+    return (cluster_key(components.cluster), int(components.month), int(components.day),
+            components.sequence, components.selector)
+
+
+def row_components(row):
+    """Convert row stored in index back into components of path."""
+    cluster, month, day, sequence, selector = row
+    cluster = cluster.hex()
+    cluster = "-".join((cluster[:8], cluster[8:12], cluster[12:16], cluster[16:20],
+                        cluster[20:]))
+    return CephPath(selector, cluster, f"{month:06}", f"{day:02}", sequence)
+
+
+class CephIndex:
+
+    """Index of archives stored in SQLite database."""
+
+    def __init__(self, filename):
+        """Open the index, it is created when it does not exist."""
+        self.connection = sqlite3.connect(filename)
+        with self.connection:
+            for table in INDEX_TABLES:
+                self.connection.execute(table)
+
+    def __enter__(self):
+        """Use the index as a context manager."""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Close the index when leaving the context."""
+        self.close()
+
+    def close(self):
+        """Close the database."""
+        self.connection.close()
+
+    def add_paths(self, values):
+        """Add paths to archives into index, return numbers of new archives and invalid values.
+
+        Paths are usually repeated many times (once for every rule hit), so
+        every distinct path is parsed and stored just once.
+        """
+        rows = set()
+        invalid = set()
+        for value in set(values):
+            components = parse_ceph_path(value)
+            if components is None:
+                invalid.add(value)
+            else:
+                rows.add(index_row(components))
+        changes = self.connection.total_changes
+        with self.connection:
+            self.connection.executemany("INSERT OR IGNORE INTO archives VALUES (?, ?, ?, ?, ?)",
+                                        rows)
+        # invalid values are counted in all rows they are stored in
+        invalid_rows = sum(1 for value in values if value in invalid) if invalid else 0
+        return self.connection.total_changes - changes, invalid_rows
+
+    def is_indexed(self, input_file):
+        """Check if the file has been indexed and not changed since then."""
+        stat = os.stat(input_file)
+        stored = self.connection.execute("SELECT size, mtime_ns FROM sources WHERE path = ?",
+                                         (os.path.abspath(input_file),)).fetchone()
+        return stored == (stat.st_size, stat.st_mtime_ns)
+
+    def add_parquet_file(self, input_file, column=ARCHIVE_PATH_COLUMN):
+        """Add paths to archives from Parquet file into index, unless it's indexed already.
+
+        Returned report contains numbers of rows, archives that were not in
+        the index yet and rows with invalid paths, or it is None when the
+        file was skipped.
+        """
+        if self.is_indexed(input_file):
+            return None
+        stat = os.stat(input_file)
+        report = {"rows": 0, "archives": 0, "invalid": 0}
+        for (values,) in read_parquet_row_groups(input_file, [column]):
+            archives, invalid = self.add_paths(values)
+            report["rows"] += len(values)
+            report["archives"] += archives
+            report["invalid"] += invalid
+        with self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO sources VALUES (?, ?, ?)",
+                                    (os.path.abspath(input_file), stat.st_size,
+                                     stat.st_mtime_ns))
+        return report
+
+    def archives(self, cluster, month=None, day=None):
+        """Retrieve paths to archives of cluster, optionally from given month (yyyymm) and day."""
+        query = "SELECT * FROM archives WHERE cluster = ?"
+        parameters = [cluster_key(cluster)]
+        if month is not None:
+            query += " AND month = ?"
+            parameters.append(int(month))
+        if day is not None:
+            query += " AND day = ?"
+            parameters.append(int(day))
+        # sequence numbers are stored as strings to keep leading zeros in paths,
+        # but they are ordered as numbers
+        rows = self.connection.execute(
+                query + " ORDER BY month, day, CAST(sequence AS INTEGER), sequence", parameters)
+        return [ceph_path(row_components(row)) for row in rows]
+
+
+def cli_arguments(args=None):
+    """Retrieve all CLI arguments."""
+    parser = ArgumentParser(description="Index of archives stored in Ceph bucket")
+    parser.add_argument("index", help="name of SQLite file with index")
+    parser.add_argument("-i", "--input", dest="input", nargs="+", default=[],
+                        help="Parquet files with paths to archives to be added into index")
+    parser.add_argument("--cluster", dest="cluster", default=None,
+                        help="print paths to archives of cluster with given UUID")
+    parser.add_argument("--month", dest="month", default=None, type=int,
+                        help="select archives from given month (YYYYMM)")
+    parser.add_argument("--day", dest="day", default=None, type=int,
+                        help="select archives from given day of month")
+    args = parser.parse_args(args)
+    if (args.month is not None or args.day is not None) and args.cluster is None:
+        parser.error("--month and --day can be used with --cluster only")
+    return args
+
+
+def main():
+    """Entry point to this script."""
+    args = cli_arguments()
+
+    with CephIndex(args.index) as index:
+        # add paths from Parquet files
+        for input_file in args.input:
+            report = index.add_parquet_file(input_file)
+            if report is None:
+                print(f"{input_file}: already indexed")
+            else:
+                print(f"{input_file}: {report['rows']} rows, {report['archives']} new archives, "
+                      f"{report['invalid']} invalid paths")
+
+        # print paths to selected archives
+        if args.cluster is not None:
+            for archive in index.archives(args.cluster, args.month, args.day):
+                print(archive)
+
+
+if __name__ == "__main__":
+    main()
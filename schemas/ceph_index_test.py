@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# vim: set fileencoding=utf-8
+
+# Copyright © 2024 Pavel Tisnovsky
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unit tests for ceph_index module."""
+
+import os
+import re
+import shutil
+import sys
+from os import path
+
+import pytest
+from ceph_index import (
+    CEPH_PATH_COMPONENTS_RE,
+    CephIndex,
+    CephPath,
+    ceph_path,
+    cli_arguments,
+    main,
+    parse_ceph_path,
+)
+from validators import CEPH_PATH_RE, pathToCephValidator
+from voluptuous import Invalid
+
+CLUSTER = "123e4567-e89b-12d3-a456-426614174000"
+OTHER_CLUSTER = "ff32df5f-1234-4567-89ab-61ff59fb8298"
+
+PATH = f"archives/compressed/12/{CLUSTER}/202102/08/002219.tar.gz"
+
+# paths refused by pathToCephValidator
+wrong_paths = (
+        "",
+        PATH[:-1],
+        PATH + "\n",
+        PATH.upper(),
+        PATH.replace("/12/", "/1/"),
+        PATH.replace("202102", "20212"),
+        PATH.replace("/08/", "/8/"),
+        PATH.replace("002219", ""),
+        PATH.replace("archives/", "archive/"),
+        PATH.replace(CLUSTER, CLUSTER[:-1]),
+        PATH.replace("0", "٠"),
+        )
+
+
+def test_parse_ceph_path():
+    """Check that components of path are parsed from strings and bytes."""
+    expected = CephPath("12", CLUSTER, "202102", "08", "002219")
+    assert parse_ceph_path(PATH) == expected
+    assert parse_ceph_path(PATH.encode("ascii")) == expected
+    assert parse_ceph_path(memoryview(PATH.encode("ascii"))) == expected
+    assert ceph_path(expected) == PATH
+
+
+@pytest.mark.parametrize("value", wrong_paths)
+def test_parse_ceph_path_wrong_paths(value):
+    """Check that paths refused by validator can't be parsed."""
+    with pytest.raises(Invalid):
+        pathToCephValidator(value)
+    assert parse_ceph_path(value) is None
+    assert parse_ceph_path(value.encode("utf-8")) is None
+
+
+@pytest.mark.parametrize("value", (None, 42, []))
+def test_parse_ceph_path_wrong_types(value):
+    """Check that values of other types are not paths."""
+    assert parse_ceph_path(value) is None
+
+
+def archive(cluster, month, day, sequence):
+    """Construct path to archive."""
+    return f"archives/compressed/{cluster[:2]}/{cluster}/{month}/{day}/{sequence}.tar.gz"
+
+
+# paths to archives stored in index, the last one twice
+indexed_paths = [
+        archive(CLUSTER, "202103", "02", "000001"),
+        archive(CLUSTER, "202102", "28", "235959"),
+        archive(CLUSTER, "202103", "01", "120000"),
+        archive(CLUSTER, "202103", "01", "000000"),
+        archive(OTHER_CLUSTER, "202103", "01", "000000"),
+        archive(OTHER_CLUSTER, "202103", "01", "000000").encode("ascii"),
+        ]
+
+
+def test_index_archives(tmpdir):
+    """Check that archives are found by cluster and date."""
+    filename = str(tmpdir.join("index.db"))
+    with CephIndex(filename) as index:
+        assert index.add_paths(indexed_paths + [b"foo", None, b"foo"]) == (5, 3)
+        # the same archives are not added again
+        assert index.add_paths(indexed_paths[:2]) == (0, 0)
+
+    # index is stored in file
+    with CephIndex(filename) as index:
+        assert index.archives(CLUSTER) == [indexed_paths[i] for i in (1, 3, 2, 0)]
+        assert index.archives(CLUSTER, 202103) == [indexed_paths[i] for i in (3, 2, 0)]
+        assert index.archives(CLUSTER, "202103", "01") == [indexed_paths[i] for i in (3, 2)]
+        assert index.archives(CLUSTER, 202104) == []
+        assert index.archives(OTHER_CLUSTER) == [indexed_paths[4]]
+        assert index.archives("00000000-0000-0000-0000-000000000000") == []
+
+
+def test_index_archives_sequence_order(tmpdir):
+    """Check that sequence numbers without leading zeros are ordered as numbers."""
+    paths = [archive(CLUSTER, "202103", "01", sequence) for sequence in ("10", "9", "2")]
+    with CephIndex(str(tmpdir.join("index.db"))) as index:
+        index.add_paths(paths)
+        assert index.archives(CLUSTER) == paths[::-1]
+
+
+def test_components_pattern():
+    """Check that components are captured from the pattern used by pathToCephValidator."""
+    pattern = re.sub(r"\(\?P<[a-z]+>(.*?)\)(?=/|\\)", r"\1", CEPH_PATH_COMPONENTS_RE.pattern)
+    assert pattern == CEPH_PATH_RE.pattern
+
+
+def path_to_parquet(filename):
+    """Get a real path to Parquet file with data."""
+    return path.join(path.dirname(__file__), "test_data", filename)
+
+
+def test_index_parquet_file(tmpdir):
+    """Check that paths are indexed from Parquet file, unless it's indexed already."""
+    input_file = str(tmpdir.join("rule_hits.parquet"))
+    shutil.copyfile(path_to_parquet("rule_hits.parquet"), input_file)
+
+    with CephIndex(str(tmpdir.join("index.db"))) as index:
+        assert index.add_parquet_file(input_file) == {"rows": 10, "archives": 1, "invalid": 1}
+        assert index.add_parquet_file(input_file) is None
+        assert index.archives(CLUSTER, 202102, 8) == [PATH]
+
+        # changed files are indexed again
+        stat = os.stat(input_file)
+        os.utime(input_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+        assert index.add_parquet_file(input_file) == {"rows": 10, "archives": 0, "invalid": 1}
+
+
+def test_cli_arguments():
+    """Check that date can be selected for cluster only."""
+    args = cli_arguments(["index.db", "--cluster", CLUSTER, "--month", "202102"])
+    assert args.month == 202102
+    with pytest.raises(SystemExit):
+        cli_arguments(["index.db", "--month", "202102"])
+
+
+def test_main(tmpdir, capsys, monkeypatch):
+    """Test the main function building and querying index."""
+    filename = str(tmpdir.join("index.db"))
+    input_file = path_to_parquet("rule_hits.parquet")
+
+    monkeypatch.setattr(sys, "argv", ["ceph_index.py", filename, "-i", input_file])
+    main()
+    assert capsys.readouterr().out == f"{input_file}: 10 rows, 1 new archives, 1 invalid paths\n"
+
+    monkeypatch.setattr(sys, "argv", ["ceph_index.py", filename, "-i", input_file,
+                                      "--cluster", CLUSTER, "--month", "202102"])
+    main()
+    assert capsys.readouterr().out == f"{input_file}: already indexed\n{PATH}\n"
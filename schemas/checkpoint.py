@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# vim: set fileencoding=utf-8
+
+# Copyright © 2024 Pavel Tisnovsky
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Checkpoints of validation of big input files with one message per line.
+
+Checkpoint file contains the byte offset of the first line that has not been
+validated yet, together with counters of processed, valid, invalid and
+erroneous messages in all lines before that offset. Validation interrupted
+for any reason can therefore be resumed from the offset, and the final report
+is the same as if the input file were validated in one run.
+
+Hits and misses of deduplication cache are stored too, when the cache is
+used. They are added up over all runs, but the cache itself is not stored,
+so messages seen before the interruption are missed once more after resume.
+
+Checkpoint files are replaced atomically, so a checkpoint is never found
+half-written, even when the process is killed while the file is written.
+"""
+
+import json
+import os
+from os import path
+
+# number of messages validated between two checkpoints by default
+DEFAULT_CHECKPOINT_INTERVAL = 10000
+
+# counters stored in checkpoint files
+REPORT_KEYS = ("processed", "valid", "invalid", "error")
+
+# statistics of deduplication cache, stored only when the cache is used
+CACHE_KEYS = ("dedup_hits", "dedup_misses")
+
+
+class Checkpoint:
+
+    """Checkpoint file storing progress of validation of one input file."""
+
+    def __init__(self, filename, input_file, interval=DEFAULT_CHECKPOINT_INTERVAL, resume=True):
+        """Initialize checkpoint stored in given file, nothing is read or written yet.
+
+        When `resume` is not set, the stored checkpoint is ignored and
+        validation starts from the beginning of input file.
+        """
+        self.filename = filename
+        self.input_file = path.abspath(input_file)
+        self.interval = interval
+        self.resume = resume
+
+    def load(self):
+        """Load offset and counters, or start from the beginning when there's no checkpoint."""
+        if not self.resume:
+            return 0, dict.fromkeys(REPORT_KEYS, 0)
+        try:
+            with open(self.filename) as fin:
+                stored = json.load(fin)
+        except FileNotFoundError:
+            return 0, dict.fromkeys(REPORT_KEYS, 0)
+
+        # checkpoint made for other file (or for file that has been changed
+        # since then) can't be used to resume validation
+        if stored.get("input_file") != self.input_file:
+            raise ValueError(f"checkpoint {self.filename} was made for other input file "
+                             f"{stored.get('input_file')}")
+        if stored.get("size") != path.getsize(self.input_file):
+            raise ValueError(f"size of input file differs from size stored in checkpoint "
+                             f"{self.filename}")
+        report = {key: stored["report"][key] for key in REPORT_KEYS}
+        report.update((key, stored["report"][key]) for key in CACHE_KEYS
+                      if key in stored["report"])
+        return stored["offset"], report
+
+    def save(self, offset, report):
+        """Store offset of the first line that has not been validated yet and counters."""
+        stored = {"input_file": self.input_file,
+                  "size": path.getsize(self.input_file),
+                  "offset": offset,
+                  "report": {key: report[key] for key in REPORT_KEYS + CACHE_KEYS
+                             if key in report}}
+
+        # checkpoint is written into temporary file that replaces the old one
+        temporary = self.filename + ".tmp"
+        with open(temporary, "w") as fout:
+            json.dump(stored, fout)
+            fout.flush()
+            os.fsync(fout.fileno())
+        os.replace(temporary, self.filename)
+
+
+def checkpoint_filename(input_file):
+    """Construct name of checkpoint file used for given input file by default."""
+    return input_file + ".checkpoint"
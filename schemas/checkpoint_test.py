@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# vim: set fileencoding=utf-8
+
+# Copyright © 2024 Pavel Tisnovsky
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unit tests for checkpoint module."""
+
+import json
+
+import pytest
+from checkpoint import Checkpoint, checkpoint_filename
+
+REPORT = {"processed": 10, "valid": 7, "invalid": 2, "error": 1}
+
+
+@pytest.fixture
+def input_file(tmpdir):
+    """Write input file with some messages."""
+    filename = tmpdir.join("messages.json")
+    filename.write("{}\n" * 10)
+    return str(filename)
+
+
+def test_load_without_checkpoint_file(input_file):
+    """Check that validation starts from the beginning when there's no checkpoint."""
+    checkpoint = Checkpoint(checkpoint_filename(input_file), input_file)
+    assert checkpoint.load() == (0, {"processed": 0, "valid": 0, "invalid": 0, "error": 0})
+
+
+def test_save_and_load(input_file):
+    """Check that stored offset and counters are loaded back."""
+    checkpoint = Checkpoint(checkpoint_filename(input_file), input_file)
+    checkpoint.save(30, REPORT)
+    assert checkpoint.load() == (30, REPORT)
+
+    # checkpoint is replaced by newer one
+    checkpoint.save(33, dict(REPORT, processed=11, valid=8))
+    assert checkpoint.load() == (33, dict(REPORT, processed=11, valid=8))
+
+
+def test_save_and_load_cache_statistics(input_file):
+    """Check that hits and misses of deduplication cache are stored when present."""
+    checkpoint = Checkpoint(checkpoint_filename(input_file), input_file)
+    report = dict(REPORT, dedup_hits=6, dedup_misses=4)
+    checkpoint.save(30, report)
+    assert checkpoint.load() == (30, report)
+
+
+def test_load_without_resume(input_file):
+    """Check that stored checkpoint is ignored when validation is not resumed."""
+    Checkpoint(checkpoint_filename(input_file), input_file).save(30, REPORT)
+    checkpoint = Checkpoint(checkpoint_filename(input_file), input_file, resume=False)
+    assert checkpoint.load()[0] == 0
+
+
+def test_load_for_other_file(input_file, tmpdir):
+    """Check that checkpoint made for other input file is refused."""
+    other_file = tmpdir.join("other.json")
+    other_file.write("{}\n" * 10)
+    Checkpoint(checkpoint_filename(input_file), input_file).save(30, REPORT)
+
+    with pytest.raises(ValueError):
+        Checkpoint(checkpoint_filename(input_file), str(other_file)).load()
+
+
+def test_load_for_changed_file(input_file):
+    """Check that checkpoint made for input file with different size is refused."""
+    checkpoint = Checkpoint(checkpoint_filename(input_file), input_file)
+    checkpoint.save(30, REPORT)
+    with open(input_file, "a") as fout:
+        fout.write("{}\n")
+
+    with pytest.raises(ValueError):
+        checkpoint.load()
+
+
+def test_checkpoint_file_format(input_file):
+    """Check content of checkpoint file."""
+    checkpoint = Checkpoint(checkpoint_filename(input_file), input_file)
+    checkpoint.save(30, dict(REPORT, other=42))
+
+    with open(checkpoint_filename(input_file)) as fin:
+        stored = json.load(fin)
+    assert stored == {"input_file": checkpoint.input_file, "size": 30, "offset": 30,
+                      "report": REPORT}
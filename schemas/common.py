@@ -16,12 +16,115 @@
 
 """Common function used by validators.upload.buckit topic."""
 
+import asyncio
+import inspect
 import json
+import multiprocessing
+import threading
+import time
 from argparse import ArgumentParser
+from bisect import bisect_left
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial, wraps
+from hashlib import sha256
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import islice
 from os import popen
 
 import parquet
-from voluptuous import Invalid
+from batch_validators import batch_failures
+from checkpoint import DEFAULT_CHECKPOINT_INTERVAL, Checkpoint, checkpoint_filename
+from lru import LRUCache
+from mapped_file import MappedFile
+from memoization import MemoizedSchema, memoize_schemas
+from profiler import Profiler
+from results import (
+    ListSink,
+    NullSink,
+    PrintSink,
+    checkpoint_problem_result,
+    decoding_problem_result,
+    exception_result,
+    file_problem_result,
+    valid_result,
+)
+from sampling import (
+    CONFIDENCE_LEVEL,
+    DEFAULT_SAMPLE_SEED,
+    SAMPLE_METHODS,
+    Sampler,
+    add_sample_statistics,
+)
+from schema_compiler import compile_columns, compile_schema
+from validators import decodeBytes, decodeJSONBytes
+from voluptuous import Invalid, MultipleInvalid, Schema
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# upper bounds of buckets (in seconds) used by latency histograms
+LATENCY_BUCKETS = (0.000001, 0.0000025, 0.000005, 0.00001, 0.000025, 0.00005, 0.0001,
+                   0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+# number of messages validated by worker process in one batch and number of
+# batches waiting in each queue of asynchronous validation pipeline by default
+DEFAULT_BATCH_SIZE = 256
+DEFAULT_QUEUE_SIZE = 8
+
+
+def standard_decoder(data):
+    """Decode JSON by the standard decoder, bytes and lines from mapped files are UTF-8."""
+    # json.loads would detect encoding of bytes (UTF-16, UTF-32, UTF-8 with
+    # BOM), but messages are decoded strictly, like when files were read as text
+    if not isinstance(data, str):
+        data = decodeBytes(data)
+    return json.loads(data)
+
+
+def orjson_decoder(data):
+    """Decode JSON by orjson, use the standard decoder for inputs handled differently by orjson."""
+    # the standard decoder accepts some inputs refused by orjson (NaN,
+    # infinite numbers, lone surrogates), and its error messages are the
+    # ones displayed in validation reports
+    return decodeJSONBytes(data, standard_decoder)
+
+
+# all available JSON decoders, all of them accept str, bytes, and memoryview
+JSON_DECODERS = {"json": standard_decoder}
+if orjson is not None:
+    JSON_DECODERS["orjson"] = orjson_decoder
+
+
+def select_json_decoder(name="auto"):
+    """Select JSON decoder by its name, the fastest available one for "auto"."""
+    if name == "auto":
+        name = "orjson" if "orjson" in JSON_DECODERS else "json"
+    if name not in JSON_DECODERS:
+        raise ValueError(f"JSON decoder {name} is not available")
+    return JSON_DECODERS[name]
+
+
+# function used to decode JSON messages, it is replaced when decoding is profiled
+json_decoder = select_json_decoder()
+
+
+def set_json_decoder(decoder):
+    """Set function used to decode JSON messages."""
+    global json_decoder
+    json_decoder = decoder
+
+
+# function called for every verdict counted in report, set when metrics are collected
+message_observer = None
+
+
+def set_message_observer(observer):
+    """Set function called with status, processed flag and number of counted verdicts."""
+    global message_observer
+    message_observer = observer
 
 
 def read_control_code(operation):
@@ -29,13 +132,19 @@ def read_control_code(operation):
     return popen("tput " + operation, "r").readline()
 
 
-def cli_arguments():
-    """Retrieve all CLI arguments."""
+def cli_arguments(serve_mode=False, memoize=False):
+    """Retrieve all CLI arguments.
+
+    When `serve_mode` is enabled, options to consume messages from Kafka topic
+    are recognized too and input file is not required in this mode. Option
+    to memoize sub-schemas is recognized just when `memoize` is enabled, for
+    schemas with sub-schemas that can be memoized.
+    """
     # First of all, we need to specify all command line flags that are
     # recognized by this tool.
     parser = ArgumentParser()
     parser.add_argument("-i", "--input", dest="input", help="name of input file",
-                        action="store", default=None, type=str, required=True)
+                        action="store", default=None, type=str, required=not serve_mode)
     parser.add_argument("-m", "--multiple", dest="multiple",
                         help="Input file should containg more messages, each message on one line",
                         action="store_true", default=False, required=False)
@@ -43,18 +152,164 @@ def cli_arguments():
                         action="store_true", default=None)
     parser.add_argument("-v", "--verbose", dest="verbose", help="make it verbose",
                         action="store_true", default=None, required=False)
+    parser.add_argument("-q", "--quiet", dest="quiet",
+                        help="don't print problems found in messages, just the report",
+                        action="store_true", default=False, required=False)
+    parser.add_argument("--output-buffer", dest="output_buffer",
+                        help="number of printed lines buffered before they are written",
+                        action="store", default=0, type=int, required=False)
+    parser.add_argument("-j", "--jobs", dest="jobs",
+                        help="number of worker processes used to validate multiple messages",
+                        action="store", default=1, type=int, required=False)
+    parser.add_argument("-c", "--compile", dest="compile",
+                        help="compile schema into specialized validator before validation",
+                        action="store_true", default=False, required=False)
+    parser.add_argument("--metrics-port", dest="metrics_port",
+                        help="export validation metrics on http://localhost:PORT/metrics",
+                        action="store", default=None, type=int, required=False)
+    parser.add_argument("--json-decoder", dest="json_decoder",
+                        help="JSON decoder used to decode messages (the fastest one by default)",
+                        action="store", default="auto", choices=["auto"] + list(JSON_DECODERS),
+                        required=False)
+    parser.add_argument("--checkpoint", dest="checkpoint",
+                        help="store progress of validation of multiple messages into FILE",
+                        metavar="FILE", action="store", default=None, type=str, required=False)
+    parser.add_argument("--checkpoint-interval", dest="checkpoint_interval",
+                        help="number of messages validated between two checkpoints",
+                        action="store", default=DEFAULT_CHECKPOINT_INTERVAL, type=int,
+                        required=False)
+    parser.add_argument("--resume", dest="resume",
+                        help="resume validation from checkpoint (INPUT.checkpoint by default)",
+                        action="store_true", default=False, required=False)
+    parser.add_argument("--dedup-cache", dest="dedup_cache",
+                        help="number of distinct messages with verdicts cached to skip duplicates",
+                        action="store", default=0, type=int, required=False)
+    if memoize:
+        parser.add_argument("--memoize", dest="memoize",
+                            help="number of accepted sub-documents remembered to skip their "
+                            "validation", action="store", default=0, type=int, required=False)
+    else:
+        parser.set_defaults(memoize=0)
+    parser.add_argument("--fail-fast", dest="fail_fast",
+                        help="stop validation of multiple messages at the first invalid message",
+                        action="store_true", default=False, required=False)
+    parser.add_argument("--max-errors", dest="max_errors",
+                        help="stop validation of multiple messages after N invalid messages",
+                        metavar="N", action="store", default=None, type=int, required=False)
+    parser.add_argument("--sample", dest="sample",
+                        help="validate just given fraction of messages, for example 0.01",
+                        metavar="RATE", action="store", default=None, type=float,
+                        required=False)
+    parser.add_argument("--sample-seed", dest="sample_seed",
+                        help="seed used to select messages to be validated",
+                        action="store", default=DEFAULT_SAMPLE_SEED, type=int, required=False)
+    parser.add_argument("--sample-method", dest="sample_method",
+                        help="select messages randomly or with fixed stride",
+                        action="store", default="random", choices=SAMPLE_METHODS,
+                        required=False)
+    parser.add_argument("-p", "--profile", dest="profile",
+                        help="measure time spent in JSON decoding and in validators",
+                        action="store_true", default=False, required=False)
+    parser.add_argument("--profile-json", dest="profile_json",
+                        help="store profile into JSON file", metavar="FILE",
+                        action="store", default=None, type=str, required=False)
+
+    if serve_mode:
+        parser.add_argument("-s", "--serve", dest="serve",
+                            help="validate messages consumed from Kafka topic continuously",
+                            action="store_true", default=False, required=False)
+        parser.add_argument("--bootstrap-server", dest="bootstrap_server",
+                            help="address of Kafka broker",
+                            action="store", default="localhost:9092", type=str, required=False)
+        parser.add_argument("--topic", dest="topic", help="topic to consume messages from",
+                            action="store", default=None, type=str, required=False)
+        parser.add_argument("--group-id", dest="group_id", help="consumer group ID",
+                            action="store", default="insights-data-schemas", type=str,
+                            required=False)
+        parser.add_argument("--batch-size", dest="batch_size",
+                            help="max. number of messages validated before offsets are committed",
+                            action="store", default=100, type=int, required=False)
 
     # Now it is time to parse flags, check the actual content of command line
     # and fill in the object named `args`.
-    return parser.parse_args()
+    args = parser.parse_args()
+
+    # metrics and profile are collected by this process only, not by worker processes
+    if args.metrics_port is not None and args.jobs > 1:
+        parser.error("argument --metrics-port can't be used together with -j/--jobs")
+    if args.profile and args.jobs > 1:
+        parser.error("argument -p/--profile can't be used together with -j/--jobs")
+
+    # checkpoints are made for input files with multiple messages only
+    if (args.checkpoint is not None or args.resume) and not args.multiple:
+        parser.error("arguments --checkpoint and --resume require -m/--multiple")
+
+    check_triage_arguments(parser, args)
+
+    # input file or topic needs to be specified
+    if serve_mode:
+        if args.serve and args.topic is None:
+            parser.error("the following arguments are required in serve mode: --topic")
+        if not args.serve and args.input is None:
+            parser.error("the following arguments are required: -i/--input")
+
+    return args
+
+
+def check_triage_arguments(parser, args):
+    """Check arguments used to stop validation early or to validate sample of messages."""
+    if (args.fail_fast or args.max_errors is not None or args.sample is not None) and \
+            not args.multiple:
+        parser.error("arguments --fail-fast, --max-errors and --sample require -m/--multiple")
+    if args.fail_fast and args.max_errors is not None:
+        parser.error("argument --fail-fast can't be used together with --max-errors")
+    if args.max_errors is not None and args.max_errors < 1:
+        parser.error("argument --max-errors needs to be a positive number")
+
+    if args.sample is None:
+        return
+    if not 0 < args.sample <= 1:
+        parser.error("argument --sample needs to be in range (0, 1]")
+    # lines are selected by this process only
+    if args.jobs > 1:
+        parser.error("argument --sample can't be used together with -j/--jobs")
+    if args.checkpoint is not None or args.resume:
+        parser.error("argument --sample can't be used together with --checkpoint and --resume")
+
+
+def max_errors_from_arguments(args):
+    """Retrieve number of invalid messages after which validation stops, None for no limit."""
+    return 1 if args.fail_fast else args.max_errors
+
+
+def sampler_from_arguments(args):
+    """Construct sampler according to CLI arguments, None when all messages are validated."""
+    if args.sample is None:
+        return None
+    return Sampler(args.sample, args.sample_seed, args.sample_method)
+
+
+def checkpoint_from_arguments(args):
+    """Construct checkpoint according to CLI arguments, None when checkpoints are not used."""
+    if args.checkpoint is None and not args.resume:
+        return None
+    filename = args.checkpoint if args.checkpoint is not None else checkpoint_filename(args.input)
+    return Checkpoint(filename, args.input, args.checkpoint_interval, args.resume)
+
+
+def sink_from_arguments(args):
+    """Construct sink for results of validation according to CLI arguments."""
+    if args.quiet:
+        return NullSink()
+    return PrintSink(args.verbose, buffer_size=args.output_buffer)
 
 
 def load_json_from_file(filename, verbose):
     """Load and decode JSON file."""
     if verbose:
         print("Loading original file", filename)
-    with open(filename) as fin:
-        return json.load(fin)
+    with open(filename, "rb") as fin:
+        return json_decoder(fin.read())
 
 
 def validate(schema, payload, verbose):
@@ -64,71 +319,524 @@ def validate(schema, payload, verbose):
     schema(payload)
 
 
-def validate_single_message(schema, input_file, verbose):
-    """Validate single message stored in input file."""
-    processed = 0
-    valid = 0
-    invalid = 0
-    error = 0
-
-    try:
-        payload = load_json_from_file(input_file, verbose)
-        processed = 1
-        validate(schema, payload, verbose)
-        valid = 1
-    except (ValueError, Invalid) as ve:
-        invalid = 1
-        print("Validation error: " + str(ve))
-    except Exception as e:
-        print("Other problem: " + str(e))
-        error = 1
-
-    return {"processed": processed,
-            "valid": valid,
-            "invalid": invalid,
-            "error": error}
-
-
 def try_to_validate_message(schema, line, processed, verbose):
     """Try to validate one message represented by string."""
     if verbose:
         print(f"Reading message #{processed}")
     # load the payload from string
-    payload = json.loads(line)
+    payload = json_decoder(line)
     # and try to validate it
     validate(schema, payload, verbose)
 
 
-def validate_multiple_messages(schema, input_file, verbose):
-    """Validate multiple messages stored in input file."""
-    processed = 0
-    valid = 0
-    invalid = 0
-    error = 0
+def empty_report():
+    """Construct report with all counters set to zero."""
+    return {"processed": 0,
+            "valid": 0,
+            "invalid": 0,
+            "error": 0}
+
+
+def count_result(report, result):
+    """Count result in report, problems not related to any message are not processed messages."""
+    processed = result.index is not None
+    report["processed"] += processed
+    report[result.status] += 1
+    if message_observer is not None:
+        message_observer(result.status, processed, 1)
+
+
+def count_valid(report, valid):
+    """Count messages that are valid in report, without constructing their results."""
+    report["processed"] += valid
+    report["valid"] += valid
+    if message_observer is not None and valid:
+        message_observer("valid", True, valid)
+
+
+def collect_results(results, sink=None, report=None):
+    """Consume results, pass them to sink (if any), and return report with counters.
+
+    Results are neither printed nor stored when no sink is specified, just
+    the counters are computed. When `report` is specified, results are
+    counted into it, so the producer of results can read the counters too.
+    """
+    if report is None:
+        report = empty_report()
+    try:
+        for result in results:
+            count_result(report, result)
+            if sink is not None:
+                sink(result)
+    finally:
+        if sink is not None:
+            sink.flush()
+    return report
+
+
+def payload_result(schema, payload, index):
+    """Validate one decoded message, return structured result."""
+    try:
+        validate(schema, payload, False)
+        return valid_result(index)
+    except Exception as e:
+        return exception_result(index, e)
+
+
+def line_result(schema, line, index):
+    """Decode and validate one message, return structured result."""
+    try:
+        payload = json_decoder(line)
+    except Exception as e:
+        return exception_result(index, e)
+    return payload_result(schema, payload, index)
+
+
+def cached_line_result(schema, line, index, cache):
+    """Decode and validate one message, results for lines seen before are taken from cache."""
+    # lines are identified by cryptographic hash, so a crafted message can't
+    # share result with different message
+    key = sha256(line).digest()
+    result = cache.get(key)
+    if result is None:
+        result = line_result(schema, line, index)
+        cache.put(key, result)
+        return result
+    return result._replace(index=index)
+
+
+def max_errors_reached(report, max_errors):
+    """Check if validation needs to stop because of too many invalid messages."""
+    return max_errors is not None and report["invalid"] + report["error"] >= max_errors
+
+
+def checkpoint_report(report, cache, hits, misses):
+    """Retrieve counters stored into checkpoint, with given hits and misses of cache added."""
+    if cache is None:
+        return report
+    return dict(report, dedup_hits=report.get("dedup_hits", 0) + hits,
+                dedup_misses=report.get("dedup_misses", 0) + misses)
+
+
+def line_results(schema, lines, first_index=1, cache=None, report=None, max_errors=None,
+                 checkpoint=None, offset=0):
+    """Validate messages from iterable, yield structured result for each of them.
+
+    When `cache` is specified, results for duplicate lines are taken from it.
+    Counters in `report` are updated by the consumer of results (see
+    collect_results). Validation stops after `max_errors` invalid messages,
+    if specified. When `checkpoint` is specified, counters (including hits and
+    misses of the cache) and offset of the next line are stored there
+    periodically and when validation is finished, stopped, or interrupted.
+    """
+    if checkpoint is not None:
+        next_checkpoint = report["processed"] + checkpoint.interval
+    # hits and misses of cache for lines that have been validated, lookup for
+    # the line being validated when interrupted is not stored into checkpoint
+    hits = misses = 0
+
+    try:
+        for index, line in enumerate(lines, first_index):
+            if cache is None:
+                result = line_result(schema, line, index)
+            else:
+                result = cached_line_result(schema, line, index, cache)
+                hits, misses = cache.hits, cache.misses
+            # offset is updated before the result is counted by consumer, so
+            # counters and offset are consistent when validation is interrupted
+            offset += len(line)
+            yield result
+            if checkpoint is not None and report["processed"] >= next_checkpoint:
+                checkpoint.save(offset, checkpoint_report(report, cache, hits, misses))
+                next_checkpoint += checkpoint.interval
+            if max_errors_reached(report, max_errors):
+                report["stopped"] = True
+                return
+    finally:
+        # progress is stored when validation is finished or interrupted
+        if checkpoint is not None:
+            checkpoint.save(offset, checkpoint_report(report, cache, hits, misses))
+
+
+def single_message_results(schema, input_file):
+    """Validate single message stored in input file, yield its structured result.
+
+    Message that can't be read or decoded is not counted as processed.
+    """
+    try:
+        payload = load_json_from_file(input_file, False)
+    except OSError as e:
+        yield file_problem_result(e)
+        return
+    except Exception as e:
+        yield decoding_problem_result(e)
+        return
+    yield payload_result(schema, payload, 1)
+
+
+def multiple_messages_results(schema, input_file, cache=None, report=None, max_errors=None,
+                              checkpoint=None, sampler=None):
+    """Validate multiple messages stored in input file, yield structured results.
+
+    Counters in `report` are updated by the consumer of results, they are
+    needed when validation stops after `max_errors` problems and when
+    progress is stored into checkpoint. Validation continues from the stored
+    checkpoint, the counters loaded from it are stored into `report`. When
+    `sampler` is specified, just the lines selected by sampler are validated.
+    """
+    try:
+        offset = 0
+        if checkpoint is not None:
+            # offsets of skipped lines are not tracked
+            if sampler is not None:
+                raise ValueError("validation of sample of messages can't be checkpointed")
+            offset, stored = checkpoint.load()
+            report.update(stored)
+        first_index = 1 if report is None else report["processed"] + 1
+
+        # lines are neither copied nor decoded into strings, JSON decoders
+        # accept memoryview slices of the mapped file
+        with MappedFile(input_file) as mapped_file:
+            if sampler is None:
+                lines = mapped_file.lines_in_range(offset, mapped_file.size)
+            else:
+                lines = sampler.lines(mapped_file)
+            yield from line_results(schema, lines, first_index, cache, report, max_errors,
+                                    checkpoint, offset)
+
+    except OSError as e:
+        yield file_problem_result(e)
+    except ValueError as e:
+        yield checkpoint_problem_result(e)
+
 
+def parquet_row_result(schema, row, index):
+    """Validate one message read from Parquet file, return structured result."""
     try:
-        with open(input_file, "r") as fin:
-            # iterate over all lines in the message file
-            for line in fin:
-                processed += 1
-                try:
-                    try_to_validate_message(schema, line, processed, verbose)
-                    valid += 1
-                except (ValueError, Invalid) as ve:
-                    invalid += 1
-                    print("Validation error: " + str(ve))
-                except Exception as e:
-                    print("Other problem: " + str(e))
-                    error += 1
+        try_to_validate_message_from_parquet(schema, row, index, False)
+        return valid_result(index)
+    except Exception as e:
+        result = exception_result(index, e)
+    # invalid rows are printed after the problem
+    return result._replace(payload=row) if result.status == "invalid" else result
+
+
+def parquet_file_results(schema, input_file):
+    """Validate multiple messages stored in input Parquet file, yield structured results."""
+    try:
+        with open(input_file, "rb") as fo:
+            # iterate over all records in the Parquet file
+            for index, row in enumerate(parquet.DictReader(fo), 1):
+                yield parquet_row_result(schema, row, index)
+    except OSError as e:
+        yield file_problem_result(e)
+
+
+def validate_single_message(schema, input_file, verbose, sink=None):
+    """Validate single message stored in input file.
+
+    Problems are printed unless another sink is specified.
+    """
+    if sink is None:
+        sink = PrintSink(verbose)
+    if verbose:
+        sink.note(f"Loading original file {input_file}")
+    return collect_results(single_message_results(schema, input_file), sink)
+
+
+def dedup_cache(dedup_cache_size):
+    """Construct cache of verdicts for duplicate messages, None when it is disabled."""
+    return LRUCache(dedup_cache_size) if dedup_cache_size > 0 else None
+
+
+def add_cache_statistics(report, cache, hits=0, misses=0):
+    """Add hits and misses of deduplication cache since the given numbers into report."""
+    if cache is not None:
+        report["dedup_hits"] = report.get("dedup_hits", 0) + cache.hits - hits
+        report["dedup_misses"] = report.get("dedup_misses", 0) + cache.misses - misses
+    return report
+
+
+def validate_multiple_messages(schema, input_file, verbose, jobs=1, checkpoint=None,
+                               dedup_cache_size=0, max_errors=None, sampler=None, sink=None):
+    """Validate multiple messages stored in input file.
+
+    When `checkpoint` is specified, validation continues from the stored
+    checkpoint and the progress is stored there periodically. When
+    `dedup_cache_size` is set, verdicts for that many distinct messages are
+    cached, so duplicate messages are not validated again. Validation stops
+    after `max_errors` invalid messages, if specified. When `sampler` is
+    specified, just the lines selected by sampler are validated by this
+    process, and the ratio of invalid messages is estimated. Problems are
+    printed unless another sink is specified.
+    """
+    # more worker processes can be used to validate big input files
+    if jobs > 1 and sampler is None:
+        return validate_multiple_messages_in_parallel(schema, input_file, verbose, jobs,
+                                                      checkpoint, dedup_cache_size, max_errors,
+                                                      sink)
+
+    if sink is None:
+        sink = PrintSink(verbose)
+    cache = dedup_cache(dedup_cache_size)
+    report = empty_report()
+    collect_results(multiple_messages_results(schema, input_file, cache, report, max_errors,
+                                              checkpoint, sampler), sink, report)
+
+    if sampler is not None:
+        add_sample_statistics(report, sampler)
+    return add_cache_statistics(report, cache)
+
+
+def split_input_file(input_file, chunks, start=0):
+    """Split input file from given offset into byte ranges that start and end on line boundaries."""
+    with MappedFile(input_file) as mapped_file:
+        return mapped_file.byte_ranges(chunks, start)
+
+
+def validate_chunk(schema, input_file, start, end, cache=None, max_errors=None):
+    """Validate messages stored in the given byte range of input file.
+
+    Results of messages that are not valid are returned together with
+    counters, so the caller is able to print them in input order. Indexes
+    of messages start from 1 in every chunk. Validation of the chunk stops
+    after `max_errors` invalid messages, offset of the first line that has
+    not been validated is returned as "end" in counters then.
+    """
+    report = empty_report()
+    sink = ListSink()
+    if cache is not None:
+        hits, misses = cache.hits, cache.misses
+
+    with MappedFile(input_file) as mapped_file:
+        lines = mapped_file.lines_in_range(start, end)
+        collect_results(line_results(schema, lines, 1, cache, report, max_errors), sink, report)
+        if report.get("stopped"):
+            validated = islice(mapped_file.lines_in_range(start, end), report["processed"])
+            report["end"] = start + sum(len(line) for line in validated)
+
+    if cache is not None:
+        add_cache_statistics(report, cache, hits, misses)
+    return report, sink.results
+
+
+# Schema and deduplication cache used by worker processes. They are set by
+# pool initializer, so the schema (which might contain lambdas) does not need
+# to be pickled when worker processes are forked.
+_worker_schema = None
+_worker_cache = None
+
 
+def _init_worker(schema, dedup_cache_size=0):
+    """Remember the schema in worker process, and construct its own cache."""
+    global _worker_schema, _worker_cache
+    _worker_schema = schema
+    _worker_cache = dedup_cache(dedup_cache_size)
+
+
+def _validate_chunk_in_worker(task):
+    """Validate one chunk of input file in worker process."""
+    input_file, start, end, max_errors = task
+    return validate_chunk(_worker_schema, input_file, start, end, _worker_cache, max_errors)
+
+
+def worker_pool_context():
+    """Retrieve multiprocessing context used to start worker processes."""
+    # forked workers inherit the schema from parent process
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return multiprocessing.get_context()
+
+
+def merge_reports(report, other):
+    """Add counters from other report into the report."""
+    for key in ("processed", "valid", "invalid", "error"):
+        report[key] += other[key]
+    # statistics of deduplication cache are present only when the cache is used
+    for key in ("dedup_hits", "dedup_misses"):
+        if key in other:
+            report[key] = report.get(key, 0) + other[key]
+    return report
+
+
+def validate_multiple_messages_in_parallel(schema, input_file, verbose, jobs, checkpoint=None,
+                                           dedup_cache_size=0, max_errors=None, sink=None):
+    """Validate multiple messages stored in input file by a pool of worker processes.
+
+    When `max_errors` is specified, validation stops after the chunk in which
+    the limit of invalid messages has been reached, so a few more invalid
+    messages (from that chunk) might be reported than by sequential validation.
+    Problems are passed to sink in input order, valid messages are just counted.
+    """
+    if sink is None:
+        sink = PrintSink()
+    report = empty_report()
+
+    try:
+        offset = 0
+        if checkpoint is not None:
+            offset, report = checkpoint.load()
+            next_checkpoint = report["processed"] + checkpoint.interval
+        # more chunks than workers helps to balance the load
+        chunks = split_input_file(input_file, jobs * 4, offset)
     except OSError as e:
-        print("File-related problem: " + str(e))
-        error += 1
+        return collect_results([file_problem_result(e)], sink, report)
+    except ValueError as e:
+        return collect_results([checkpoint_problem_result(e)], sink, report)
+
+    tasks = [(input_file, start, end, max_errors) for start, end in chunks]
+
+    try:
+        with worker_pool_context().Pool(jobs, initializer=_init_worker,
+                                        initargs=(schema, dedup_cache_size)) as pool:
+            # results are returned in the same order as tasks, so problems are
+            # passed to sink in input-line order
+            results = pool.imap(_validate_chunk_in_worker, tasks)
+            for task, (chunk_report, problems) in enumerate(results):
+                start, end = chunks[task]
+                if verbose:
+                    sink.note(f"Processed bytes {start}-{end}: "
+                              f"{chunk_report['processed']} messages")
+                # problems are counted one by one, other counters are merged
+                first_index = report["processed"]
+                merge_reports(report, dict(chunk_report, processed=chunk_report["valid"],
+                                           invalid=0, error=0))
+                for problem in problems:
+                    problem = problem._replace(index=first_index + problem.index)
+                    count_result(report, problem)
+                    sink(problem)
+                stopped = max_errors_reached(report, max_errors)
+                # chunks are finished in input order, so all lines before the end
+                # of this chunk have been validated
+                if checkpoint is not None and (report["processed"] >= next_checkpoint
+                                               or task == len(chunks) - 1 or stopped):
+                    checkpoint.save(chunk_report.get("end", end), report)
+                    next_checkpoint = report["processed"] + checkpoint.interval
+                # remaining chunks are not validated, pool is terminated
+                if stopped:
+                    report["stopped"] = True
+                    break
+    finally:
+        sink.flush()
+
+    return report
+
+
+def _validate_lines_in_worker(task):
+    """Decode and validate batch of lines in worker process."""
+    first_index, lines = task
+    return list(line_results(_worker_schema, lines, first_index))
+
+
+def validation_executor(schema, jobs=1):
+    """Construct pool of worker processes used by asynchronous validation pipeline.
+
+    The pool can be shared by more calls of validate_messages_async, for
+    example by a consumer that validates messages batch by batch.
+    """
+    return ProcessPoolExecutor(jobs, mp_context=worker_pool_context(),
+                               initializer=_init_worker, initargs=(schema,))
+
+
+async def read_stage(lines, output, batch_size):
+    """Read lines from (asynchronous) iterable and pass them in batches to the next stage."""
+    batch = []
+    if hasattr(lines, "__aiter__"):
+        async for line in lines:
+            batch.append(line)
+            if len(batch) >= batch_size:
+                await output.put(batch)
+                batch = []
+    else:
+        for line in lines:
+            batch.append(line)
+            if len(batch) >= batch_size:
+                await output.put(batch)
+                batch = []
+    if batch:
+        await output.put(batch)
+    # end of stream
+    await output.put(None)
+
+
+async def validate_stage(source, output, executor, in_flight):
+    """Decode and validate batches of lines in worker processes.
+
+    Raw lines are sent to workers, which is cheaper than sending decoded
+    messages, and the event loop is blocked neither by decoding nor by
+    validation. At most `in_flight` batches are validated at the same time
+    and results are passed to the next stage in input order.
+    """
+    loop = asyncio.get_running_loop()
+    pending = deque()
+    first_index = 1
+    while True:
+        lines = await source.get()
+        if lines is None:
+            break
+        # slices of mapped files can't be sent to other processes
+        lines = [bytes(line) if isinstance(line, memoryview) else line for line in lines]
+        pending.append(loop.run_in_executor(executor, _validate_lines_in_worker,
+                                            (first_index, lines)))
+        first_index += len(lines)
+        if len(pending) >= in_flight:
+            await output.put(await pending.popleft())
+    while pending:
+        await output.put(await pending.popleft())
+    await output.put(None)
+
+
+async def report_stage(source, report, sink):
+    """Count results and pass them to sink, the same as sequential validation does."""
+    while True:
+        results = await source.get()
+        if results is None:
+            sink.flush()
+            return report
+        for result in results:
+            count_result(report, result)
+            sink(result)
+
+
+async def validate_messages_async(schema, lines, verbose=False, jobs=1, executor=None,
+                                  queue_size=DEFAULT_QUEUE_SIZE, batch_size=DEFAULT_BATCH_SIZE,
+                                  sink=None):
+    """Validate messages read from (asynchronous) iterable by asynchronous pipeline.
 
-    return {"processed": processed,
-            "valid": valid,
-            "invalid": invalid,
-            "error": error}
+    Reader, validator and reporter stages are connected by queues bounded to
+    `queue_size` batches, so a slow stage blocks the previous ones instead of
+    letting messages pile up in memory. Messages are decoded and validated
+    in batches by worker processes, so the event loop is not blocked by
+    them. When `executor` is not specified, pool with `jobs` worker
+    processes is constructed for this call, otherwise `jobs` is used just to
+    limit number of batches validated at the same time. Counters and printed
+    problems are the same as from validate_multiple_messages, problems are
+    printed unless another sink is specified.
+    """
+    own_executor = executor is None
+    if own_executor:
+        executor = validation_executor(schema, jobs)
+    if sink is None:
+        sink = PrintSink(verbose)
+
+    lines_queue = asyncio.Queue(queue_size)
+    results_queue = asyncio.Queue(queue_size)
+    report = empty_report()
+
+    stages = [asyncio.ensure_future(read_stage(lines, lines_queue, batch_size)),
+              asyncio.ensure_future(validate_stage(lines_queue, results_queue, executor,
+                                                   max(jobs, 2))),
+              asyncio.ensure_future(report_stage(results_queue, report, sink))]
+    try:
+        await asyncio.gather(*stages)
+    finally:
+        # remaining stages are stopped when any of them fails
+        for stage in stages:
+            stage.cancel()
+        if own_executor:
+            # waiting for worker processes must not block the event loop
+            await asyncio.get_running_loop().run_in_executor(None, executor.shutdown)
+    return report
 
 
 def try_to_validate_message_from_parquet(schema, row, processed, verbose):
@@ -139,37 +847,100 @@ def try_to_validate_message_from_parquet(schema, row, processed, verbose):
     validate(schema, row, verbose)
 
 
-def validate_parquet_file(schema, input_file, verbose):
-    """Validate multiple messages stored in input Parquet file."""
-    processed = 0
-    valid = 0
-    invalid = 0
-    error = 0
+def validate_parquet_file(schema, input_file, verbose, sink=None):
+    """Validate multiple messages stored in input Parquet file.
+
+    Problems are printed unless another sink is specified.
+    """
+    if sink is None:
+        sink = PrintSink(verbose)
+    return collect_results(parquet_file_results(schema, input_file), sink)
+
+
+def parquet_columns(input_file):
+    """Retrieve names of all columns stored in Parquet file."""
+    footer = parquet.read_footer(input_file)
+    return [s.name for s in footer.schema if s.type]
+
+
+def read_parquet_row_groups(input_file, columns):
+    """Read values from selected columns of Parquet file, one row group at a time."""
+    footer = parquet.read_footer(input_file)
+
+    with open(input_file, "rb") as fo:
+        rows = parquet.reader(fo, columns)
+        for row_group in footer.row_groups:
+            batch = list(islice(rows, row_group.num_rows))
+            # values are returned column by column
+            yield [[row[i] for row in batch] for i in range(len(columns))]
+
+
+def failing_rows(check, values):
+    """Check all values from one column, return indexes of values that are not valid."""
+    # whole column is checked by batch variant of validator if there's one
+    mask = batch_failures(check, values)
+    return [index for index, failed in enumerate(mask) if failed]
+
+
+def validate_parquet_file_columnar(schema, input_file, verbose, sink=None):
+    """Validate multiple messages stored in input Parquet file column by column.
+
+    Parquet file is read one row group at a time and just columns known by
+    the schema are read. All values from one column are checked in batch and
+    messages (dictionaries) are constructed only for rows that failed, so the
+    schema itself can report the problem. Files and schemas that can't be
+    checked column by column are validated row by row. Problems are printed
+    unless another sink is specified.
+    """
+    compiled = compile_columns(schema)
+    if compiled is None:
+        return validate_parquet_file(schema, input_file, verbose, sink)
+    checks, required_columns = compiled
 
     try:
-        with open(input_file, "rb") as fo:
-            # iterate over all records in the Parquet file
-            for row in parquet.DictReader(fo):
-                processed += 1
-                try:
-                    try_to_validate_message_from_parquet(schema, row, processed, verbose)
-                    valid += 1
-                except (ValueError, Invalid) as ve:
-                    invalid += 1
-                    print("Validation error: " + str(ve))
-                    print(row)
-                except Exception as e:
-                    print("Other problem: " + str(e))
-                    error += 1
+        columns = parquet_columns(input_file)
+    except OSError:
+        # problem with input file is reported by row by row validation
+        return validate_parquet_file(schema, input_file, verbose, sink)
+
+    # when some column is missing or is not expected, all rows are invalid
+    if not columns or len(set(columns)) != len(columns) or \
+            not set(columns) <= set(checks) or not set(required_columns) <= set(columns):
+        return validate_parquet_file(schema, input_file, verbose, sink)
+
+    # messages are not read one by one, just progress of row groups is printed
+    if sink is None:
+        sink = PrintSink()
+    report = empty_report()
+
+    try:
+        for row_group, values in enumerate(read_parquet_row_groups(input_file, columns)):
+            rows = len(values[0])
+            if verbose:
+                sink.note(f"Reading row group #{row_group + 1} with {rows} messages")
+
+            # check values in all columns
+            failed = set()
+            for i, column in enumerate(columns):
+                failed.update(failing_rows(checks[column], values[i]))
+            first_index = report["processed"] + 1
+            count_valid(report, rows - len(failed))
+
+            # and let the schema report problems in rows that failed
+            for index in sorted(failed):
+                row = OrderedDict((column, values[i][index]) for i, column in enumerate(columns))
+                result = parquet_row_result(schema, row, first_index + index)
+                count_result(report, result)
+                sink(result)
 
     except OSError as e:
-        print("File-related problem: " + str(e))
-        error += 1
+        result = file_problem_result(e)
+        count_result(report, result)
+        sink(result)
+    finally:
+        sink.flush()
 
-    return {"processed": processed,
-            "valid": valid,
-            "invalid": invalid,
-            "error": error}
+    return report
 
 
 def print_report(report, nocolors):
@@ -199,6 +970,16 @@ def print_report(report, nocolors):
     print("Valid messages:     {}{}{}".format(green_foreground, report["valid"], no_color))
     print("Invalid messages:   {}{}{}".format(magenta_foreground, report["invalid"], no_color))
     print("Errors detected:    {}{}{}".format(red_foreground, report["error"], no_color))
+
+    # statistics of deduplication cache are displayed only when the cache is used
+    if "dedup_hits" in report:
+        print()
+        print("Dedup cache hits:   {}{}{}".format(blue_foreground, report["dedup_hits"], no_color))
+        print("Dedup cache misses: {}{}{}".format(blue_foreground, report["dedup_misses"],
+                                                  no_color))
+    # sampled validation and validation stopped early are described too
+    print_triage_report(report, blue_foreground, magenta_foreground, no_color)
+
     print("\nSummary:")
 
     if report["error"] == 0:
@@ -208,3 +989,313 @@ def print_report(report, nocolors):
             print(f"{magenta_background}[WARN]{no_color}: invalid messages detected")
     else:
         print(f"{red_background}[FAIL]{no_color}: invalid JSON(s) detected")
+
+
+def print_cache_statistics(title, cache):
+    """Display hits, misses and hit rate of cache, if it has been used."""
+    if cache.hits + cache.misses == 0:
+        return
+    print(f"\n{title}:")
+    print(f"Hits:     {cache.hits}")
+    print(f"Misses:   {cache.misses}")
+    print(f"Hit rate: {cache.hit_rate():.1%}")
+
+
+def print_triage_report(report, foreground, warning_foreground, no_color):
+    """Display estimated ratio of invalid messages and info about early stop."""
+    if "sample_rate" in report:
+        total = report["processed"] + report["skipped"]
+        print()
+        print(f"Sampled messages:   {foreground}{report['processed']}{no_color} of {total} "
+              f"(sample rate {report['sample_rate']})")
+        print(f"Invalid ratio:      {foreground}{report['invalid_ratio']:.3%}{no_color} "
+              f"({CONFIDENCE_LEVEL:.0%} confidence interval "
+              f"{report['invalid_ratio_low']:.3%} - {report['invalid_ratio_high']:.3%})")
+    if report.get("stopped"):
+        print()
+        print(f"{warning_foreground}Validation stopped early, "
+              f"limit of invalid messages reached{no_color}")
+
+
+class Histogram:
+
+    """Histogram of observed values with fixed upper bounds of buckets."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        """Initialize empty histogram."""
+        self.buckets = buckets
+        # number of observations in each bucket, not cumulative
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        """Add observed value into histogram."""
+        index = bisect_left(self.buckets, value)
+        if index < len(self.counts):
+            self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+    def expose(self, name, labels):
+        """Export histogram in Prometheus text format."""
+        lines = []
+        cumulative = 0
+        for index, bound in enumerate(self.buckets):
+            cumulative += self.counts[index]
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {self.count}')
+        lines.append(f"{name}_sum{{{labels}}} {self.sum}")
+        lines.append(f"{name}_count{{{labels}}} {self.count}")
+        return lines
+
+
+class MetricsRegistry:
+
+    """Registry of metrics collected during validation.
+
+    Metrics can be updated from validation code and exported at the same time
+    from another thread, for example by HTTP server started by
+    `start_metrics_server`.
+    """
+
+    def __init__(self):
+        """Initialize registry without any metrics."""
+        self.lock = threading.Lock()
+        self.messages = Counter()
+        self.failing_paths = Counter()
+        self.message_latency = {}
+        self.validator_latency = {}
+
+    def count_messages(self, schema_name, result, processed=True, count=1):
+        """Record verdicts counted in validation report, problems with files are not processed."""
+        with self.lock:
+            if processed:
+                self.messages[(schema_name, "processed")] += count
+            self.messages[(schema_name, result)] += count
+
+    def observe_message(self, schema_name, seconds, paths=()):
+        """Record latency of validation of decoded message together with failing field paths."""
+        with self.lock:
+            for failing_path in paths:
+                self.failing_paths[(schema_name, failing_path)] += 1
+            if schema_name not in self.message_latency:
+                self.message_latency[schema_name] = Histogram()
+            self.message_latency[schema_name].observe(seconds)
+
+    def observe_validator(self, validator_name, node_path, seconds):
+        """Record latency of one call of validator function, regardless of schema node."""
+        with self.lock:
+            if validator_name not in self.validator_latency:
+                self.validator_latency[validator_name] = Histogram()
+            self.validator_latency[validator_name].observe(seconds)
+
+    def expose(self):
+        """Export all metrics in Prometheus text format."""
+        with self.lock:
+            lines = ["# HELP validation_messages_total Number of messages by validation result.",
+                     "# TYPE validation_messages_total counter"]
+            for (schema_name, result), count in sorted(self.messages.items()):
+                lines.append(f'validation_messages_total{{schema="{label_value(schema_name)}",'
+                             f'result="{result}"}} {count}')
+
+            lines.append("# HELP validation_failures_total Number of failures by field path.")
+            lines.append("# TYPE validation_failures_total counter")
+            for (schema_name, failing_path), count in sorted(self.failing_paths.items()):
+                lines.append(f'validation_failures_total{{schema="{label_value(schema_name)}",'
+                             f'path="{label_value(failing_path)}"}} {count}')
+
+            lines.append("# HELP message_validation_seconds "
+                         "Time spent validating one decoded message.")
+            lines.append("# TYPE message_validation_seconds histogram")
+            for schema_name, histogram in sorted(self.message_latency.items()):
+                lines.extend(histogram.expose("message_validation_seconds",
+                                              f'schema="{label_value(schema_name)}"'))
+
+            lines.append("# HELP validator_call_seconds Time spent in one validator call.")
+            lines.append("# TYPE validator_call_seconds histogram")
+            for validator_name, histogram in sorted(self.validator_latency.items()):
+                lines.extend(histogram.expose("validator_call_seconds",
+                                              f'validator="{label_value(validator_name)}"'))
+
+        return "\n".join(lines) + "\n"
+
+
+# registry and profiler used by all validations started from command line
+METRICS = MetricsRegistry()
+PROFILER = Profiler()
+
+
+def label_value(value):
+    """Escape value to be used as label value in Prometheus text format."""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def field_path(error_path):
+    """Convert path from Invalid exception to field path like Report.reports[].details.error_key."""
+    result = ""
+    for item in error_path:
+        if isinstance(item, int):
+            # all items in list are reported under the same path
+            result += "[]"
+        else:
+            result += ("." if result else "") + str(item)
+    return result or "<root>"
+
+
+def failing_field_paths(exception):
+    """Retrieve field paths of all failures reported by exception."""
+    if isinstance(exception, MultipleInvalid):
+        return [field_path(error.path) for error in exception.errors]
+    if isinstance(exception, Invalid):
+        return [field_path(exception.path)]
+    return []
+
+
+def validator_name(function):
+    """Retrieve name of validator function used in reports."""
+    function = inspect.unwrap(function)
+    # lambdas used in schemas just call other validator with more arguments,
+    # the called validator is the first name referenced by lambda
+    if function.__name__ == "<lambda>" and function.__code__.co_names:
+        return function.__code__.co_names[0]
+    return function.__name__
+
+
+def measured_validator(function, observer, node_path):
+    """Wrap validator function so the time spent in every call is recorded."""
+    name = validator_name(function)
+
+    @wraps(function)
+    def validator(value):
+        start = time.perf_counter()
+        try:
+            return function(value)
+        finally:
+            observer.observe_validator(name, node_path, time.perf_counter() - start)
+
+    return validator
+
+
+def child_path(node_path, key):
+    """Construct path to schema node stored under given key."""
+    # markers like Required and Optional are converted to key names
+    return f"{node_path}.{key}" if node_path else str(key)
+
+
+def instrument_node(node, observer, node_path):
+    """Replace validator functions in schema node by measured ones."""
+    if isinstance(node, Schema):
+        return instrument_validators(node, observer, node_path)
+    if isinstance(node, MemoizedSchema):
+        return MemoizedSchema(instrument_validators(node.schema, observer, node_path), node.cache)
+    if type(node) is dict:
+        return {key: instrument_node(value, observer, child_path(node_path, key))
+                for key, value in node.items()}
+    if type(node) is list:
+        return [instrument_node(value, observer, node_path + "[]") for value in node]
+    # validator functions, not types and other voluptuous markers
+    if inspect.isfunction(node):
+        return measured_validator(node, observer, node_path or "<root>")
+    return node
+
+
+def instrument_validators(schema, observer, node_path=""):
+    """Construct schema that records time spent in all its validator functions.
+
+    Observer is called with name of validator, path to schema node in which
+    the validator is used, and time spent in the validator.
+    """
+    return Schema(instrument_node(schema.schema, observer, node_path),
+                  required=schema.required, extra=schema.extra)
+
+
+def measure_messages(validator, schema_name, registry):
+    """Wrap schema or validator so latencies and failing paths of message validations are recorded.
+
+    Verdicts are not recorded here, because messages that can't be decoded
+    and messages found in dedup cache never reach the schema. They are
+    recorded by `message_observer` when they are counted in report.
+    """
+    def validate_and_measure(payload):
+        start = time.perf_counter()
+        try:
+            result = validator(payload)
+        except Exception as e:
+            registry.observe_message(schema_name, time.perf_counter() - start,
+                                     failing_field_paths(e))
+            raise
+        registry.observe_message(schema_name, time.perf_counter() - start)
+        return result
+
+    return validate_and_measure
+
+
+def metrics_handler(registry):
+    """Construct HTTP request handler exporting metrics from registry on /metrics path."""
+    class MetricsHandler(BaseHTTPRequestHandler):
+
+        """Handler for HTTP requests sent to metrics endpoint."""
+
+        def do_GET(self):
+            """Export metrics in Prometheus text format."""
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.expose().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            """Don't log requests, the output is used by validation reports."""
+
+    return MetricsHandler
+
+
+def start_metrics_server(registry, port, address="localhost"):
+    """Start HTTP server exporting metrics on /metrics path in background thread."""
+    server = ThreadingHTTPServer((address, port), metrics_handler(registry))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def prepare_validator(schema, schema_name, args, memoized=()):
+    """Construct function to validate messages according to CLI arguments.
+
+    Sub-schemas listed in `memoized` are memoized when requested, because the
+    same sub-documents repeat across many messages.
+    """
+    set_json_decoder(select_json_decoder(args.json_decoder))
+
+    if args.memoize > 0 and memoized:
+        schema = memoize_schemas(schema, memoized, args.memoize)
+
+    metrics = args.metrics_port is not None
+    if metrics:
+        schema = instrument_validators(schema, METRICS)
+    if args.profile:
+        schema = instrument_validators(schema, PROFILER)
+        set_json_decoder(PROFILER.measured_decoder(json_decoder))
+
+    # compiled schema behaves exactly like the original one, but it is faster
+    validator = compile_schema(schema) if args.compile else schema
+
+    if metrics:
+        validator = measure_messages(validator, schema_name, METRICS)
+        set_message_observer(partial(METRICS.count_messages, schema_name))
+        start_metrics_server(METRICS, args.metrics_port)
+    if args.profile:
+        validator = PROFILER.measured_schema(validator)
+    return validator
+
+
+def print_profile(args):
+    """Display profile of validation and store it into JSON file when requested."""
+    if args.profile:
+        PROFILER.print_table()
+        if args.profile_json is not None:
+            PROFILER.write_json(args.profile_json)
@@ -17,22 +17,76 @@
 
 """Unit tests for common module."""
 
+import asyncio
 import contextlib
+import copy
 import io
+import json
+import sys
+import urllib.error
+import urllib.request
+from argparse import Namespace
 from os import path
 
+import ccx_ocp_results
+import platform_upload_announce_messages
 import pytest
+from checkpoint import Checkpoint, checkpoint_filename
 from common import (
+    JSON_DECODERS,
+    PROFILER,
+    Histogram,
+    MetricsRegistry,
+    checkpoint_from_arguments,
+    cli_arguments,
+    collect_results,
+    failing_field_paths,
+    failing_rows,
+    field_path,
+    instrument_validators,
+    json_decoder,
+    label_value,
+    line_results,
     load_json_from_file,
+    max_errors_from_arguments,
+    measure_messages,
+    merge_reports,
+    multiple_messages_results,
+    parquet_columns,
+    parquet_file_results,
+    prepare_validator,
+    print_profile,
     print_report,
     read_control_code,
+    read_parquet_row_groups,
+    read_stage,
+    sampler_from_arguments,
+    select_json_decoder,
+    set_json_decoder,
+    single_message_results,
+    sink_from_arguments,
+    split_input_file,
+    standard_decoder,
+    start_metrics_server,
     try_to_validate_message,
     try_to_validate_message_from_parquet,
+    validate_chunk,
+    validate_messages_async,
     validate_multiple_messages,
+    validate_multiple_messages_in_parallel,
     validate_parquet_file,
+    validate_parquet_file_columnar,
     validate_single_message,
+    validation_executor,
+    validator_name,
 )
-from voluptuous import Invalid, Schema
+from mapped_file import MappedFile
+from parquet_output_rule_hits import schema as rule_hits_schema
+from profiler import Profiler
+from results import ListSink, NullSink, PrintSink, format_result
+from sampling import Sampler
+from validators import uuidInBytesValidator
+from voluptuous import ALLOW_EXTRA, All, Invalid, MultipleInvalid, Required, Schema
 
 
 def test_read_control_code():
@@ -287,6 +341,626 @@ def test_validate_multiple_nonexistent_file():
     assert result["error"] == 1
 
 
+def test_split_input_file():
+    """Test the function split_input_file."""
+    path_to_payload = path_to_json("multiple_correct_and_incorrect.json")
+
+    with open(path_to_payload, "rb") as fin:
+        content = fin.read()
+
+    for chunks in range(1, 10):
+        ranges = split_input_file(path_to_payload, chunks)
+
+        # ranges must cover the whole file without gaps
+        assert ranges[0][0] == 0
+        assert ranges[-1][1] == len(content)
+        for i in range(len(ranges) - 1):
+            assert ranges[i][1] == ranges[i + 1][0]
+
+        # and each range must start on line boundary
+        for start, _ in ranges:
+            assert start == 0 or content[start - 1:start] == b"\n"
+
+
+def test_split_input_file_empty_file(tmpdir):
+    """Test the function split_input_file for empty input file."""
+    input_file = tmpdir.join("empty.json")
+    input_file.write("")
+
+    ranges = split_input_file(str(input_file), 4)
+    assert ranges == [(0, 0)]
+
+
+def test_validate_chunk():
+    """Test the function validate_chunk."""
+    schema = Schema({})
+    path_to_payload = path_to_json("multiple_correct_and_incorrect.json")
+    ranges = split_input_file(path_to_payload, 2)
+
+    # first line contains invalid message
+    result, problems = validate_chunk(schema, path_to_payload, *ranges[0])
+    assert result == {"processed": 1, "valid": 0, "invalid": 1, "error": 0}
+    assert len(problems) == 1
+    assert problems[0].index == 1
+    assert format_result(problems[0]).startswith("Validation error: ")
+
+    # second line contains valid message
+    result, problems = validate_chunk(schema, path_to_payload, *ranges[1])
+    assert result == {"processed": 1, "valid": 1, "invalid": 0, "error": 0}
+    assert problems == []
+
+
+def test_merge_reports():
+    """Test the function merge_reports."""
+    report = {"processed": 1, "valid": 2, "invalid": 3, "error": 4}
+    other = {"processed": 10, "valid": 20, "invalid": 30, "error": 40}
+
+    merged = merge_reports(report, other)
+    assert merged == {"processed": 11, "valid": 22, "invalid": 33, "error": 44}
+
+
+def test_merge_reports_with_cache_statistics():
+    """Test the function merge_reports for reports with statistics of deduplication cache."""
+    report = {"processed": 1, "valid": 2, "invalid": 3, "error": 4}
+    other = {"processed": 10, "valid": 20, "invalid": 30, "error": 40,
+             "dedup_hits": 5, "dedup_misses": 6}
+
+    merge_reports(report, other)
+    merged = merge_reports(report, other)
+    assert merged == {"processed": 21, "valid": 42, "invalid": 63, "error": 84,
+                      "dedup_hits": 10, "dedup_misses": 12}
+
+
+def write_messages_with_duplicates(input_file):
+    """Write messages, most of them repeated several times."""
+    lines = []
+    for i in range(200):
+        # every message is repeated, some of them are invalid and some can't be decoded
+        i = i % 23
+        if i % 7 == 0:
+            lines.append("{xyzzy}")
+        elif i % 3 == 0:
+            lines.append(f'{{"id": "{i}"}}')
+        else:
+            lines.append(f'{{"id": {i}}}')
+    input_file.write("\n".join(lines) + "\n")
+
+
+@pytest.mark.parametrize("verbose", (False, True))
+@pytest.mark.parametrize("dedup_cache_size", (1, 5, 1000))
+def test_validate_multiple_messages_dedup_cache(tmpdir, capsys, verbose, dedup_cache_size):
+    """Check that duplicate messages are reported the same as without the cache."""
+    schema = Schema({"id": int})
+    input_file = tmpdir.join("messages.json")
+    write_messages_with_duplicates(input_file)
+
+    expected = validate_multiple_messages(schema, str(input_file), verbose)
+    expected_output = capsys.readouterr().out
+    report = validate_multiple_messages(schema, str(input_file), verbose,
+                                        dedup_cache_size=dedup_cache_size)
+
+    assert capsys.readouterr().out == expected_output
+    assert report["dedup_hits"] + report["dedup_misses"] == 200
+    del report["dedup_hits"], report["dedup_misses"]
+    assert report == expected
+
+
+def test_validate_multiple_messages_dedup_cache_statistics(tmpdir, capsys):
+    """Check that duplicate messages are not validated again."""
+    input_file = tmpdir.join("messages.json")
+    write_messages_with_duplicates(input_file)
+    validated = []
+
+    def schema(payload):
+        validated.append(payload)
+        if not isinstance(payload["id"], int):
+            raise Invalid("not an integer")
+
+    report = validate_multiple_messages(schema, str(input_file), False, dedup_cache_size=100)
+
+    # 20 distinct lines, one of them can't be decoded
+    assert report["dedup_misses"] == 20
+    assert report["dedup_hits"] == 180
+    assert len(validated) == 19
+
+
+@pytest.mark.parametrize("jobs", (2, 3))
+def test_validate_multiple_messages_in_parallel_dedup_cache(tmpdir, capsys, jobs):
+    """Check that duplicate messages are reported the same by worker processes."""
+    schema = Schema({"id": int})
+    input_file = tmpdir.join("messages.json")
+    write_messages_with_duplicates(input_file)
+
+    expected = validate_multiple_messages(schema, str(input_file), False)
+    expected_output = capsys.readouterr().out
+    report = validate_multiple_messages(schema, str(input_file), False, jobs,
+                                        dedup_cache_size=100)
+
+    assert capsys.readouterr().out == expected_output
+    # every worker process has its own cache
+    assert 180 - 20 * jobs * 4 <= report["dedup_hits"] <= 180
+    assert report["dedup_hits"] + report["dedup_misses"] == 200
+    del report["dedup_hits"], report["dedup_misses"]
+    assert report == expected
+
+
+@pytest.mark.parametrize("jobs", (1, 2))
+@pytest.mark.parametrize("line_ending", ("\r", "\r\n"))
+def test_validate_multiple_messages_line_endings(tmpdir, capsys, jobs, line_ending):
+    """Check that lines ending with carriage return are read as in text mode."""
+    schema = Schema({"id": int})
+    lines = ['{"id": 1}', '{"id": "2"}', "{xyzzy}", '{"id": 4}']
+    input_file = tmpdir.join("messages.json")
+    input_file.write_binary("\n".join(lines).encode() + b"\n")
+    expected = validate_multiple_messages(schema, str(input_file), False)
+    expected_output = capsys.readouterr().out
+    assert expected["processed"] == 4
+
+    input_file.write_binary(line_ending.join(lines).encode() + line_ending.encode())
+    report = validate_multiple_messages(schema, str(input_file), False, jobs)
+    assert report == expected
+    assert capsys.readouterr().out == expected_output
+
+
+@pytest.mark.parametrize("jobs", (2, 3, 8))
+def test_validate_multiple_messages_in_parallel(tmpdir, jobs):
+    """Test the function validate_multiple_messages_in_parallel."""
+    schema = Schema({"id": int})
+    input_file = tmpdir.join("messages.json")
+
+    # every third message is invalid and every fifth message can't be decoded
+    lines = []
+    for i in range(100):
+        if i % 5 == 0:
+            lines.append("{xyzzy}")
+        elif i % 3 == 0:
+            lines.append(f'{{"id": "{i}"}}')
+        else:
+            lines.append(f'{{"id": {i}}}')
+    input_file.write("\n".join(lines) + "\n")
+
+    f = io.StringIO()
+    with contextlib.redirect_stdout(f):
+        expected = validate_multiple_messages(schema, str(input_file), False)
+    expected_output = f.getvalue()
+
+    f = io.StringIO()
+    with contextlib.redirect_stdout(f):
+        result = validate_multiple_messages_in_parallel(schema, str(input_file), False, jobs)
+    output = f.getvalue()
+
+    # counters and messages must be the same as for sequential validation
+    assert result == expected
+    assert output == expected_output
+
+
+def write_messages_for_resume(input_file, count=100):
+    """Write messages, some of them invalid and some not decodable."""
+    lines = []
+    for i in range(count):
+        if i % 7 == 0:
+            lines.append("{xyzzy}")
+        elif i % 3 == 0:
+            lines.append(f'{{"id": "{i}"}}')
+        else:
+            lines.append(f'{{"id": {i}}}')
+    input_file.write("\n".join(lines) + "\n")
+
+
+def interrupting_schema(schema, after):
+    """Construct validator interrupted like by Ctrl+C after given number of calls."""
+    calls = [0]
+
+    def validator(payload):
+        calls[0] += 1
+        if calls[0] > after:
+            raise KeyboardInterrupt()
+        return schema(payload)
+
+    return validator
+
+
+@pytest.mark.parametrize("interrupted_after", (0, 1, 25, 50, 84))
+@pytest.mark.parametrize("interval", (1, 10, 1000))
+def test_validate_multiple_messages_resume(tmpdir, capsys, interrupted_after, interval):
+    """Check that interrupted validation is resumed with the same final report."""
+    schema = Schema({"id": int})
+    input_file = tmpdir.join("messages.json")
+    write_messages_for_resume(input_file)
+    expected = validate_multiple_messages(schema, str(input_file), False)
+    expected_output = capsys.readouterr().out
+
+    checkpoint = Checkpoint(checkpoint_filename(str(input_file)), str(input_file), interval)
+    with pytest.raises(KeyboardInterrupt):
+        validate_multiple_messages(interrupting_schema(schema, interrupted_after),
+                                   str(input_file), False, checkpoint=checkpoint)
+    report = validate_multiple_messages(schema, str(input_file), False, checkpoint=checkpoint)
+
+    # progress is stored when validation is interrupted, so no message is
+    # reported twice
+    assert report == expected
+    assert capsys.readouterr().out == expected_output
+
+    # finished validation is not repeated
+    assert validate_multiple_messages(schema, str(input_file), False,
+                                      checkpoint=checkpoint) == expected
+    assert capsys.readouterr().out == ""
+
+
+def test_validate_multiple_messages_periodic_checkpoints(tmpdir, capsys):
+    """Check that checkpoints are stored periodically during validation."""
+    schema = Schema({"id": int})
+    input_file = tmpdir.join("messages.json")
+    write_messages_for_resume(input_file)
+    expected = validate_multiple_messages(schema, str(input_file), False)
+
+    offsets = []
+    checkpoint = Checkpoint(checkpoint_filename(str(input_file)), str(input_file), 30)
+    save = checkpoint.save
+    checkpoint.save = lambda offset, report: (offsets.append(offset), save(offset, report))
+    assert validate_multiple_messages(schema, str(input_file), False,
+                                      checkpoint=checkpoint) == expected
+
+    # after 30, 60, and 90 messages, and at the end
+    with open(str(input_file), "rb") as fin:
+        lines = fin.readlines()
+    assert offsets == [sum(len(line) for line in lines[:count]) for count in (30, 60, 90, 100)]
+
+
+@pytest.mark.parametrize("jobs", (2, 3))
+@pytest.mark.parametrize("processed", (0, 13, 50, 84))
+def test_validate_multiple_messages_in_parallel_resume(tmpdir, capsys, jobs, processed):
+    """Check that validation by worker processes is resumed with the same final report."""
+    schema = Schema({"id": int})
+    input_file = tmpdir.join("messages.json")
+    write_messages_for_resume(input_file)
+    expected = validate_multiple_messages(schema, str(input_file), False)
+    capsys.readouterr()
+
+    # checkpoint made by sequential validation interrupted after some messages
+    # (only 85 messages out of 100 can be decoded and validated)
+    checkpoint = Checkpoint(checkpoint_filename(str(input_file)), str(input_file), 1)
+    with pytest.raises(KeyboardInterrupt):
+        validate_multiple_messages(interrupting_schema(schema, processed), str(input_file),
+                                   False, checkpoint=checkpoint)
+    report = validate_multiple_messages(schema, str(input_file), False, jobs, checkpoint)
+    assert report == expected
+
+    # checkpoint made by worker processes at the end of validation
+    assert checkpoint.load() == (path.getsize(str(input_file)), expected)
+
+
+@pytest.mark.parametrize("jobs", (1, 2))
+@pytest.mark.parametrize("interrupted_after", (0, 5, 15))
+def test_validate_multiple_messages_dedup_cache_resume(tmpdir, capsys, jobs, interrupted_after):
+    """Check that statistics of deduplication cache are kept when validation is resumed."""
+    schema = Schema({"id": int})
+    input_file = tmpdir.join("messages.json")
+    write_messages_with_duplicates(input_file)
+    expected = validate_multiple_messages(schema, str(input_file), False)
+    capsys.readouterr()
+
+    checkpoint = Checkpoint(checkpoint_filename(str(input_file)), str(input_file), 10)
+    with pytest.raises(KeyboardInterrupt):
+        validate_multiple_messages(interrupting_schema(schema, interrupted_after),
+                                   str(input_file), False, checkpoint=checkpoint,
+                                   dedup_cache_size=100)
+    # lookup of the interrupted message is not counted
+    _, stored = checkpoint.load()
+    assert stored["dedup_hits"] + stored["dedup_misses"] == stored["processed"]
+
+    report = validate_multiple_messages(schema, str(input_file), False, jobs, checkpoint,
+                                        dedup_cache_size=100)
+    assert checkpoint.load()[1] == report
+
+    # every message has been looked up in cache exactly once, but messages
+    # validated before the interruption are missed once more
+    assert report["dedup_hits"] + report["dedup_misses"] == 200
+    assert report["dedup_misses"] >= 20
+    del report["dedup_hits"], report["dedup_misses"]
+    assert report == expected
+
+
+def test_validate_multiple_messages_wrong_checkpoint(tmpdir, capsys):
+    """Check that checkpoint made for other input file is reported."""
+    schema = Schema({"id": int})
+    input_file = tmpdir.join("messages.json")
+    write_messages_for_resume(input_file)
+    other_file = tmpdir.join("other.json")
+    other_file.write("{}\n")
+    Checkpoint(str(tmpdir.join("checkpoint")), str(other_file)).save(3, {
+        "processed": 1, "valid": 1, "invalid": 0, "error": 0})
+
+    for jobs in (1, 2):
+        checkpoint = Checkpoint(str(tmpdir.join("checkpoint")), str(input_file))
+        report = validate_multiple_messages(schema, str(input_file), False, jobs, checkpoint)
+        assert report == {"processed": 0, "valid": 0, "invalid": 0, "error": 1}
+        assert capsys.readouterr().out.startswith("Checkpoint-related problem: ")
+
+
+def test_checkpoint_from_arguments(monkeypatch):
+    """Check construction of checkpoint according to CLI arguments."""
+    monkeypatch.setattr(sys, "argv", ["test", "-i", "foo.json", "-m"])
+    assert checkpoint_from_arguments(cli_arguments()) is None
+
+    monkeypatch.setattr(sys, "argv", ["test", "-i", "foo.json", "-m", "--resume"])
+    checkpoint = checkpoint_from_arguments(cli_arguments())
+    assert checkpoint.filename == "foo.json.checkpoint"
+    assert checkpoint.resume
+
+    monkeypatch.setattr(sys, "argv", ["test", "-i", "foo.json", "-m", "--checkpoint", "bar",
+                                      "--checkpoint-interval", "42"])
+    checkpoint = checkpoint_from_arguments(cli_arguments())
+    assert checkpoint.filename == "bar"
+    assert checkpoint.interval == 42
+    assert not checkpoint.resume
+
+    # checkpoints are made for input files with multiple messages only
+    monkeypatch.setattr(sys, "argv", ["test", "-i", "foo.json", "--resume"])
+    with pytest.raises(SystemExit) as excinfo:
+        cli_arguments()
+    assert excinfo.value.code == 2
+
+
+@pytest.mark.parametrize("max_errors", (1, 2, 10, 1000))
+def test_validate_multiple_messages_max_errors(tmpdir, capsys, max_errors):
+    """Check that validation stops after given number of invalid messages."""
+    schema = Schema({"id": int})
+    input_file = tmpdir.join("messages.json")
+    write_messages_for_resume(input_file)
+    validate_multiple_messages(schema, str(input_file), False)
+    expected_output = capsys.readouterr().out.splitlines()
+
+    report = validate_multiple_messages(schema, str(input_file), False, max_errors=max_errors)
+    output = capsys.readouterr().out.splitlines()
+
+    # 15 messages can't be decoded and 29 messages are refused by schema
+    failures = min(max_errors, 44)
+    assert report["invalid"] + report["error"] == failures
+    assert output == expected_output[:failures]
+    assert report.get("stopped", False) == (max_errors <= 44)
+    if max_errors == 1:
+        assert report == {"processed": 1, "valid": 0, "invalid": 1, "error": 0, "stopped": True}
+
+
+@pytest.mark.parametrize("jobs", (2, 3))
+@pytest.mark.parametrize("max_errors", (1, 10))
+def test_validate_multiple_messages_in_parallel_max_errors(tmpdir, capsys, jobs, max_errors):
+    """Check that validation by worker processes stops after the chunk with too many errors."""
+    schema = Schema({"id": int})
+    input_file = tmpdir.join("messages.json")
+    write_messages_for_resume(input_file)
+    validate_multiple_messages(schema, str(input_file), False)
+    expected_output = capsys.readouterr().out.splitlines()
+
+    report = validate_multiple_messages(schema, str(input_file), False, jobs,
+                                        max_errors=max_errors)
+    output = capsys.readouterr().out.splitlines()
+
+    assert report["stopped"]
+    assert max_errors <= report["invalid"] + report["error"] < 44
+    assert report["processed"] < 100
+    # messages are reported in the same order as by sequential validation
+    assert output == expected_output[:len(output)]
+
+
+@pytest.mark.parametrize("jobs", (1, 2))
+def test_validate_multiple_messages_max_errors_resume(tmpdir, capsys, jobs):
+    """Check that validation stopped early is resumed from checkpoint."""
+    schema = Schema({"id": int})
+    input_file = tmpdir.join("messages.json")
+    write_messages_for_resume(input_file)
+    expected = validate_multiple_messages(schema, str(input_file), False)
+    expected_output = capsys.readouterr().out
+
+    checkpoint = Checkpoint(checkpoint_filename(str(input_file)), str(input_file), 1000)
+    stopped = validate_multiple_messages(schema, str(input_file), False, jobs, checkpoint,
+                                         max_errors=5)
+    assert stopped["stopped"]
+    report = validate_multiple_messages(schema, str(input_file), False, jobs, checkpoint)
+
+    assert report == expected
+    assert capsys.readouterr().out == expected_output
+
+
+def test_validate_multiple_messages_sample(tmpdir, capsys):
+    """Check validation of sample of messages."""
+    schema = Schema({"id": int})
+    input_file = tmpdir.join("messages.json")
+    write_messages_for_resume(input_file, 1000)
+
+    report = validate_multiple_messages(schema, str(input_file), False, sampler=Sampler(0.2))
+    assert 100 < report["processed"] < 300
+    assert report["processed"] + report["skipped"] == 1000
+    assert report["sample_rate"] == 0.2
+    # 43% of messages are not valid
+    assert report["invalid_ratio_low"] < 0.43 < report["invalid_ratio_high"]
+
+    # all messages are validated with sample rate 1
+    expected = validate_multiple_messages(schema, str(input_file), False)
+    report = validate_multiple_messages(schema, str(input_file), False, sampler=Sampler(1))
+    assert report["skipped"] == 0
+    assert report["invalid_ratio"] == (expected["invalid"] + expected["error"]) / 1000
+    assert {key: report[key] for key in expected} == expected
+
+
+def test_validate_multiple_messages_sample_with_checkpoint(tmpdir, capsys):
+    """Check that validation of sample of messages can't be checkpointed."""
+    schema = Schema({"id": int})
+    input_file = tmpdir.join("messages.json")
+    write_messages_for_resume(input_file)
+
+    checkpoint = Checkpoint(checkpoint_filename(str(input_file)), str(input_file))
+    report = validate_multiple_messages(schema, str(input_file), False, checkpoint=checkpoint,
+                                        sampler=Sampler(0.5))
+    assert report["error"] == 1
+    assert capsys.readouterr().out.startswith("Checkpoint-related problem: ")
+
+
+def test_triage_arguments(monkeypatch):
+    """Check arguments used to stop validation early or to validate sample of messages."""
+    monkeypatch.setattr(sys, "argv", ["test", "-i", "foo.json", "-m"])
+    args = cli_arguments()
+    assert max_errors_from_arguments(args) is None
+    assert sampler_from_arguments(args) is None
+
+    monkeypatch.setattr(sys, "argv", ["test", "-i", "foo.json", "-m", "--fail-fast"])
+    assert max_errors_from_arguments(cli_arguments()) == 1
+
+    monkeypatch.setattr(sys, "argv", ["test", "-i", "foo.json", "-m", "--max-errors", "10",
+                                      "--sample", "0.01", "--sample-method", "stride"])
+    args = cli_arguments()
+    assert max_errors_from_arguments(args) == 10
+    sampler = sampler_from_arguments(args)
+    assert sampler.rate == 0.01
+    assert sampler.method == "stride"
+
+
+@pytest.mark.parametrize("arguments", (
+    ["--fail-fast"],
+    ["-m", "--fail-fast", "--max-errors", "2"],
+    ["-m", "--max-errors", "0"],
+    ["--sample", "0.5"],
+    ["-m", "--sample", "0"],
+    ["-m", "--sample", "2"],
+    ["-m", "--sample", "0.5", "-j", "2"],
+    ["-m", "--sample", "0.5", "--resume"],
+    ["-m", "--sample", "0.5", "--sample-method", "reservoir"],
+))
+def test_triage_arguments_wrong_combinations(monkeypatch, arguments):
+    """Check that wrong combinations of arguments are refused."""
+    monkeypatch.setattr(sys, "argv", ["test", "-i", "foo.json"] + arguments)
+    with pytest.raises(SystemExit) as excinfo:
+        cli_arguments()
+    assert excinfo.value.code == 2
+
+
+@pytest.mark.parametrize("verbose", (False, True))
+@pytest.mark.parametrize("jobs", (1, 2))
+@pytest.mark.parametrize("batch_size", (1, 7, 1000))
+def test_validate_messages_async(tmpdir, capsys, verbose, jobs, batch_size):
+    """Check that asynchronous pipeline reports the same as sequential validation."""
+    schema = Schema({"id": int})
+    input_file = tmpdir.join("messages.json")
+    write_messages_for_resume(input_file)
+    expected = validate_multiple_messages(schema, str(input_file), verbose)
+    expected_output = capsys.readouterr().out
+
+    with open(str(input_file), "rb") as fin:
+        report = asyncio.run(validate_messages_async(schema, fin, verbose, jobs,
+                                                     queue_size=2, batch_size=batch_size))
+
+    assert report == expected
+    assert capsys.readouterr().out == expected_output
+
+
+def test_validate_messages_async_shared_executor(tmpdir, capsys):
+    """Check that messages from asynchronous iterable are validated by shared pool."""
+    schema = Schema({"id": int})
+    input_file = tmpdir.join("messages.json")
+    write_messages_for_resume(input_file)
+    expected = validate_multiple_messages(schema, str(input_file), False)
+    expected_output = capsys.readouterr().out
+
+    with open(str(input_file), "rb") as fin:
+        lines = fin.readlines()
+
+    async def consume(lines):
+        for line in lines:
+            # let other tasks run, like a consumer waiting for messages
+            await asyncio.sleep(0)
+            yield line
+
+    with validation_executor(schema, 2) as executor:
+        for _ in range(2):
+            report = asyncio.run(validate_messages_async(schema, consume(lines), jobs=2,
+                                                         executor=executor, batch_size=10))
+            assert report == expected
+            assert capsys.readouterr().out == expected_output
+
+
+def test_validate_messages_async_decodes_in_workers(tmpdir, capsys):
+    """Check that messages are decoded by worker processes, not by the event loop."""
+    schema = Schema({"id": int})
+    input_file = tmpdir.join("messages.json")
+    write_messages_for_resume(input_file)
+    expected = validate_multiple_messages(schema, str(input_file), False)
+    expected_output = capsys.readouterr().out
+
+    decoded_here = []
+
+    def decoder(data):
+        decoded_here.append(data)
+        return standard_decoder(data)
+
+    set_json_decoder(decoder)
+    try:
+        # slices of mapped file are sent to workers as bytes
+        with MappedFile(str(input_file)) as mapped_file:
+            lines = mapped_file.lines_in_range(0, mapped_file.size)
+            report = asyncio.run(validate_messages_async(schema, lines, jobs=2, batch_size=5))
+    finally:
+        set_json_decoder(select_json_decoder())
+
+    assert report == expected
+    assert capsys.readouterr().out == expected_output
+    assert decoded_here == []
+
+
+def test_validate_messages_async_failing_source():
+    """Check that failure of the source stops the whole pipeline."""
+    async def failing_source():
+        yield b'{"id": 1}'
+        raise OSError("connection lost")
+
+    with pytest.raises(OSError):
+        asyncio.run(validate_messages_async(Schema({"id": int}), failing_source()))
+
+
+def test_read_stage_back_pressure():
+    """Check that reader waits when the queue to next stage is full."""
+    async def read_to_full_queue():
+        queue = asyncio.Queue(2)
+        reader = asyncio.ensure_future(read_stage(iter(range(100)), queue, 10))
+        await asyncio.sleep(0.01)
+        # just two batches were read, the reader waits for free space in queue
+        assert queue.full()
+        assert not reader.done()
+        assert await queue.get() == list(range(10))
+        await asyncio.sleep(0.01)
+        assert queue.full()
+        reader.cancel()
+
+    asyncio.run(read_to_full_queue())
+
+
+def test_validate_multiple_messages_jobs():
+    """Test the function validate_multiple_messages with more worker processes."""
+    schema = Schema({})
+    path_to_payload = path_to_json("multiple_correct_and_incorrect.json")
+
+    result = validate_multiple_messages(schema, path_to_payload, True, 2)
+
+    # validate counters
+    assert result["processed"] == 2
+    assert result["valid"] == 1
+    assert result["invalid"] == 1
+    assert result["error"] == 0
+
+
+def test_validate_multiple_messages_in_parallel_nonexistent_file():
+    """Test the function validate_multiple_messages_in_parallel."""
+    schema = Schema({})
+
+    result = validate_multiple_messages_in_parallel(schema, "this_does_not_exists", True, 2)
+
+    # validate counters
+    assert result["processed"] == 0
+    assert result["valid"] == 0
+    assert result["invalid"] == 0
+    assert result["error"] == 1
+
+
 def test_validate_parquet_file_nonexistent_file():
     """Test the function validate_parquet_file."""
     schema = Schema({})
@@ -309,6 +983,91 @@ def test_validate_parquet_file_nonexistent_file():
     assert result["error"] == 1
 
 
+def test_parquet_columns():
+    """Test the function parquet_columns."""
+    columns = parquet_columns(path_to_json("rule_hits.parquet"))
+    assert columns == ["cluster_id", "rule_id", "collected_at", "archive_path"]
+
+
+def test_read_parquet_row_groups():
+    """Test the function read_parquet_row_groups."""
+    columns = ["cluster_id", "archive_path"]
+    row_groups = list(read_parquet_row_groups(path_to_json("rule_hits.parquet"), columns))
+
+    # test file contains 10 rows stored in three row groups
+    assert [len(values) for values in row_groups] == [2, 2, 2]
+    assert [len(values[0]) for values in row_groups] == [4, 4, 2]
+    assert [len(values[1]) for values in row_groups] == [4, 4, 2]
+
+    # check some values
+    assert row_groups[0][0][1] == b"not-an-uuid"
+    assert row_groups[2][1][1] == b"archives/compressed/12/123e4567/202102/08/002219.tar.gz"
+
+
+def test_failing_rows():
+    """Test the function failing_rows."""
+    values = [b"123e4567-e89b-12d3-a456-426614174000", b"foo", "", None,
+              b"123e4567-e89b-12d3-a456-426614174000"]
+
+    assert failing_rows(uuidInBytesValidator, values) == [1, 2, 3]
+    assert failing_rows(uuidInBytesValidator, []) == []
+
+
+# schemas and files to compare row by row and column by column Parquet validation
+parquet_validations = (
+        (rule_hits_schema, "rule_hits.parquet"),
+        (rule_hits_schema, "rule_hits_extra_column.parquet"),
+        (Schema({"cluster_id": bytes, "rule_id": bytes, "collected_at": object,
+                 "archive_path": bytes, "extra": bytes}), "rule_hits.parquet"),
+        (Schema({"cluster_id": bytes, "rule_id": bytes}, extra=ALLOW_EXTRA), "rule_hits.parquet"),
+        (Schema(All(dict)), "rule_hits.parquet"),
+        )
+
+
+@pytest.mark.parametrize("schema, filename", parquet_validations)
+def test_validate_parquet_file_columnar(schema, filename):
+    """Test the function validate_parquet_file_columnar."""
+    path_to_payload = path_to_json(filename)
+
+    f = io.StringIO()
+    with contextlib.redirect_stdout(f):
+        expected = validate_parquet_file(schema, path_to_payload, False)
+    expected_output = f.getvalue()
+
+    f = io.StringIO()
+    with contextlib.redirect_stdout(f):
+        result = validate_parquet_file_columnar(schema, path_to_payload, False)
+    output = f.getvalue()
+
+    # counters and messages must be the same as for row by row validation
+    assert result == expected
+    assert output == expected_output
+
+
+def test_validate_parquet_file_columnar_counters():
+    """Test the function validate_parquet_file_columnar."""
+    path_to_payload = path_to_json("rule_hits.parquet")
+
+    result = validate_parquet_file_columnar(rule_hits_schema, path_to_payload, True)
+
+    # validate counters
+    assert result["processed"] == 10
+    assert result["valid"] == 7
+    assert result["invalid"] == 3
+    assert result["error"] == 0
+
+
+def test_validate_parquet_file_columnar_nonexistent_file():
+    """Test the function validate_parquet_file_columnar."""
+    result = validate_parquet_file_columnar(rule_hits_schema, "this_does_not_exists", True)
+
+    # validate counters
+    assert result["processed"] == 0
+    assert result["valid"] == 0
+    assert result["invalid"] == 0
+    assert result["error"] == 1
+
+
 def test_print_report_in_case_of_no_error():
     """Test the function print_report."""
     result = {
@@ -339,6 +1098,57 @@ Summary:
     assert output == expected
 
 
+def test_print_report_with_sample_statistics(capsys):
+    """Test the function print_report for report from validation of sample of messages."""
+    result = {
+            "processed": 100,
+            "valid": 99,
+            "invalid": 1,
+            "error": 0,
+            "sample_rate": 0.01,
+            "skipped": 9900,
+            "invalid_ratio": 0.01,
+            "invalid_ratio_low": 0.0018,
+            "invalid_ratio_high": 0.0545,
+            "stopped": True,
+            }
+    print_report(result, True)
+    output = capsys.readouterr().out
+
+    assert "Sampled messages:   100 of 10000 (sample rate 0.01)\n" in output
+    assert "Invalid ratio:      1.000% (95% confidence interval 0.180% - 5.450%)\n" in output
+    assert "Validation stopped early, limit of invalid messages reached\n" in output
+
+
+def test_print_report_with_cache_statistics(capsys):
+    """Test the function print_report for report with statistics of deduplication cache."""
+    result = {
+            "processed": 5,
+            "valid": 5,
+            "invalid": 0,
+            "error": 0,
+            "dedup_hits": 3,
+            "dedup_misses": 2,
+            }
+    print_report(result, True)
+
+    expected = """
+Status:
+Processed messages: 5
+
+Valid messages:     5
+Invalid messages:   0
+Errors detected:    0
+
+Dedup cache hits:   3
+Dedup cache misses: 2
+
+Summary:
+[OK]: all messages have proper format
+"""
+    assert capsys.readouterr().out == expected
+
+
 def test_print_report_in_case_of_invalid_data():
     """Test the function print_report."""
     result = {
@@ -423,3 +1233,547 @@ def test_print_report_use_colors():
     assert "Summary:" in output
     assert "[OK]" in output
     assert "all messages have proper format" in output
+
+
+def load_ccx_ocp_results_message():
+    """Load correct message for ccx_ocp_results schema."""
+    with open(path.join(path.dirname(__file__), "test_data", "ccx_ocp_results.json")) as fin:
+        return json.load(fin)
+
+
+def test_histogram():
+    """Check that observed values are counted in proper buckets."""
+    histogram = Histogram((0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe(value)
+
+    assert histogram.counts == [2, 1]
+    assert histogram.count == 4
+    assert histogram.sum == pytest.approx(2.65)
+    assert histogram.expose("latency", 'schema="x"') == [
+            'latency_bucket{schema="x",le="0.1"} 2',
+            'latency_bucket{schema="x",le="1.0"} 3',
+            'latency_bucket{schema="x",le="+Inf"} 4',
+            'latency_sum{schema="x"} 2.65',
+            'latency_count{schema="x"} 4',
+            ]
+
+
+def test_label_value():
+    """Check escaping of label values."""
+    assert label_value("foo") == "foo"
+    assert label_value('a"b\\c\nd') == 'a\\"b\\\\c\\nd'
+
+
+@pytest.mark.parametrize("error_path, expected", (
+        ([], "<root>"),
+        (["Report"], "Report"),
+        (["Report", "reports", 0, "details", "error_key"], "Report.reports[].details.error_key"),
+        (["Report", "reports", 42, "tags", 1], "Report.reports[].tags[]"),
+        ))
+def test_field_path(error_path, expected):
+    """Check conversion of error paths into field paths."""
+    assert field_path(error_path) == expected
+
+
+def test_failing_field_paths():
+    """Check that all failures reported by schema are converted into field paths."""
+    message = load_ccx_ocp_results_message()
+    message["Report"]["reports"][0]["details"]["error_key"] = "not a key"
+    message["OrgID"] = -1
+
+    with pytest.raises(MultipleInvalid) as excinfo:
+        ccx_ocp_results.schema(message)
+
+    assert sorted(failing_field_paths(excinfo.value)) == [
+            "OrgID", "Report.reports[].details.error_key"]
+    assert failing_field_paths(Invalid("foo", path=["a", 0])) == ["a[]"]
+    assert failing_field_paths(ValueError("foo")) == []
+
+
+def test_metrics_registry_expose():
+    """Check export of metrics in Prometheus text format."""
+    registry = MetricsRegistry()
+    registry.count_messages("test", "valid")
+    registry.count_messages("test", "invalid")
+    registry.count_messages("test", "error", processed=False)
+    registry.observe_message("test", 0.001)
+    registry.observe_message("test", 0.002, ["a.b", "a.b", "c"])
+    registry.observe_validator("uuidValidator", "id", 0.000001)
+
+    exported = registry.expose()
+    assert 'validation_messages_total{schema="test",result="processed"} 2\n' in exported
+    assert 'validation_messages_total{schema="test",result="valid"} 1\n' in exported
+    assert 'validation_messages_total{schema="test",result="invalid"} 1\n' in exported
+    assert 'validation_messages_total{schema="test",result="error"} 1\n' in exported
+    assert 'validation_failures_total{schema="test",path="a.b"} 2\n' in exported
+    assert 'validation_failures_total{schema="test",path="c"} 1\n' in exported
+    assert 'message_validation_seconds_count{schema="test"} 2\n' in exported
+    assert 'validator_call_seconds_count{validator="uuidValidator"} 1\n' in exported
+    assert "# TYPE message_validation_seconds histogram\n" in exported
+
+
+def test_instrument_validators():
+    """Check that instrumented schema behaves like the original one and measures validators."""
+    registry = MetricsRegistry()
+    schema = instrument_validators(ccx_ocp_results.schema, registry)
+    message = load_ccx_ocp_results_message()
+
+    schema(message)
+    assert registry.validator_latency["ruleFQDNValidator"].count > 1
+    assert registry.validator_latency["timestampValidatorMs"].count == 1
+
+    # the same errors are reported
+    message["Report"]["reports"][0]["details"]["error_key"] = "not a key"
+    with pytest.raises(MultipleInvalid) as original:
+        ccx_ocp_results.schema(copy.deepcopy(message))
+    with pytest.raises(MultipleInvalid) as instrumented:
+        schema(message)
+    assert str(instrumented.value) == str(original.value)
+    assert instrumented.value.path == original.value.path
+
+
+def test_measure_messages():
+    """Check that latencies and failing paths of message validations are recorded."""
+    registry = MetricsRegistry()
+    schema = Schema({Required("id"): int})
+
+    def validator(payload):
+        if payload is None:
+            raise KeyError("payload")
+        return schema(payload)
+
+    measured = measure_messages(validator, "test", registry)
+
+    assert measured({"id": 1}) == {"id": 1}
+    with pytest.raises(MultipleInvalid):
+        measured({"id": "1"})
+    with pytest.raises(KeyError):
+        measured(None)
+
+    # verdicts are recorded when they are counted in report
+    assert not registry.messages
+    assert registry.failing_paths[("test", "id")] == 1
+    assert registry.message_latency["test"].count == 3
+
+
+def test_metrics_server():
+    """Check that metrics are exported over HTTP."""
+    registry = MetricsRegistry()
+    registry.count_messages("test", "valid")
+
+    server = start_metrics_server(registry, 0)
+    try:
+        url = f"http://localhost:{server.server_address[1]}"
+        with urllib.request.urlopen(url + "/metrics") as response:
+            assert response.status == 200
+            assert response.headers["Content-Type"].startswith("text/plain")
+            assert response.read().decode("utf-8") == registry.expose()
+
+        with pytest.raises(urllib.error.HTTPError) as excinfo:
+            urllib.request.urlopen(url + "/foo")
+        assert excinfo.value.code == 404
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_prepare_validator():
+    """Check construction of validator according to CLI arguments."""
+    schema = Schema({Required("id"): int})
+
+    args = Namespace(compile=False, metrics_port=None, profile=False, json_decoder="auto",
+                     memoize=0)
+    assert prepare_validator(schema, "test", args) is schema
+
+    args = Namespace(compile=True, metrics_port=None, profile=False, json_decoder="auto",
+                     memoize=0)
+    validator = prepare_validator(schema, "test", args)
+    assert validator is not schema
+    assert validator({"id": 1}) == {"id": 1}
+
+
+@pytest.mark.parametrize("dedup_cache_size", (0, 10))
+def test_metrics_match_report(tmpdir, capsys, monkeypatch, dedup_cache_size):
+    """Check that all counted verdicts are recorded, not just messages reaching the schema."""
+    registry = MetricsRegistry()
+    monkeypatch.setattr("common.METRICS", registry)
+    monkeypatch.setattr("common.start_metrics_server", lambda registry, port: None)
+    monkeypatch.setattr("common.message_observer", None)
+
+    # undecodable line and duplicate messages
+    input_file = tmpdir.join("messages.json")
+    input_file.write('{"id": 1}\n{"id": "x"}\n{"id": 1}\nnot a JSON\n{"id": 1}\n')
+
+    args = Namespace(compile=False, metrics_port=0, profile=False, json_decoder="auto",
+                     memoize=0)
+    validator = prepare_validator(Schema({Required("id"): int}), "test", args)
+    report = validate_multiple_messages(validator, str(input_file), False,
+                                        dedup_cache_size=dedup_cache_size)
+    capsys.readouterr()
+
+    for result in ("processed", "valid", "invalid", "error"):
+        assert registry.messages[("test", result)] == report[result]
+    assert report["processed"] == 5
+    assert report["invalid"] == 2
+
+
+def test_cli_arguments_memoize(monkeypatch):
+    """Check that memoization is accepted just for schemas with memoized sub-schemas."""
+    monkeypatch.setattr(sys, "argv", ["test", "-i", "foo", "--memoize", "100"])
+    assert cli_arguments(memoize=True).memoize == 100
+    with pytest.raises(SystemExit) as excinfo:
+        cli_arguments()
+    assert excinfo.value.code == 2
+
+    monkeypatch.setattr(sys, "argv", ["test", "-i", "foo"])
+    assert cli_arguments().memoize == 0
+
+
+def test_cli_arguments_metrics_with_jobs(monkeypatch):
+    """Check that metrics can't be collected from worker processes."""
+    monkeypatch.setattr(sys, "argv", ["test", "-i", "foo", "--metrics-port", "8000", "-j", "2"])
+    with pytest.raises(SystemExit) as excinfo:
+        cli_arguments()
+    assert excinfo.value.code == 2
+
+    monkeypatch.setattr(sys, "argv", ["test", "-i", "foo", "--metrics-port", "8000"])
+    assert cli_arguments().metrics_port == 8000
+
+
+def test_validator_name():
+    """Check names of validators used in reports."""
+    assert validator_name(uuidInBytesValidator) == "uuidInBytesValidator"
+    assert validator_name(lambda value: uuidInBytesValidator(value, 4)) == "uuidInBytesValidator"
+    assert validator_name(lambda value: None) == "<lambda>"
+
+
+def test_instrument_validators_node_paths():
+    """Check that validators are measured per schema node."""
+    profiler = Profiler()
+    schema = instrument_validators(platform_upload_announce_messages.schema, profiler)
+    with open(path.join(path.dirname(__file__), "test_data",
+                        "platform_upload_announce_messages.json")) as fin:
+        schema(json.load(fin))
+
+    assert profiler.validators["b64IdentityValidator"][0] == 1
+    assert profiler.validators["urlToAWSValidator"][0] == 1
+    assert profiler.nodes["b64_identity"][0] == 1
+    assert profiler.nodes["url"][0] == 1
+    assert "<lambda>" not in profiler.validators
+
+
+def test_set_json_decoder():
+    """Check that JSON messages are decoded by selected decoder."""
+    decoded = []
+
+    def decoder(data):
+        decoded.append(data)
+        return json_decoder(data)
+
+    set_json_decoder(decoder)
+    try:
+        try_to_validate_message(Schema({"id": int}), '{"id": 1}', 1, False)
+    finally:
+        set_json_decoder(json_decoder)
+    assert decoded == ['{"id": 1}']
+
+
+def test_prepare_validator_profile(capsys):
+    """Check that validation is profiled when requested."""
+    schema = Schema({Required("id"): int})
+    args = Namespace(compile=False, metrics_port=None, profile=True, profile_json=None,
+                     json_decoder="auto", memoize=0)
+    try:
+        validator = prepare_validator(schema, "test", args)
+        try_to_validate_message(validator, '{"id": 1}', 1, False)
+    finally:
+        set_json_decoder(json_decoder)
+
+    print_profile(args)
+    captured = capsys.readouterr()
+    assert "JSON decoding" in captured.out
+
+
+@pytest.mark.parametrize("compiled", (False, True))
+def test_prepare_validator_memoize(compiled):
+    """Check that sub-schemas are memoized when requested, also when validators are profiled."""
+    with open(path.join(path.dirname(__file__), "test_data", "ccx_ocp_results.json")) as fin:
+        message = json.load(fin)
+    args = Namespace(compile=compiled, metrics_port=None, profile=True, profile_json=None,
+                     json_decoder="auto", memoize=100)
+    try:
+        validator = prepare_validator(ccx_ocp_results.schema, "ccx_ocp_results", args,
+                                      ccx_ocp_results.memoized_schemas)
+    finally:
+        set_json_decoder(json_decoder)
+
+    validator(message)
+    calls = copy.deepcopy(PROFILER.validators)
+    validator(message)
+
+    # key values are validated in memoized sub-schemas only, so they are not
+    # validated again, unlike the other nodes
+    assert PROFILER.validators["keyValueValidator"] == calls["keyValueValidator"]
+    assert PROFILER.validators["uuidValidator"][0] > calls["uuidValidator"][0]
+
+    with pytest.raises(Invalid):
+        validator(dict(message, Report=dict(message["Report"], skips=[{}])))
+
+
+# inputs on which JSON decoders might differ
+json_decoder_inputs = (
+        '{"a": 1, "b": [1, 2.5, "x"], "c": null, "d": true}',
+        '{"a": 1, "a": 2}',
+        '{"big": 123456789012345678901234567890}',
+        '{"float": 1e400, "negative": -1e400, "small": 1e-400}',
+        "[NaN, Infinity, -Infinity]",
+        '"\\ud800"',
+        '"\\u00e9\\u2603"',
+        '"caf\u00e9 \u2603"',
+        '\ufeff{"a": 1}',
+        '{"a": 1} ',
+        '  {"a": 1}\r\n',
+        '{"a": 1}\n',
+        '{"a": 1} x',
+        '{"a": "tab\there"}',
+        '{"a": 01}',
+        '{"a": .5}',
+        '{"a": -0}',
+        '{"a": 1.0}',
+        "{'a': 1}",
+        '{"a": 1,}',
+        "",
+        " ",
+        "null",
+        "[" * 500 + "]" * 500,
+        '{"int64": 9223372036854775807, "min": -9223372036854775808}',
+        '{"uint64": 18446744073709551615}',
+        '{"too_big": 18446744073709551616, "too_small": -9223372036854775809}',
+        '{"string": "12345678901234567890123"}',
+        '{"float": 1.1111111111111111111111111111111}',
+        )
+
+
+def json_decoding_outcome(decoder, data):
+    """Decode data and return the result or type and message of exception."""
+    try:
+        return "ok", repr(decoder(data))
+    except Exception as e:
+        return type(e), str(e)
+
+
+@pytest.mark.parametrize("name", JSON_DECODERS)
+@pytest.mark.parametrize("data", json_decoder_inputs)
+def test_json_decoders_same_behaviour(name, data):
+    """Check that all JSON decoders decode the same values and report the same errors."""
+    decoder = JSON_DECODERS[name]
+    assert json_decoding_outcome(decoder, data) == json_decoding_outcome(json.loads, data)
+
+    # decoding from bytes, including bytes that are not proper UTF-8; bytes
+    # are decoded strictly as UTF-8, other encodings are not detected
+    for encoded in (data.encode("utf-8", "surrogatepass"), data.encode("utf-16"),
+                    data.encode("latin-1", "replace"), b"\xef\xbb\xbf" + data.encode("utf-8")):
+        expected = json_decoding_outcome(lambda data: json.loads(str(data, "utf-8")), encoded)
+        assert json_decoding_outcome(decoder, encoded) == expected
+        # lines read from mapped files
+        assert json_decoding_outcome(decoder, memoryview(encoded)) == expected
+
+
+@pytest.mark.parametrize("name", JSON_DECODERS)
+def test_json_decoders_refuse_other_encodings(tmpdir, capsys, name):
+    """Check that messages with UTF-8 BOM or in UTF-16 are invalid, like when read as text."""
+    input_file = tmpdir.join("messages.json")
+    input_file.write_binary(b'{"id": 1}\n\xef\xbb\xbf{"id": 2}\n' + '{"id": 3}'.encode("utf-16") +
+                            b"\n")
+    single_file = tmpdir.join("message.json")
+    single_file.write_binary(b'\xef\xbb\xbf{"id": 1}')
+    schema = Schema({"id": int})
+
+    set_json_decoder(JSON_DECODERS[name])
+    try:
+        report = validate_multiple_messages(schema, str(input_file), False)
+        assert report == {"processed": 3, "valid": 1, "invalid": 2, "error": 0}
+        assert "Unexpected UTF-8 BOM" in capsys.readouterr().out
+
+        report = validate_single_message(schema, str(single_file), False)
+        assert report["valid"] == 0
+        assert report["invalid"] == 1
+        assert "Unexpected UTF-8 BOM" in capsys.readouterr().out
+    finally:
+        set_json_decoder(select_json_decoder())
+
+
+def test_select_json_decoder():
+    """Check selection of JSON decoder."""
+    assert select_json_decoder("json") is standard_decoder
+    assert select_json_decoder() is JSON_DECODERS.get("orjson", standard_decoder)
+    with pytest.raises(ValueError):
+        select_json_decoder("xyzzy")
+
+
+@pytest.mark.parametrize("name", JSON_DECODERS)
+@pytest.mark.parametrize("filename", ("multiple_ok.json", "multiple_incorrect.json",
+                                      "multiple_correct_and_incorrect.json"))
+def test_validate_multiple_messages_json_decoders(capsys, name, filename):
+    """Check that validation reports are the same for all JSON decoders."""
+    input_file = path.join(path.dirname(__file__), "test_data", filename)
+    schema = Schema({"id": int}, extra=ALLOW_EXTRA)
+
+    set_json_decoder(standard_decoder)
+    expected = validate_multiple_messages(schema, input_file, False)
+    expected_output = capsys.readouterr().out
+
+    set_json_decoder(JSON_DECODERS[name])
+    try:
+        report = validate_multiple_messages(schema, input_file, False)
+    finally:
+        set_json_decoder(select_json_decoder())
+
+    assert report == expected
+    assert capsys.readouterr().out == expected_output
+
+
+@pytest.mark.parametrize("verbose", (False, True))
+@pytest.mark.parametrize("buffer_size", (0, 10))
+def test_multiple_messages_results(tmpdir, capsys, verbose, buffer_size):
+    """Check that collected results are the same as report and output of validator."""
+    schema = Schema({"id": int})
+    input_file = tmpdir.join("messages.json")
+    write_messages_with_duplicates(input_file)
+
+    expected = validate_multiple_messages(schema, str(input_file), verbose)
+    expected_output = capsys.readouterr().out
+    sink = PrintSink(verbose=verbose, buffer_size=buffer_size)
+    report = collect_results(multiple_messages_results(schema, str(input_file)), sink)
+
+    assert report == expected
+    assert capsys.readouterr().out == expected_output
+
+
+def test_multiple_messages_results_without_sink(tmpdir, capsys):
+    """Check that nothing is printed when results are just counted."""
+    schema = Schema({"id": int})
+    input_file = tmpdir.join("messages.json")
+    write_messages_with_duplicates(input_file)
+
+    expected = validate_multiple_messages(schema, str(input_file), False)
+    capsys.readouterr()
+    report = collect_results(multiple_messages_results(schema, str(input_file)))
+
+    assert report == expected
+    assert capsys.readouterr().out == ""
+
+
+def test_multiple_messages_results_records():
+    """Check structured results of validation of multiple messages."""
+    schema = Schema({"id": int})
+    sink = ListSink(all_results=True)
+    collect_results(line_results(schema, [b'{"id": 1}', b'{"id": "x"}', b"{xyzzy}"], 5), sink)
+
+    assert [result.index for result in sink.results] == [5, 6, 7]
+    assert [result.status for result in sink.results] == ["valid", "invalid", "invalid"]
+    assert sink.results[0].error_path is None
+    assert sink.results[1].error_path == ["id"]
+    assert sink.results[1].message == "expected int for dictionary value @ data['id']"
+
+
+def test_multiple_messages_results_nonexistent_file():
+    """Check that problem with input file is reported, but not counted as message."""
+    sink = ListSink()
+    report = collect_results(multiple_messages_results(Schema({}), "this-does-not-exist"), sink)
+
+    assert report == {"processed": 0, "valid": 0, "invalid": 0, "error": 1}
+    assert len(sink.results) == 1
+    assert sink.results[0].index is None
+
+
+def test_single_message_results():
+    """Check structured result of validation of single message."""
+    schema = Schema({"foo": str})
+    report = collect_results(single_message_results(schema, path_to_json("test.json")))
+    assert report == {"processed": 1, "valid": 1, "invalid": 0, "error": 0}
+
+    sink = ListSink()
+    report = collect_results(single_message_results(Schema({}), "this-does-not-exist"), sink)
+    assert report == {"processed": 0, "valid": 0, "invalid": 0, "error": 1}
+
+
+def test_parquet_file_results():
+    """Check that structured results of Parquet file are counted as by the validator."""
+    sink = ListSink()
+    report = collect_results(parquet_file_results(rule_hits_schema,
+                                                  path_to_json("rule_hits.parquet")), sink)
+
+    assert report == {"processed": 10, "valid": 7, "invalid": 3, "error": 0}
+    assert [result.status for result in sink.results] == ["invalid"] * 3
+
+
+@pytest.mark.parametrize("filename, expected, prefix", (
+        ("test.json", {"processed": 1, "valid": 1, "invalid": 0, "error": 0}, None),
+        ("error.json", {"processed": 0, "valid": 0, "invalid": 1, "error": 0},
+         "Validation error: "),
+        ("this-does-not-exist.json", {"processed": 0, "valid": 0, "invalid": 0, "error": 1},
+         "File-related problem: "),
+        ))
+def test_validate_single_message_results(capsys, filename, expected, prefix):
+    """Check that validator reports the same counters and problems as structured results."""
+    schema = Schema({"foo": str})
+    report = validate_single_message(schema, path_to_json(filename), False)
+    output = capsys.readouterr().out
+    assert report == expected
+    assert collect_results(single_message_results(schema, path_to_json(filename))) == expected
+
+    if prefix is None:
+        assert output == ""
+    else:
+        assert output.startswith(prefix)
+        assert output.count("\n") == 1
+
+
+def test_validate_parquet_file_prints_rows(capsys):
+    """Check that invalid rows are printed after problems, as by collected results."""
+    input_file = path_to_json("rule_hits.parquet")
+    report = validate_parquet_file(rule_hits_schema, input_file, False)
+    output = capsys.readouterr().out
+    assert report == {"processed": 10, "valid": 7, "invalid": 3, "error": 0}
+
+    collect_results(parquet_file_results(rule_hits_schema, input_file), PrintSink())
+    assert capsys.readouterr().out == output
+    lines = output.splitlines()
+    assert len(lines) == 6
+    assert all(line.startswith("Validation error: ") for line in lines[::2])
+    assert all("cluster_id" in line for line in lines[1::2])
+
+
+@pytest.mark.parametrize("jobs", (1, 2))
+def test_validate_multiple_messages_with_sink(tmpdir, capsys, jobs):
+    """Check that problems are passed to given sink instead of being printed."""
+    schema = Schema({"id": int})
+    input_file = tmpdir.join("messages.json")
+    write_messages_with_duplicates(input_file)
+    expected = validate_multiple_messages(schema, str(input_file), False, jobs)
+    capsys.readouterr()
+
+    sink = ListSink()
+    assert validate_multiple_messages(schema, str(input_file), False, jobs, sink=sink) == expected
+    assert validate_multiple_messages(schema, str(input_file), False, jobs,
+                                      sink=NullSink()) == expected
+    assert capsys.readouterr().out == ""
+    assert len(sink.results) == expected["invalid"] + expected["error"]
+    assert [result.index for result in sink.results] == sorted(
+        result.index for result in sink.results)
+
+
+@pytest.mark.parametrize("args, sink_type", (
+        ([], PrintSink),
+        (["-q"], NullSink),
+        (["--output-buffer", "100"], PrintSink),
+        ))
+def test_sink_from_arguments(monkeypatch, args, sink_type):
+    """Check that problems can be switched off or buffered from command line."""
+    monkeypatch.setattr(sys, "argv", ["validator.py", "-i", "input.json"] + args)
+    sink = sink_from_arguments(cli_arguments())
+    assert type(sink) is sink_type
+    if "--output-buffer" in args:
+        assert sink.buffer_size == 100
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# vim: set fileencoding=utf-8
+
+# Copyright © 2024 Pavel Tisnovsky
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Bounded cache with least recently used entries evicted first.
+
+Unlike functools.lru_cache, the cache is keyed explicitly by the caller (for
+example by hash of the raw message), so the key does not need to be derived
+from function arguments, and numbers of hits and misses are available to be
+displayed in reports.
+"""
+
+from collections import OrderedDict
+
+
+class LRUCache:
+
+    """Bounded mapping that evicts the least recently used entry when it is full."""
+
+    def __init__(self, maxsize):
+        """Initialize empty cache with given maximum number of entries."""
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        """Retrieve number of cached entries."""
+        return len(self.entries)
+
+    def get(self, key, default=None):
+        """Retrieve cached value and mark it as recently used, or return default."""
+        try:
+            value = self.entries[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        """Store value in cache, evict the least recently used entry when cache is full."""
+        if self.maxsize <= 0:
+            return
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def hit_rate(self):
+        """Compute ratio of lookups answered from cache."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
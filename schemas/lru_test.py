@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# vim: set fileencoding=utf-8
+
+# Copyright © 2024 Pavel Tisnovsky
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unit tests for lru module."""
+
+from lru import LRUCache
+
+
+def test_get_and_put():
+    """Check that stored values are retrieved and lookups are counted."""
+    cache = LRUCache(10)
+    assert cache.get("a") is None
+    assert cache.get("a", 42) == 42
+    cache.put("a", 1)
+    assert cache.get("a") == 1
+    assert len(cache) == 1
+    assert cache.hits == 1
+    assert cache.misses == 2
+    assert cache.hit_rate() == 1 / 3
+
+
+def test_eviction_of_least_recently_used():
+    """Check that the least recently used entry is evicted when the cache is full."""
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    # "a" becomes the most recently used entry
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_replace_value():
+    """Check that stored value can be replaced without eviction of other entries."""
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.put("a", 3)
+    assert len(cache) == 2
+    assert cache.get("a") == 3
+    assert cache.get("b") == 2
+
+
+def test_disabled_cache():
+    """Check that nothing is stored in cache with zero size."""
+    cache = LRUCache(0)
+    cache.put("a", 1)
+    assert len(cache) == 0
+    assert cache.get("a") is None
+    assert cache.hit_rate() == 0.0
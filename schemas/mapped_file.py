@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# vim: set fileencoding=utf-8
+
+# Copyright © 2024 Pavel Tisnovsky
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Memory-mapped reader of files with one JSON message per line.
+
+Lines are yielded as memoryview slices of the mapped file, so they are
+neither copied nor decoded into strings. Lines are split the same way as in
+files opened in text mode with universal newlines, i.e. line feed, carriage
+return followed by line feed and lone carriage return end the line. Each line
+contains its original line ending, it is not translated to line feed.
+
+The index of line offsets is constructed when it is needed for the first
+time. It allows the caller to start reading at the Nth line, or to split the
+file into byte ranges that are validated by worker processes.
+"""
+
+import mmap
+import re
+from array import array
+from bisect import bisect_left
+
+# line endings recognized by universal newlines mode
+LINE_ENDING = re.compile(rb"\r\n?|\n")
+
+
+class MappedFile:
+
+    """File mapped into memory and read line by line."""
+
+    def __init__(self, filename):
+        """Open the file and map it into memory."""
+        with open(filename, "rb") as fin:
+            fin.seek(0, 2)
+            self.size = fin.tell()
+            # empty files can't be mapped
+            if self.size > 0:
+                self.mapping = mmap.mmap(fin.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                self.mapping = b""
+        self.view = memoryview(self.mapping)
+        self._offsets = None
+        # files without carriage returns are split just by searching for line feeds
+        if self.mapping.find(b"\r") < 0:
+            self.line_end = self.line_end_newline
+        else:
+            self.line_end = self.line_end_universal
+
+    def __enter__(self):
+        """Use the mapped file as a context manager."""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Unmap the file when leaving the context."""
+        self.close()
+
+    def close(self):
+        """Unmap the file, or let it unmap when the last line slice is released."""
+        self.view.release()
+        if isinstance(self.mapping, mmap.mmap):
+            try:
+                self.mapping.close()
+            except BufferError:
+                # some line slices are still referenced by the caller
+                pass
+
+    def line_end_newline(self, position):
+        """Find the end of line ending that is at the position or after it, just line feeds."""
+        newline = self.mapping.find(b"\n", position)
+        return self.size if newline < 0 else newline + 1
+
+    def line_end_universal(self, position):
+        """Find the end of line ending that is at the position or after it, any line ending."""
+        match = LINE_ENDING.search(self.mapping, position)
+        return self.size if match is None else match.end()
+
+    def next_line_start(self, position):
+        """Find the beginning of the first line that starts at the position or after it."""
+        if position <= 0:
+            return 0
+        return self.line_end(position - 1)
+
+    def lines_in_range(self, start, end):
+        """Yield lines that start in the given byte range, the range starts on line boundary."""
+        line_end = self.line_end
+        view = self.view
+        end = min(end, self.size)
+        while start < end:
+            stop = line_end(start)
+            yield view[start:stop]
+            start = stop
+
+    def __iter__(self):
+        """Yield all lines from the file."""
+        return self.lines_in_range(0, self.size)
+
+    @property
+    def offsets(self):
+        """Index of offsets where the lines start, constructed when needed for the first time."""
+        if self._offsets is None:
+            offsets = array("q")
+            line_end = self.line_end
+            position = 0
+            while position < self.size:
+                offsets.append(position)
+                position = line_end(position)
+            self._offsets = offsets
+        return self._offsets
+
+    def __len__(self):
+        """Retrieve number of lines in the file."""
+        return len(self.offsets)
+
+    def line_offset(self, index):
+        """Retrieve offset of the line with given index, or file size if there is no such line."""
+        offsets = self.offsets
+        return offsets[index] if index < len(offsets) else self.size
+
+    def line_index(self, offset):
+        """Retrieve index of the first line that starts at the offset or after it."""
+        return bisect_left(self.offsets, offset)
+
+    def lines(self, first=0):
+        """Yield lines from the file, starting from the line with given index."""
+        return self.lines_in_range(self.line_offset(first), self.size)
+
+    def line(self, index):
+        """Retrieve line with given index."""
+        return self.view[self.line_offset(index):self.line_offset(index + 1)]
+
+    def byte_ranges(self, chunks, start=0):
+        """Split the file from given line offset into byte ranges aligned to line boundaries."""
+        boundaries = [start]
+        for i in range(1, chunks):
+            offset = self.next_line_start(start + (self.size - start) * i // chunks)
+            if boundaries[-1] < offset < self.size:
+                boundaries.append(offset)
+        boundaries.append(self.size)
+        return [(boundaries[i], boundaries[i + 1]) for i in range(len(boundaries) - 1)]
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# vim: set fileencoding=utf-8
+
+# Copyright © 2024 Pavel Tisnovsky
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unit tests for mapped_file module."""
+
+import pytest
+from mapped_file import MappedFile
+
+# file contents with different line endings and empty lines
+file_contents = (
+    b"",
+    b"\n",
+    b"{}",
+    b"{}\n",
+    b'{"a": 1}\n{"b": 2}\n{"c": 3}',
+    b'{"a": 1}\n\n\n{"b": 2}\n',
+    b'{"a": 1}\r\n{"b": 2}\r\n',
+    b'{"a": 1}\r{"b": 2}\r',
+    b'{"a": 1}\r\r\n{"b": 2}\n\r{"c": 3}\r',
+    b"\r",
+    '{"é": "☃"}\n{}\n'.encode(),
+)
+
+
+@pytest.fixture(params=file_contents)
+def input_file(request, tmpdir):
+    """Write file with selected contents."""
+    filename = tmpdir.join("messages.json")
+    filename.write_binary(request.param)
+    return str(filename)
+
+
+def file_lines(filename):
+    """Read lines from file opened in text mode with universal newlines, not translated."""
+    with open(filename, encoding="latin-1", newline="") as fin:
+        return [line.encode("latin-1") for line in fin]
+
+
+def test_iterate_lines(input_file):
+    """Check that the same lines are read as from file opened in text mode."""
+    with MappedFile(input_file) as mapped_file:
+        lines = [bytes(line) for line in mapped_file]
+    assert lines == file_lines(input_file)
+
+
+def test_lines_are_memoryviews(input_file):
+    """Check that lines are slices of mapped file, not copies."""
+    with MappedFile(input_file) as mapped_file:
+        assert all(isinstance(line, memoryview) for line in mapped_file)
+
+
+def test_offsets(input_file):
+    """Check index of line offsets."""
+    expected = file_lines(input_file)
+    with MappedFile(input_file) as mapped_file:
+        assert len(mapped_file) == len(expected)
+        for index, line in enumerate(expected):
+            assert mapped_file.line_offset(index) == sum(len(e) for e in expected[:index])
+            assert bytes(mapped_file.line(index)) == line
+            assert mapped_file.line_index(mapped_file.line_offset(index)) == index
+        assert mapped_file.line_offset(len(expected)) == mapped_file.size
+
+
+def test_lines_from_nth_line(input_file):
+    """Check that reading can start from any line."""
+    expected = file_lines(input_file)
+    with MappedFile(input_file) as mapped_file:
+        for first in range(len(expected) + 2):
+            assert [bytes(line) for line in mapped_file.lines(first)] == expected[first:]
+
+
+@pytest.mark.parametrize("chunks", (1, 2, 3, 5, 100))
+def test_byte_ranges(input_file, chunks):
+    """Check that byte ranges cover the whole file and start on line boundaries."""
+    expected = file_lines(input_file)
+    with MappedFile(input_file) as mapped_file:
+        ranges = mapped_file.byte_ranges(chunks)
+        assert ranges[0][0] == 0
+        assert ranges[-1][1] == mapped_file.size
+        assert len(ranges) <= chunks
+
+        lines = []
+        for start, end in ranges:
+            assert start < end or mapped_file.size == 0
+            assert start in mapped_file.offsets or start == 0
+            lines.extend(bytes(line) for line in mapped_file.lines_in_range(start, end))
+        assert lines == expected
+
+
+def test_next_line_start(tmpdir):
+    """Check search of line boundaries."""
+    filename = tmpdir.join("messages.json")
+    filename.write_binary(b"abc\ndef\n")
+    with MappedFile(str(filename)) as mapped_file:
+        assert [mapped_file.next_line_start(p) for p in range(10)] == [0, 4, 4, 4, 4, 8, 8, 8,
+                                                                       8, 8]
+
+
+def test_next_line_start_carriage_return(tmpdir):
+    """Check search of line boundaries when lines end with carriage return."""
+    filename = tmpdir.join("messages.json")
+    filename.write_binary(b"ab\r\ncd\ref\n")
+    with MappedFile(str(filename)) as mapped_file:
+        assert [mapped_file.next_line_start(p) for p in range(11)] == [0, 4, 4, 4, 4, 7, 7, 7,
+                                                                       10, 10, 10]
+
+
+def test_close_with_referenced_line(tmpdir):
+    """Check that file can be closed even when some line is still referenced."""
+    filename = tmpdir.join("messages.json")
+    filename.write_binary(b"abc\ndef\n")
+    with MappedFile(str(filename)) as mapped_file:
+        line = mapped_file.line(1)
+    assert bytes(line) == b"def\n"
+
+
+def test_missing_file():
+    """Check that problem with opening file is reported by OSError."""
+    with pytest.raises(OSError):
+        MappedFile("this_does_not_exist.json")
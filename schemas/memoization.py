@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# vim: set fileencoding=utf-8
+
+# Copyright © 2024 Pavel Tisnovsky
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Memoized validation of sub-documents that repeat across many messages.
+
+The same rule usually fires with the same details on thousands of clusters,
+so the same sub-documents (reports, skips, info nodes) are validated over and
+over. Sub-documents accepted by a memoized schema are remembered by their
+canonical JSON representation (with sorted keys), and identical
+sub-documents are accepted without validation later. The cache is bounded,
+the least recently used sub-documents are evicted first.
+
+Sub-documents refused by the schema are never cached, so they are always
+validated and reported exactly as without memoization. The canonical
+representation is exact for data decoded from JSON (dictionaries with string
+keys, lists, strings, numbers, booleans and None), other data, for example
+tuples, would share representation with JSON lists.
+
+Validators of single string values that repeat across messages (for example
+the same encoded identity sent with every upload from one system) can be
+memoized too. Their verdicts, including refusals, are cached by the value
+itself, so a repeated value costs just one lookup.
+"""
+
+import copy
+import json
+from functools import wraps
+
+from lru import LRUCache
+from voluptuous import Invalid, Schema
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# number of accepted sub-documents remembered for each memoized schema by default
+DEFAULT_MEMOIZATION_CACHE_SIZE = 10000
+
+# types of values whose verdicts are cached by memoized validators, other
+# values can be unhashable or equal to values of different types (1 == True)
+MEMOIZED_VALUE_TYPES = (str, bytes)
+
+
+def string_keys_only(data):
+    """Check that all keys of all objects in data are strings."""
+    if type(data) is dict:
+        return all(type(key) is str and string_keys_only(value) for key, value in data.items())
+    if type(data) is list:
+        return all(string_keys_only(item) for item in data)
+    return True
+
+
+def fingerprint(data):
+    """Construct canonical JSON representation of data decoded from JSON, None if not possible."""
+    try:
+        if orjson is None:
+            # the standard encoder converts keys to strings, so {1: "a"} and
+            # {"1": "a"} would share fingerprint
+            if not string_keys_only(data):
+                return None
+            return json.dumps(data, sort_keys=True, separators=(",", ":"))
+        encoded = orjson.dumps(data, option=orjson.OPT_SORT_KEYS)
+    except (TypeError, ValueError):
+        # orjson refuses non-string keys and integers that don't fit into 64 bits
+        return None
+    # orjson encodes NaN and infinity as null, the standard encoder keeps them
+    # distinct from None
+    if b"null" in encoded:
+        return json.dumps(data, sort_keys=True, separators=(",", ":"))
+    return encoded
+
+
+class MemoizedSchema:
+
+    """Schema that remembers accepted sub-documents and does not validate them again.
+
+    Sub-documents accepted from cache are returned unchanged, not as
+    constructed by voluptuous.
+    """
+
+    def __init__(self, schema, cache):
+        """Initialize memoized schema with its own cache."""
+        self.schema = schema
+        self.cache = cache
+
+    def __call__(self, data):
+        """Validate data, unless the same data have been accepted before."""
+        key = fingerprint(data)
+        if key is not None and self.cache.get(key) is not None:
+            return data
+        output = self.schema(data)
+        # only accepted data get here, exception is raised for refused ones
+        if key is not None:
+            self.cache.put(key, True)
+        return output
+
+    def __repr__(self):
+        """Represent memoized schema like the original one."""
+        return repr(self.schema)
+
+
+def memoized_validator(function, cache):
+    """Wrap validator function so its verdicts for repeated values are taken from cache.
+
+    Values refused by the validator are cached too, a copy of the original
+    exception is raised for them, so they are reported exactly as without
+    memoization. Only refusals (ValueError and Invalid) are cached, other
+    exceptions are raised again whenever the value is validated.
+    """
+    @wraps(function)
+    def validator(value):
+        if type(value) not in MEMOIZED_VALUE_TYPES:
+            return function(value)
+        verdict = cache.get(value)
+        if verdict is None:
+            try:
+                verdict = (True, function(value))
+            except (ValueError, Invalid) as e:
+                # the exception is modified by voluptuous when it is raised
+                # through the schema, so its pristine copy is cached
+                cache.put(value, (False, copy.deepcopy(e)))
+                raise
+            cache.put(value, verdict)
+        accepted, result = verdict
+        if accepted:
+            return result
+        raise copy.deepcopy(result)
+
+    return validator
+
+
+def memoize_node(node, subschemas, cache_size):
+    """Replace selected schemas in schema node by memoized ones."""
+    if any(node is subschema for subschema in subschemas):
+        return MemoizedSchema(node, LRUCache(cache_size))
+    if isinstance(node, Schema):
+        return memoize_schemas(node, subschemas, cache_size)
+    if type(node) is dict:
+        return {key: memoize_node(value, subschemas, cache_size) for key, value in node.items()}
+    if type(node) is list:
+        return [memoize_node(value, subschemas, cache_size) for value in node]
+    return node
+
+
+def memoize_schemas(schema, subschemas, cache_size=DEFAULT_MEMOIZATION_CACHE_SIZE):
+    """Construct schema in which the selected sub-schemas are memoized.
+
+    Every memoized sub-schema has its own cache with the given number of
+    entries, so identical data validated by different sub-schemas never
+    share a verdict.
+    """
+    return Schema(memoize_node(schema.schema, subschemas, cache_size),
+                  required=schema.required, extra=schema.extra)
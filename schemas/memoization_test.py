@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# vim: set fileencoding=utf-8
+
+# Copyright © 2024 Pavel Tisnovsky
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unit tests for memoization module."""
+
+import json
+from os import path
+
+import ccx_ocp_results
+import pytest
+from lru import LRUCache
+from memoization import MemoizedSchema, fingerprint, memoize_schemas, memoized_validator
+from voluptuous import Invalid, MultipleInvalid, Required, Schema
+
+# pairs of values that must have different fingerprints
+distinct_values = (
+    (1, 1.0),
+    (1, True),
+    (0, False),
+    (None, float("nan")),
+    (None, float("inf")),
+    (float("inf"), float("-inf")),
+    ("1", 1),
+    ("null", None),
+    ([], {}),
+    ([1, 2], [2, 1]),
+    ({"a": None}, {"a": float("nan")}),
+    ({"a": 1}, {"a": 1, "b": 2}),
+    (0.1, 0.1000000000000001),
+    ("é", "e"),
+)
+
+
+@pytest.mark.parametrize("first, second", distinct_values)
+def test_fingerprint_distinct_values(first, second):
+    """Check that different values have different fingerprints."""
+    assert fingerprint(first) is not None
+    assert fingerprint(first) != fingerprint(second)
+
+
+def test_fingerprint_canonical():
+    """Check that order of keys does not matter."""
+    assert fingerprint({"a": 1, "b": [1, {"c": 2, "d": 3}]}) == \
+        fingerprint({"b": [1, {"d": 3, "c": 2}], "a": 1})
+
+
+def test_fingerprint_not_possible():
+    """Check that data that can't be represented exactly have no fingerprint."""
+    assert fingerprint({1: "a"}) is None
+    assert fingerprint({"a": object()}) is None
+
+
+@pytest.mark.parametrize("first, second", distinct_values)
+def test_fingerprint_without_orjson(monkeypatch, first, second):
+    """Check that fingerprints constructed by the standard encoder are distinct too."""
+    monkeypatch.setattr("memoization.orjson", None)
+    assert fingerprint(first) is not None
+    assert fingerprint(first) != fingerprint(second)
+
+
+def test_fingerprint_not_possible_without_orjson(monkeypatch):
+    """Check that data with keys that are not strings have no fingerprint."""
+    monkeypatch.setattr("memoization.orjson", None)
+    assert fingerprint({1: "a"}) is None
+    assert fingerprint([{"a": {True: 1}}]) is None
+    assert fingerprint({"a": object()}) is None
+    assert fingerprint({"1": "a"}) == '{"1":"a"}'
+
+
+def counting_schema():
+    """Construct schema that counts how many times it validated data."""
+    calls = []
+    schema = Schema({Required("id"): int})
+
+    def validate(data):
+        calls.append(data)
+        return schema(data)
+
+    return validate, calls
+
+
+def test_memoized_schema_accepted_data():
+    """Check that accepted data are not validated again."""
+    schema, calls = counting_schema()
+    memoized = MemoizedSchema(schema, LRUCache(10))
+
+    for _ in range(5):
+        assert memoized({"id": 1}) == {"id": 1}
+    assert len(calls) == 1
+    assert memoized.cache.hits == 4
+
+
+def test_memoized_schema_refused_data():
+    """Check that refused data are never cached and always reported the same."""
+    schema, calls = counting_schema()
+    memoized = MemoizedSchema(schema, LRUCache(10))
+
+    for _ in range(5):
+        with pytest.raises(MultipleInvalid) as excinfo:
+            memoized({"id": "1"})
+        assert str(excinfo.value) == "expected int for dictionary value @ data['id']"
+    assert len(calls) == 5
+    assert len(memoized.cache) == 0
+
+
+def test_memoized_schema_eviction():
+    """Check that memoized schema remembers limited number of data."""
+    schema, calls = counting_schema()
+    memoized = MemoizedSchema(schema, LRUCache(2))
+
+    for i in (1, 2, 3, 1):
+        memoized({"id": i})
+    # the first data were evicted
+    assert len(calls) == 4
+    assert len(memoized.cache) == 2
+
+
+def test_memoize_schemas():
+    """Check that only selected sub-schemas are memoized, each with its own cache."""
+    memoized = memoize_schemas(ccx_ocp_results.schema, ccx_ocp_results.memoized_schemas, 100)
+    report = memoized.schema[Required("Report")].schema
+
+    caches = [report[Required(key)][0].cache for key in ("reports", "skips", "info")]
+    assert all(isinstance(report[Required(key)][0], MemoizedSchema)
+               for key in ("reports", "skips", "info"))
+    assert not isinstance(report[Required("fingerprints")][0], MemoizedSchema)
+    assert len({id(cache) for cache in caches}) == 3
+
+    with open(path.join(path.dirname(__file__), "test_data", "ccx_ocp_results.json")) as fin:
+        message = json.load(fin)
+    for _ in range(3):
+        memoized(message)
+    assert [cache.hits for cache in caches] == [2, 2 * 11, 2]
+
+
+def test_memoize_schemas_error_paths():
+    """Check that error paths in memoized sub-schemas are the same as in the original schema."""
+    item = Schema({Required("id"): int})
+    schema = Schema({Required("items"): [item]})
+    memoized = memoize_schemas(schema, (item,), 10)
+
+    memoized({"items": [{"id": 1}, {"id": 2}]})
+    data = {"items": [{"id": 1}, {"id": "2"}]}
+    with pytest.raises(Invalid) as expected:
+        schema(data)
+    with pytest.raises(Invalid) as excinfo:
+        memoized(data)
+    assert str(excinfo.value) == str(expected.value)
+    assert excinfo.value.path == expected.value.path == ["items", 1, "id"]
+
+
+def counting_validator():
+    """Construct validator that counts how many times it validated value."""
+    calls = []
+
+    def validate(value):
+        calls.append(value)
+        if value.startswith("x"):
+            raise Invalid("value starts with x")
+        if value.startswith("v"):
+            raise ValueError("value starts with v")
+        return len(value)
+
+    return validate, calls
+
+
+def test_memoized_validator_verdicts():
+    """Check that verdicts for accepted and refused values are cached."""
+    validate, calls = counting_validator()
+    memoized = memoized_validator(validate, LRUCache(10))
+
+    for _ in range(3):
+        assert memoized("abc") == 3
+        with pytest.raises(Invalid, match="value starts with x"):
+            memoized("xyz")
+        with pytest.raises(ValueError, match="value starts with v"):
+            memoized("vwx")
+    assert calls == ["abc", "xyz", "vwx"]
+
+
+def test_memoized_validator_other_values():
+    """Check that values other than strings and exceptions other than refusals are not cached."""
+    validate, calls = counting_validator()
+    memoized = memoized_validator(validate, LRUCache(10))
+
+    for _ in range(2):
+        with pytest.raises(AttributeError):
+            memoized(42)
+    assert calls == [42, 42]
+
+
+def test_memoized_validator_error_paths():
+    """Check that cached refusals are reported with the same paths as without cache."""
+    validate, _ = counting_validator()
+    schema = Schema({Required("items"): [validate]})
+    memoized = Schema({Required("items"): [memoized_validator(validate, LRUCache(10))]})
+
+    data = {"items": ["abc", "xyz", "xyz"]}
+    with pytest.raises(MultipleInvalid) as expected:
+        schema(data)
+    for _ in range(3):
+        with pytest.raises(MultipleInvalid) as excinfo:
+            memoized(data)
+        assert str(excinfo.value) == str(expected.value)
+        assert [e.path for e in excinfo.value.errors] == [["items", 1], ["items", 2]]
@@ -19,8 +19,13 @@
 
 
 import datetime
+from argparse import ArgumentParser
 
-from common import cli_arguments, print_report, validate_parquet_file
+from common import (
+    print_report,
+    sink_from_arguments,
+    validate_parquet_file_columnar,
+)
 from validators import pathToCephInBytesValidator, ruleIDInBytesValidator, uuidInBytesValidator
 from voluptuous import Required, Schema
 
@@ -33,6 +38,22 @@ schema = Schema({
         })
 
 
+def cli_arguments(args=None):
+    """Retrieve CLI arguments, just the options used by columnar validation."""
+    parser = ArgumentParser(description="Validator for rule hits stored in Parquet file")
+    parser.add_argument("-i", "--input", dest="input", required=True,
+                        help="name of input file")
+    parser.add_argument("-n", "--no-colors", dest="nocolors", action="store_true", default=None,
+                        help="disable color output")
+    parser.add_argument("-v", "--verbose", dest="verbose", action="store_true", default=None,
+                        help="make it verbose")
+    parser.add_argument("-q", "--quiet", dest="quiet", action="store_true", default=False,
+                        help="don't print problems found in rows, just the report")
+    parser.add_argument("--output-buffer", dest="output_buffer", type=int, default=0,
+                        help="number of printed lines buffered before they are written")
+    return parser.parse_args(args)
+
+
 def main():
     """Entry point to this script."""
     # Parse all CLI arguments.
@@ -40,8 +61,9 @@ def main():
     verbose = args.verbose
     input_file = args.input
 
-    # validate the provided Parquet file
-    report = validate_parquet_file(schema, input_file, verbose)
+    # validate the provided Parquet file column by column
+    report = validate_parquet_file_columnar(schema, input_file, verbose,
+                                            sink_from_arguments(args))
 
     # print report from schema validation
     print_report(report, args.nocolors)
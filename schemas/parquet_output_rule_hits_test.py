@@ -22,7 +22,7 @@ from datetime import datetime
 
 import pytest
 from common import validate
-from parquet_output_rule_hits import main, schema
+from parquet_output_rule_hits import cli_arguments, main, schema
 from voluptuous import Invalid
 
 
@@ -64,6 +64,16 @@ def test_main_help():
     assert excinfo.value.code == 0
 
 
+def test_cli_arguments():
+    """Check that options not used by columnar validation are refused."""
+    args = cli_arguments(["-i", "rule_hits.parquet", "-q", "--output-buffer", "100"])
+    assert (args.input, args.quiet, args.output_buffer) == ("rule_hits.parquet", True, 100)
+    for option in (["-j", "2"], ["-c"], ["-p"], ["--metrics-port", "8000"], ["--memoize", "10"],
+                   ["--dedup-cache", "10"], ["--json-decoder", "json"], ["-m"]):
+        with pytest.raises(SystemExit):
+            cli_arguments(["-i", "rule_hits.parquet"] + option)
+
+
 def test_main_input():
     """Test the main function when -i parameter is given."""
     sys.argv.append("-i test")
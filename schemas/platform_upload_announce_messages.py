@@ -18,7 +18,22 @@
 """Validator for messages stored in platform.upload.announce topic."""
 
 
-from common import cli_arguments, print_report, validate_multiple_messages, validate_single_message
+from common import (
+    checkpoint_from_arguments,
+    cli_arguments,
+    max_errors_from_arguments,
+    prepare_validator,
+    print_cache_statistics,
+    print_profile,
+    print_report,
+    sampler_from_arguments,
+    sink_from_arguments,
+    validate_multiple_messages,
+    validate_single_message,
+)
+from lru import LRUCache
+from memoization import memoized_validator
+from validation_daemon import kafka_consumer, serve
 from validators import (
     b64IdentityValidator,
     hexaString32Validator,
@@ -50,6 +65,11 @@ identitySchema = Schema(
                     "type": str,
                 }, extra=ALLOW_EXTRA)}, extra=ALLOW_EXTRA)
 
+# the same identity is sent with all uploads from one system, so verdicts for
+# encoded identities are cached to avoid decoding and validating them again
+IDENTITY_CACHE_SIZE = 10000
+identityCache = LRUCache(IDENTITY_CACHE_SIZE)
+
 
 # Schema for messages consumed from platform.upload.announce Kafka topic
 schema = Schema(
@@ -66,7 +86,8 @@ schema = Schema(
                     Required("stale_timestamp"): timestampValidator,
                  }),
             Required("url"): urlToAWSValidator,
-            Required("b64_identity"): lambda value: b64IdentityValidator(identitySchema, value),
+            Required("b64_identity"): memoized_validator(
+                lambda value: b64IdentityValidator(identitySchema, value), identityCache),
             Required("timestamp"): timestampValidatorMs,
          })
 
@@ -74,21 +95,41 @@ schema = Schema(
 def main():
     """Entry point to this script."""
     # Parse all CLI arguments.
-    args = cli_arguments()
+    args = cli_arguments(serve_mode=True)
     verbose = args.verbose
     multiple = args.multiple
     input_file = args.input
 
-    if multiple:
+    # validator is compiled and measured according to CLI arguments
+    validator = prepare_validator(schema, "platform_upload_announce_messages", args)
+
+    if args.serve:
+        # validate messages consumed from Kafka topic until interrupted
+        consumer = kafka_consumer(args.bootstrap_server, args.topic, args.group_id)
+        report = serve(validator, consumer, verbose, args.batch_size,
+                       sink=sink_from_arguments(args))
+    elif multiple:
         # process multiple messages stored in one input file
-        report = validate_multiple_messages(schema, input_file, verbose)
+        report = validate_multiple_messages(validator, input_file, verbose, args.jobs,
+                                            checkpoint_from_arguments(args),
+                                            args.dedup_cache,
+                                            max_errors_from_arguments(args),
+                                            sampler_from_arguments(args),
+                                            sink_from_arguments(args))
     else:
         # process single message stored in one input file
-        report = validate_single_message(schema, input_file, verbose)
+        report = validate_single_message(validator, input_file, verbose,
+                                         sink_from_arguments(args))
 
     # print report from schema validation
     print_report(report, args.nocolors)
 
+    # print how many identities were validated just once
+    print_cache_statistics("Identity cache", identityCache)
+
+    # print profile of validation when requested
+    print_profile(args)
+
 
 if __name__ == "__main__":
     main()
@@ -21,7 +21,7 @@ import sys
 
 import pytest
 from common import validate
-from platform_upload_announce_messages import main, schema
+from platform_upload_announce_messages import identityCache, main, schema
 from voluptuous import Invalid
 
 
@@ -162,3 +162,18 @@ def test_validate_message_wrong_attributes(validation_schema, verbose, correct_m
     # it should fail
     with pytest.raises(Invalid):
         validate(schema, correct_message, verbose)
+
+
+@pytest.mark.parametrize("verbose", verbose)
+def test_validate_repeated_identity(validation_schema, verbose, correct_message):
+    """Check that repeated identity is validated just once, with the same verdicts."""
+    hits = identityCache.hits
+    for _ in range(3):
+        validate(schema, correct_message, verbose)
+    assert identityCache.hits >= hits + 2
+
+    # identity that is not valid JSON is refused every time
+    correct_message["b64_identity"] = "e30K" + correct_message["b64_identity"]
+    for _ in range(3):
+        with pytest.raises(Invalid):
+            validate(schema, correct_message, verbose)
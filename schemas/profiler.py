@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# vim: set fileencoding=utf-8
+
+# Copyright © 2024 Pavel Tisnovsky
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Profiler showing where the time is spent during validation.
+
+The time is split into three parts: decoding of JSON messages, calls of
+validator functions referenced by the schema, and the rest of schema
+validation (traversal of the schema by voluptuous). Calls of validators are
+counted per validator function and also per schema node in which the
+validator is used, for example `Report.reports[].details.error_key`.
+"""
+
+import json
+import time
+
+
+class Profiler:
+
+    """Collector of call counts and cumulative times measured during validation."""
+
+    def __init__(self):
+        """Initialize profiler without any measurements."""
+        # call counts and cumulative times for all validators and nodes
+        self.validators = {}
+        self.nodes = {}
+        self.decoding = [0, 0.0]
+        self.messages = [0, 0.0]
+
+    def observe_validator(self, validator_name, node_path, seconds):
+        """Record one call of validator used in given schema node."""
+        for key, timings in ((validator_name, self.validators), (node_path, self.nodes)):
+            if key not in timings:
+                timings[key] = [0, 0.0]
+            timings[key][0] += 1
+            timings[key][1] += seconds
+
+    def observe_decoding(self, seconds):
+        """Record decoding of one JSON message."""
+        self.decoding[0] += 1
+        self.decoding[1] += seconds
+
+    def observe_message(self, seconds):
+        """Record validation of one message by the whole schema."""
+        self.messages[0] += 1
+        self.messages[1] += seconds
+
+    def measured_decoder(self, decoder):
+        """Wrap JSON decoder so the time spent in decoding is recorded."""
+        def decode(data):
+            start = time.perf_counter()
+            try:
+                return decoder(data)
+            finally:
+                self.observe_decoding(time.perf_counter() - start)
+
+        return decode
+
+    def measured_schema(self, validator):
+        """Wrap schema or validator so the time spent in validating messages is recorded."""
+        def validate(payload):
+            start = time.perf_counter()
+            try:
+                return validator(payload)
+            finally:
+                self.observe_message(time.perf_counter() - start)
+
+        return validate
+
+    def results(self):
+        """Retrieve all measurements as a dictionary that can be stored in JSON."""
+        validators_time = sum(seconds for _, seconds in self.validators.values())
+        return {
+            "decoding": timing_record(*self.decoding),
+            "validation": timing_record(*self.messages),
+            "validators": timing_record(sum(calls for calls, _ in self.validators.values()),
+                                        validators_time),
+            "traversal": timing_record(self.messages[0],
+                                       max(self.messages[1] - validators_time, 0.0)),
+            "per_validator": ranked_records(self.validators, "validator"),
+            "per_node": ranked_records(self.nodes, "node"),
+        }
+
+    def print_table(self):
+        """Display summary and ranked tables with the slowest validators and nodes first."""
+        results = self.results()
+        total = results["decoding"]["seconds"] + results["validation"]["seconds"]
+
+        print("\nProfile:")
+        print(f"{'Phase':<40} {'Calls':>10} {'Total [ms]':>12} {'Share':>7}")
+        for phase, title in (("decoding", "JSON decoding"),
+                             ("validators", "validator functions"),
+                             ("traversal", "schema traversal")):
+            record = results[phase]
+            print(f"{title:<40} {record['calls']:>10} {record['seconds'] * 1000:>12.3f} "
+                  f"{share(record['seconds'], total):>6.1f}%")
+
+        for key, title in (("per_validator", "Validator"), ("per_node", "Schema node")):
+            print()
+            print(f"{'Rank':>4} {title:<50} {'Calls':>10} {'Total [ms]':>12} "
+                  f"{'Per call [us]':>14} {'Share':>7}")
+            for rank, record in enumerate(results[key], start=1):
+                name = record["validator"] if key == "per_validator" else record["node"]
+                print(f"{rank:>4} {name:<50} {record['calls']:>10} "
+                      f"{record['seconds'] * 1000:>12.3f} {record['per_call'] * 1e6:>14.3f} "
+                      f"{share(record['seconds'], total):>6.1f}%")
+
+    def write_json(self, filename):
+        """Store all measurements into JSON file."""
+        with open(filename, "w") as fout:
+            json.dump(self.results(), fout, indent=4)
+
+
+def timing_record(calls, seconds):
+    """Construct dictionary with call count, cumulative time and time per call."""
+    return {"calls": calls,
+            "seconds": seconds,
+            "per_call": seconds / calls if calls else 0.0}
+
+
+def ranked_records(timings, name):
+    """Construct list of timing records sorted by cumulative time, the slowest first."""
+    records = []
+    for key, (calls, seconds) in timings.items():
+        record = {name: key}
+        record.update(timing_record(calls, seconds))
+        records.append(record)
+    return sorted(records, key=lambda record: record["seconds"], reverse=True)
+
+
+def share(seconds, total):
+    """Compute share of given time in total time, in percents."""
+    return 100.0 * seconds / total if total > 0 else 0.0
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# vim: set fileencoding=utf-8
+
+# Copyright © 2024 Pavel Tisnovsky
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unit tests for profiler module."""
+
+import json
+
+import pytest
+from profiler import Profiler, ranked_records, share, timing_record
+
+
+def profiler_with_measurements():
+    """Construct profiler with some measurements."""
+    profiler = Profiler()
+    profiler.observe_validator("uuidValidator", "ClusterName", 0.002)
+    profiler.observe_validator("uuidValidator", "Report.info[].details.cluster_id", 0.001)
+    profiler.observe_validator("keyValueValidator", "Report.reports[].key", 0.004)
+    profiler.observe_decoding(0.010)
+    profiler.observe_message(0.020)
+    return profiler
+
+
+def test_observe_validator():
+    """Check that validator calls are counted per validator and per node."""
+    profiler = profiler_with_measurements()
+
+    assert profiler.validators["uuidValidator"] == [2, pytest.approx(0.003)]
+    assert profiler.validators["keyValueValidator"] == [1, 0.004]
+    assert profiler.nodes["ClusterName"] == [1, 0.002]
+    assert profiler.nodes["Report.reports[].key"] == [1, 0.004]
+
+
+def test_results():
+    """Check that results are split into phases and ranked."""
+    results = profiler_with_measurements().results()
+
+    assert results["decoding"] == {"calls": 1, "seconds": 0.010, "per_call": 0.010}
+    assert results["validation"]["calls"] == 1
+    assert results["validators"]["calls"] == 3
+    assert results["validators"]["seconds"] == pytest.approx(0.007)
+    assert results["traversal"]["seconds"] == pytest.approx(0.013)
+
+    assert [r["validator"] for r in results["per_validator"]] == ["keyValueValidator",
+                                                                  "uuidValidator"]
+    assert [r["node"] for r in results["per_node"]] == ["Report.reports[].key", "ClusterName",
+                                                        "Report.info[].details.cluster_id"]
+
+
+def test_results_without_measurements():
+    """Check results of profiler that has not measured anything."""
+    results = Profiler().results()
+    assert results["decoding"] == {"calls": 0, "seconds": 0.0, "per_call": 0.0}
+    assert results["per_validator"] == []
+
+
+def test_measured_decoder():
+    """Check that JSON decoding is measured, including failures."""
+    profiler = Profiler()
+    decoder = profiler.measured_decoder(json.loads)
+
+    assert decoder('{"a": 1}') == {"a": 1}
+    with pytest.raises(ValueError):
+        decoder("not a JSON")
+    assert profiler.decoding[0] == 2
+
+
+def test_measured_schema():
+    """Check that validation of messages is measured, including failures."""
+    profiler = Profiler()
+
+    def validator(payload):
+        if payload is None:
+            raise ValueError("empty payload")
+        return payload
+
+    measured = profiler.measured_schema(validator)
+    assert measured(42) == 42
+    with pytest.raises(ValueError):
+        measured(None)
+    assert profiler.messages[0] == 2
+
+
+def test_print_table(capsys):
+    """Check that ranked tables are displayed."""
+    profiler_with_measurements().print_table()
+    lines = capsys.readouterr().out.splitlines()
+
+    assert "Profile:" in lines
+    assert any(line.startswith("JSON decoding") for line in lines)
+    assert any(line.startswith("schema traversal") for line in lines)
+    # the slowest validator is the first one
+    rank_lines = [line for line in lines if line.lstrip().startswith("1 ")]
+    assert "keyValueValidator" in rank_lines[0]
+    assert "Report.reports[].key" in rank_lines[1]
+
+
+def test_write_json(tmpdir):
+    """Check that results are stored in JSON file."""
+    profiler = profiler_with_measurements()
+    filename = tmpdir.join("profile.json")
+    profiler.write_json(filename)
+
+    with open(filename) as fin:
+        assert json.load(fin) == profiler.results()
+
+
+def test_helpers():
+    """Check helper functions used to construct results."""
+    assert timing_record(4, 2.0) == {"calls": 4, "seconds": 2.0, "per_call": 0.5}
+    assert ranked_records({"a": [1, 1.0], "b": [1, 2.0]}, "name")[0]["name"] == "b"
+    assert share(1.0, 4.0) == 25.0
+    assert share(1.0, 0.0) == 0.0
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+# vim: set fileencoding=utf-8
+
+# Copyright © 2024 Pavel Tisnovsky
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Validator for archives with raw data stored in Ceph bucket.
+
+Archives (tarballs compressed by gzip) gathered by Insights Operator are read
+as a stream, member by member, without extracting them to disk. Path of every
+member is matched against the table of member validators and the first
+matching validator checks the member content. Members not described by the
+table are not validated.
+
+Input can be one archive or a directory with archives, for example a local
+copy of the bucket. Archives are validated by a pool of worker processes
+when more jobs are requested, each worker validates whole archives, because
+one compressed stream needs to be read sequentially anyway.
+"""
+
+import gzip
+import os
+import re
+import tarfile
+import zlib
+from argparse import ArgumentParser
+
+from common import (
+    collect_results,
+    empty_report,
+    merge_reports,
+    print_report,
+    worker_pool_context,
+)
+from results import ListSink, PrintSink, ValidationResult, exception_result, valid_result
+from validators import (
+    decodeBytes,
+    jsonInBytesSchemaValidator,
+    jsonInBytesValidator,
+    notEmptyStringValidator,
+    uuidValidator,
+)
+from voluptuous import ALLOW_EXTRA, Optional, Required, Schema
+
+# suffix of archives searched for in input directory
+ARCHIVE_SUFFIX = ".tar.gz"
+
+# size of blocks read from the rest of compressed stream after tar archive
+READ_BLOCK_SIZE = 65536
+
+# exceptions raised when archive can't be read or decompressed
+ARCHIVE_ERRORS = (OSError, EOFError, tarfile.TarError, zlib.error)
+
+# Schema for metadata of Kubernetes objects
+objectMetadataSchema = Schema(
+        {
+            Optional("name"): notEmptyStringValidator,
+            Optional("namespace"): str,
+        }, extra=ALLOW_EXTRA)
+
+# Schema for conditions in status of Kubernetes objects
+conditionSchema = Schema(
+        {
+            Required("type"): notEmptyStringValidator,
+            Required("status"): str,
+        }, extra=ALLOW_EXTRA)
+
+# Schema for ClusterOperator objects stored in config/clusteroperator/
+clusterOperatorSchema = Schema(
+        {
+            Required("metadata"): objectMetadataSchema,
+            Optional("spec"): dict,
+            Required("status"): Schema(
+                {
+                    Optional("conditions"): [conditionSchema],
+                    Optional("versions"): [dict],
+                    Optional("relatedObjects"): [dict],
+                }, extra=ALLOW_EXTRA),
+        }, extra=ALLOW_EXTRA)
+
+# Schema for Node objects stored in config/node/
+nodeSchema = Schema(
+        {
+            Required("metadata"): objectMetadataSchema,
+            Optional("spec"): dict,
+            Required("status"): Schema(
+                {
+                    Optional("conditions"): [conditionSchema],
+                    Optional("nodeInfo"): Schema(
+                        {
+                            Optional("kubeletVersion"): str,
+                            Optional("kernelVersion"): str,
+                            Optional("osImage"): str,
+                        }, extra=ALLOW_EXTRA),
+                }, extra=ALLOW_EXTRA),
+        }, extra=ALLOW_EXTRA)
+
+# Schema for ClusterVersion object stored in config/version.json
+clusterVersionSchema = Schema(
+        {
+            Required("metadata"): objectMetadataSchema,
+            Required("spec"): Schema(
+                {
+                    Optional("clusterID"): uuidValidator,
+                }, extra=ALLOW_EXTRA),
+            Optional("status"): Schema(
+                {
+                    Optional("conditions"): [conditionSchema],
+                    Optional("desired"): dict,
+                    Optional("history"): [dict],
+                }, extra=ALLOW_EXTRA),
+        }, extra=ALLOW_EXTRA)
+
+
+def clusterIDMemberValidator(content):
+    """Validate member containing ID of cluster."""
+    uuidValidator(decodeBytes(content).strip())
+
+
+def textMemberValidator(content):
+    """Validate member containing text encoded by UTF-8."""
+    decodeBytes(content)
+
+
+# Validators of archive members, the first validator with pattern matching the
+# whole path to member is used
+MEMBER_VALIDATORS = (
+        (re.compile(r"config/id"), clusterIDMemberValidator),
+        (re.compile(r"config/version\.json"),
+         lambda content: jsonInBytesSchemaValidator(clusterVersionSchema, content)),
+        (re.compile(r"config/clusteroperator/[^/]+\.json"),
+         lambda content: jsonInBytesSchemaValidator(clusterOperatorSchema, content)),
+        (re.compile(r"config/node/[^/]+\.json"),
+         lambda content: jsonInBytesSchemaValidator(nodeSchema, content)),
+        (re.compile(r"config/metrics"), textMemberValidator),
+        (re.compile(r"config/pod/[^/]+/logs/[^/]+/[^/]+\.log"), textMemberValidator),
+        (re.compile(r"config/configmaps/[^/]+/[^/]+"), textMemberValidator),
+        (re.compile(r".+\.json"), jsonInBytesValidator),
+        )
+
+
+def member_validator(name):
+    """Find validator for archive member with given path, None if it is not validated."""
+    # paths in some archives are relative to the current directory
+    if name.startswith("./"):
+        name = name[2:]
+    for pattern, validator in MEMBER_VALIDATORS:
+        if pattern.fullmatch(name):
+            return validator
+    return None
+
+
+def archive_members(input_file, member_filter=None):
+    """Read regular files from archive as a stream, yield their paths and contents.
+
+    When `member_filter` is specified, just members with paths accepted by
+    the filter are read, content of other members is skipped.
+    """
+    with gzip.open(input_file, "rb") as stream:
+        with tarfile.open(fileobj=stream, mode="r|") as archive:
+            for member in archive:
+                if not member.isfile():
+                    continue
+                if member_filter is not None and not member_filter(member.name):
+                    continue
+                # in stream mode, content needs to be read before the next member
+                yield member.name, archive.extractfile(member).read()
+        # end of tar archive is recognized before the end of compressed stream,
+        # truncated stream is detected only when it is read to its end
+        while stream.read(READ_BLOCK_SIZE):
+            pass
+
+
+def member_result(validator, name, content, index):
+    """Validate one archive member, return structured result."""
+    try:
+        validator(content)
+        return valid_result(index)
+    except Exception as e:
+        result = exception_result(index, e)
+        # problems are reported with path to member
+        return result._replace(error_path=[name] + (result.error_path or []),
+                               message=f"{name}: {result.message}")
+
+
+def archive_results(input_file):
+    """Validate members of archive, yield structured result for every validated member."""
+    index = 0
+    try:
+        # members that are not validated are not read into memory at all
+        for name, content in archive_members(input_file, member_validator):
+            index += 1
+            yield member_result(member_validator(name), name, content, index)
+    except ARCHIVE_ERRORS as e:
+        # results of members read before the problem are kept
+        yield ValidationResult(None, "error", None, f"{input_file}: {e}")
+
+
+def validate_archive(input_file):
+    """Validate one archive, return report and results of members that are not valid."""
+    sink = ListSink()
+    report = collect_results(archive_results(input_file), sink)
+    return report, sink.results
+
+
+def archive_paths(input_path):
+    """Retrieve paths to archives: the input archive, or all archives in input directory."""
+    if not os.path.isdir(input_path):
+        return [input_path]
+    paths = []
+    for directory, _, filenames in os.walk(input_path):
+        paths.extend(os.path.join(directory, filename) for filename in filenames
+                     if filename.endswith(ARCHIVE_SUFFIX))
+    return sorted(paths)
+
+
+def archive_reports(input_files, jobs):
+    """Validate archives, yield report and problems of every archive in input order."""
+    if jobs <= 1:
+        yield from map(validate_archive, input_files)
+        return
+    with worker_pool_context().Pool(jobs) as pool:
+        # results are returned in the same order as archives, one archive
+        # is validated by one worker
+        yield from pool.imap(validate_archive, input_files)
+
+
+def validate_archives(input_files, verbose, jobs=1):
+    """Validate archives, by a pool of worker processes when more jobs are requested.
+
+    Problems are printed archive by archive in the order of input files.
+    """
+    report = empty_report()
+    sink = PrintSink()
+    for index, (archive_report, problems) in enumerate(archive_reports(input_files, jobs)):
+        if verbose:
+            print(f"Reading archive {input_files[index]}")
+        for problem in problems:
+            sink(problem)
+        sink.flush()
+        merge_reports(report, archive_report)
+    return report
+
+
+def cli_arguments(args=None):
+    """Retrieve all CLI arguments."""
+    parser = ArgumentParser(description="Validator for archives with raw data")
+    parser.add_argument("-i", "--input", dest="input", required=True,
+                        help="archive or directory with archives to be validated")
+    parser.add_argument("-v", "--verbose", dest="verbose", action="store_true", default=False,
+                        help="print name of every validated archive")
+    parser.add_argument("-n", "--no-colors", dest="nocolors", action="store_true", default=None,
+                        help="disable color output")
+    parser.add_argument("-j", "--jobs", dest="jobs", type=int, default=1,
+                        help="number of worker processes used to validate archives")
+    return parser.parse_args(args)
+
+
+def main():
+    """Entry point to this script."""
+    # Parse all CLI arguments.
+    args = cli_arguments()
+
+    # validate one archive or all archives from input directory
+    report = validate_archives(archive_paths(args.input), args.verbose, args.jobs)
+
+    # print report from schema validation
+    print_report(report, args.nocolors)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+# vim: set fileencoding=utf-8
+
+# Copyright © 2024 Pavel Tisnovsky
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unit tests for raw_data_archive module."""
+
+import io
+import json
+import sys
+import tarfile
+
+import pytest
+from raw_data_archive import (
+    archive_members,
+    archive_paths,
+    cli_arguments,
+    clusterIDMemberValidator,
+    main,
+    member_validator,
+    textMemberValidator,
+    validate_archive,
+    validate_archives,
+)
+from validators import jsonInBytesValidator
+
+CLUSTER_ID = "4e696069-edf5-44dd-9f05-fcca2d14cdf1"
+
+OPERATOR = {"metadata": {"name": "etcd"}, "spec": {},
+            "status": {"conditions": [{"type": "Degraded", "status": "False"}]}}
+
+NODE = {"metadata": {"name": "master-0"}, "spec": {},
+        "status": {"conditions": [{"type": "Ready", "status": "True"}],
+                   "nodeInfo": {"kubeletVersion": "v1.20.0"}}}
+
+VERSION = {"metadata": {"name": "version"}, "spec": {"clusterID": CLUSTER_ID},
+           "status": {"history": []}}
+
+# members of archive with proper content
+correct_members = {
+        "config/id": CLUSTER_ID.encode("ascii"),
+        "config/version.json": json.dumps(VERSION).encode("utf-8"),
+        "config/clusteroperator/etcd.json": json.dumps(OPERATOR).encode("utf-8"),
+        "config/node/master-0.json": json.dumps(NODE).encode("utf-8"),
+        "config/metrics": b"# ALERTS 0/1000\n",
+        "config/pod/openshift-sdn/logs/sdn-1/errors.log": b"Got OnEndpointsUpdate\n",
+        "config/configmaps/cluster-config/install-config": b"foo: bar\n",
+        "config/infrastructure.json": b"{}",
+        "README": b"not validated",
+        }
+
+
+def write_archive(input_file, members):
+    """Write archive with given members into file."""
+    with tarfile.open(str(input_file), mode="w:gz") as archive:
+        for name, content in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(content)
+            archive.addfile(info, io.BytesIO(content))
+        # directories are not validated
+        info = tarfile.TarInfo("config/node")
+        info.type = tarfile.DIRTYPE
+        archive.addfile(info)
+
+
+def test_member_validator():
+    """Check that members are dispatched to validators by their paths."""
+    assert member_validator("config/id") is clusterIDMemberValidator
+    assert member_validator("./config/id") is clusterIDMemberValidator
+    assert member_validator("config/metrics") is textMemberValidator
+    assert member_validator("config/clusteroperator/imageregistry.operator.openshift.io/"
+                            "config/cluster.json") is jsonInBytesValidator
+    assert member_validator("config/node/master-0.json") is not jsonInBytesValidator
+    assert member_validator("config/identity") is None
+    assert member_validator("README") is None
+
+
+def test_archive_members(tmpdir):
+    """Check that regular files are read from archive."""
+    input_file = tmpdir.join("archive.tar.gz")
+    write_archive(input_file, correct_members)
+    assert dict(archive_members(str(input_file))) == correct_members
+
+
+def test_archive_members_filter(tmpdir):
+    """Check that just members accepted by filter are read from archive."""
+    input_file = tmpdir.join("archive.tar.gz")
+    write_archive(input_file, correct_members)
+    members = dict(archive_members(str(input_file), member_validator))
+    assert "README" not in members
+    assert members == {name: content for name, content in correct_members.items()
+                       if name != "README"}
+
+
+def test_validate_archive(tmpdir):
+    """Check that all members with validators are validated."""
+    input_file = tmpdir.join("archive.tar.gz")
+    write_archive(input_file, correct_members)
+
+    report, problems = validate_archive(str(input_file))
+    assert report == {"processed": 8, "valid": 8, "invalid": 0, "error": 0}
+    assert problems == []
+
+
+# wrong contents of members and paths to problems reported for them
+wrong_members = (
+        ("config/id", b"foo", ["config/id"]),
+        ("config/version.json", b'{"metadata": {}, "spec": {"clusterID": "x"}}',
+         ["config/version.json", "spec", "clusterID"]),
+        ("config/clusteroperator/etcd.json",
+         b'{"metadata": {}, "status": {"conditions": [{"status": "True"}]}}',
+         ["config/clusteroperator/etcd.json", "status", "conditions", 0, "type"]),
+        ("config/node/master-0.json", b'{"metadata": {"name": ""}, "status": {}}',
+         ["config/node/master-0.json", "metadata", "name"]),
+        ("config/metrics", b"\xff\xfe", ["config/metrics"]),
+        ("config/infrastructure.json", b"{", ["config/infrastructure.json"]),
+        )
+
+
+@pytest.mark.parametrize("name, content, error_path", wrong_members)
+def test_validate_archive_wrong_members(tmpdir, name, content, error_path):
+    """Check that wrong members are reported with paths to problems."""
+    input_file = tmpdir.join("archive.tar.gz")
+    write_archive(input_file, dict(correct_members, **{name: content}))
+
+    report, problems = validate_archive(str(input_file))
+    assert report == {"processed": 8, "valid": 7, "invalid": 1, "error": 0}
+    assert len(problems) == 1
+    assert problems[0].error_path == error_path
+    assert problems[0].message.startswith(name + ": ")
+
+
+def test_validate_archive_truncated(tmpdir):
+    """Check that members read before the archive ends are validated."""
+    input_file = tmpdir.join("archive.tar.gz")
+    write_archive(input_file, correct_members)
+    content = input_file.read_binary()
+    input_file.write_binary(content[:-1])
+
+    report, problems = validate_archive(str(input_file))
+    assert report == {"processed": 8, "valid": 8, "invalid": 0, "error": 1}
+    assert problems[-1].index is None
+    assert problems[-1].message.startswith(str(input_file))
+
+
+@pytest.mark.parametrize("content", (b"", b"foo", b"\x1f\x8b\x08\x00foo"))
+def test_validate_archive_not_archive(tmpdir, content):
+    """Check that files that are not compressed tarballs are reported."""
+    input_file = tmpdir.join("archive.tar.gz")
+    input_file.write_binary(content)
+
+    report, problems = validate_archive(str(input_file))
+    assert report == {"processed": 0, "valid": 0, "invalid": 0, "error": 1}
+    assert len(problems) == 1
+
+
+def test_validate_archive_nonexistent_file():
+    """Check that missing archive is reported."""
+    report, _ = validate_archive("this-does-not-exist.tar.gz")
+    assert report == {"processed": 0, "valid": 0, "invalid": 0, "error": 1}
+
+
+@pytest.fixture
+def bucket(tmpdir):
+    """Directory with archives, some of them with wrong members."""
+    for i in range(6):
+        members = dict(correct_members)
+        if i % 2:
+            members["config/id"] = f"cluster-{i}".encode("ascii")
+        write_archive(tmpdir.mkdir(f"{i:02}").join(f"{i}.tar.gz"), members)
+    tmpdir.join("00", "README").write("not an archive")
+    return tmpdir
+
+
+def test_archive_paths(bucket):
+    """Check that archives are found in input directory."""
+    paths = archive_paths(str(bucket))
+    assert paths == [str(bucket.join(f"{i:02}", f"{i}.tar.gz")) for i in range(6)]
+    assert archive_paths(paths[0]) == [paths[0]]
+
+
+@pytest.mark.parametrize("verbose", (False, True))
+@pytest.mark.parametrize("jobs", (2, 3))
+def test_validate_archives_in_parallel(bucket, capsys, verbose, jobs):
+    """Check that archives validated in parallel are reported the same as sequentially."""
+    paths = archive_paths(str(bucket))
+    expected = validate_archives(paths, verbose)
+    expected_output = capsys.readouterr().out
+
+    report = validate_archives(paths, verbose, jobs)
+    assert report == expected == {"processed": 48, "valid": 45, "invalid": 3, "error": 0}
+    assert capsys.readouterr().out == expected_output
+    assert expected_output.count("Validation error: config/id: ") == 3
+
+
+def test_cli_arguments():
+    """Check that just options used by this validator are accepted."""
+    args = cli_arguments(["-i", "bucket", "-j", "4", "-v"])
+    assert args.input == "bucket"
+    assert args.jobs == 4
+    assert args.verbose
+    with pytest.raises(SystemExit):
+        cli_arguments(["-i", "bucket", "--dedup-cache", "10"])
+    with pytest.raises(SystemExit):
+        cli_arguments([])
+
+
+def test_main(bucket, capsys, monkeypatch):
+    """Test the main function validating directory with archives."""
+    monkeypatch.setattr(sys, "argv", ["raw_data_archive.py", "-i", str(bucket), "-n"])
+    main()
+    output = capsys.readouterr().out
+    assert "Processed messages: 48" in output
+    assert "Invalid messages:   3" in output
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# vim: set fileencoding=utf-8
+
+# Copyright © 2024 Pavel Tisnovsky
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Structured results of validation and sinks that display them.
+
+Validation of every message produces one result record with the index of
+the message (starting from 1), status (valid, invalid or error), path to the
+field that failed validation and the error message. Problems not related to
+any message, like input files that can't be read, are reported with index
+set to None. Results can also specify prefix of the printed problem, and
+payload printed after the problem (rows read from Parquet files).
+
+Results are not printed by the validation itself. They are passed to a sink
+that prints them, buffers them, or just collects them for the caller. When
+no sink is used, just the counters are computed, which is the fastest way to
+validate many messages. Results are produced and collected by functions from
+the common module.
+"""
+
+import sys
+from collections import namedtuple
+
+from voluptuous import Invalid, Marker
+
+# result of validation of one message
+ValidationResult = namedtuple("ValidationResult",
+                              ["index", "status", "error_path", "message", "prefix", "payload"],
+                              defaults=(None, None))
+
+# prefixes of problems printed by validators
+PROBLEM_PREFIXES = {"invalid": "Validation error: ", "error": "Other problem: "}
+FILE_PROBLEM_PREFIX = "File-related problem: "
+CHECKPOINT_PROBLEM_PREFIX = "Checkpoint-related problem: "
+
+
+def valid_result(index):
+    """Construct result for message that is valid."""
+    return ValidationResult(index, "valid", None, None)
+
+
+def exception_result(index, exception):
+    """Construct result for message refused with given exception."""
+    # values refused by validators and messages that can't be decoded are
+    # invalid, all other exceptions are errors
+    status = "invalid" if isinstance(exception, (ValueError, Invalid)) else "error"
+    error_path = None
+    if isinstance(exception, Invalid):
+        # for more failures the path to the first one is reported by voluptuous;
+        # markers (Required, Optional) are replaced by keys, so results can be
+        # sent from worker processes
+        error_path = [key.schema if isinstance(key, Marker) else key for key in exception.path]
+    return ValidationResult(index, status, error_path, str(exception))
+
+
+def file_problem_result(exception):
+    """Construct result for problem with input file, not related to any message."""
+    return ValidationResult(None, "error", None, str(exception))
+
+
+def decoding_problem_result(exception):
+    """Construct result for single message that can't be decoded, it is not processed."""
+    result = exception_result(None, exception)
+    return result._replace(prefix=PROBLEM_PREFIXES[result.status])
+
+
+def checkpoint_problem_result(exception):
+    """Construct result for checkpoint that can't be used, not related to any message."""
+    return ValidationResult(None, "error", None, str(exception), CHECKPOINT_PROBLEM_PREFIX)
+
+
+def format_result(result):
+    """Format result the same way as validators print problems, None for valid messages."""
+    if result.status == "valid":
+        return None
+    prefix = result.prefix
+    if prefix is None:
+        prefix = FILE_PROBLEM_PREFIX if result.index is None else PROBLEM_PREFIXES[result.status]
+    if result.payload is None:
+        return prefix + result.message
+    return f"{prefix}{result.message}\n{result.payload}"
+
+
+class PrintSink:
+
+    """Sink printing problems (and optionally all messages) in the usual format.
+
+    When `buffer_size` is set, formatted lines are written in blocks of that
+    many lines, which is much faster than printing every problem separately.
+    """
+
+    def __init__(self, verbose=False, stream=None, buffer_size=0):
+        """Initialize sink writing to given stream, standard output by default."""
+        self.verbose = verbose
+        self.stream = stream
+        self.buffer_size = buffer_size
+        self.lines = []
+
+    def __call__(self, result):
+        """Format the result and write it, or store it into buffer."""
+        if self.verbose and result.index is not None:
+            self.lines.append(f"Reading message #{result.index}")
+        elif result.status == "valid":
+            # nothing is printed for most messages
+            return
+        formatted = format_result(result)
+        if formatted is not None:
+            self.lines.append(formatted)
+        if len(self.lines) > self.buffer_size:
+            self.flush()
+
+    def note(self, line):
+        """Write informational line, like progress of validation."""
+        self.lines.append(line)
+        if len(self.lines) > self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        """Write all buffered lines."""
+        if self.lines:
+            # standard output is looked up when written, so it can be redirected
+            stream = self.stream if self.stream is not None else sys.stdout
+            stream.write("\n".join(self.lines) + "\n")
+            self.lines = []
+
+
+class ListSink:
+
+    """Sink that collects results that are not valid, or all results when requested."""
+
+    def __init__(self, all_results=False):
+        """Initialize empty list of results."""
+        self.all_results = all_results
+        self.results = []
+
+    def __call__(self, result):
+        """Store the result."""
+        if self.all_results or result.status != "valid":
+            self.results.append(result)
+
+    def note(self, line):
+        """Informational lines are not collected."""
+
+    def flush(self):
+        """Nothing needs to be written."""
+
+
+class NullSink:
+
+    """Sink that discards all results, used when printing of problems is switched off."""
+
+    def __call__(self, result):
+        """Discard the result."""
+
+    def note(self, line):
+        """Discard informational line."""
+
+    def flush(self):
+        """Nothing needs to be written."""
@@ -0,0 +1,442 @@
+#!/usr/bin/env python3
+# vim: set fileencoding=utf-8
+
+# Copyright © 2024 Pavel Tisnovsky
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Validator for results stored in table `report` in RDS.
+
+Rows are read from a dump of the table: PostgreSQL COPY in text format (the
+default output of `COPY report TO STDOUT`, or one data section of `pg_dump`
+output starting with `COPY ... FROM stdin;` header and ending with
+end-of-data marker), CSV with header line (`COPY ... WITH (FORMAT csv,
+HEADER)`), or SQLite database with the same table. Just the columns
+`org_id`, `cluster` and `report` are validated, the report is checked by the
+same schema as the "Report" node in messages from ccx.ocp.results topic.
+Fields with escaped bytes that are not UTF-8 are reported as invalid values.
+
+Rows are read and validated in batches. When more jobs are requested,
+batches are validated by a pool of worker processes, while the main process
+reads the next batches and checks that every cluster is stored just once.
+Clusters seen so far are kept in a temporary SQLite database on disk, so
+tables with millions of rows can be checked without keeping all keys in
+memory.
+"""
+
+import csv
+import os
+import re
+import sqlite3
+from argparse import ArgumentParser
+from collections import deque
+from itertools import islice
+
+from ccx_ocp_results import memoized_schemas, reportSchema
+from common import (
+    DEFAULT_BATCH_SIZE,
+    count_result,
+    empty_report,
+    prepare_validator,
+    print_profile,
+    print_report,
+    worker_pool_context,
+)
+from results import PrintSink, ValidationResult, exception_result, file_problem_result, valid_result
+from validators import (
+    jsonInStrSchemaValidator,
+    posIntInStringValidator,
+    posIntValidator,
+    uuidValidator,
+)
+from voluptuous import Invalid
+
+# suffixes of SQLite databases, CSV files, all other files are read as COPY text format
+SQLITE_SUFFIXES = (".db", ".sqlite", ".sqlite3")
+CSV_SUFFIX = ".csv"
+
+# columns validated by this script, in the order they are stored in table
+COLUMNS = ("org_id", "cluster", "report")
+
+# NULL value and escape sequences used by COPY text format
+COPY_NULL = "\\N"
+# octal and hexadecimal escapes are bytes, consecutive ones are matched together
+COPY_ESCAPE_RE = re.compile(r"((?:\\(?:[0-7]{1,3}|x[0-9a-fA-F]{1,2}))+)|\\(.)")
+COPY_BYTE_ESCAPE_RE = re.compile(r"\\(?:([0-7]{1,3})|x([0-9a-fA-F]{1,2}))")
+COPY_ESCAPES = {"b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t", "v": "\v"}
+
+# header of data section in pg_dump output, with list of columns, and end of data
+COPY_HEADER_RE = re.compile(r"COPY \S+ \((?P<columns>[^)]*)\) FROM stdin;")
+COPY_END = "\\."
+
+# reports are long strings, longer than the default limit of csv module
+CSV_FIELD_SIZE_LIMIT = 2**31 - 1
+
+# number of batches sent to worker processes ahead of the batch being checked
+BATCHES_PER_WORKER = 2
+
+# max. number of clusters looked up in the set of clusters by one query
+CLUSTERS_PER_QUERY = 500
+
+# validator used by worker processes, set when worker is started
+_worker_validator = None
+
+
+def copy_byte(match):
+    """Convert one octal or hexadecimal escape sequence into value of byte."""
+    octal, hexadecimal = match.groups()
+    if octal is not None:
+        # like PostgreSQL, just the lowest byte of octal value is used
+        return int(octal, 8) & 0xFF
+    return int(hexadecimal, 16)
+
+
+def copy_escape(match):
+    """Replace one escape sequence, or sequence of escaped bytes, used by COPY text format."""
+    escaped_bytes, character = match.groups()
+    if escaped_bytes is not None:
+        # escaped bytes are in server encoding (UTF-8), so one character can
+        # be escaped by more bytes; invalid sequences raise UnicodeDecodeError
+        return bytes(map(copy_byte, COPY_BYTE_ESCAPE_RE.finditer(escaped_bytes))).decode("utf-8")
+    return COPY_ESCAPES.get(character, character)
+
+
+def copy_field(value):
+    """Decode one field stored in COPY text format, None for NULL."""
+    if value == COPY_NULL:
+        return None
+    # most fields (IDs) don't contain any escape sequence
+    if "\\" not in value:
+        return value
+    return COPY_ESCAPE_RE.sub(copy_escape, value)
+
+
+class UndecodableField:
+
+    """Field with escaped bytes that are not UTF-8, reported as invalid value of its column."""
+
+    def __init__(self, exception):
+        """Keep just the message, so the field can be sent to worker processes."""
+        self.message = str(exception)
+
+
+def copy_row_field(fields, position):
+    """Decode field of row at given position, missing fields are NULL."""
+    if position is None or position >= len(fields):
+        return None
+    try:
+        return copy_field(fields[position])
+    except UnicodeDecodeError as e:
+        # problem with one field is reported for its row, other rows are read
+        return UndecodableField(e)
+
+
+def copy_header_positions(line):
+    """Find positions of validated columns in header of data section, None for other lines."""
+    match = COPY_HEADER_RE.fullmatch(line)
+    if match is None:
+        return None
+    columns = [column.strip().strip('"') for column in match.group("columns").split(",")]
+    return [columns.index(column) if column in columns else None for column in COLUMNS]
+
+
+def copy_rows(input_file):
+    """Read rows from dump in COPY text format, yield values of validated columns."""
+    positions = range(len(COLUMNS))
+    with open(input_file, encoding="utf-8", newline="\n") as fin:
+        for number, line in enumerate(fin):
+            line = line.rstrip("\n")
+            # data section of pg_dump output lists columns in its header
+            if number == 0:
+                header = copy_header_positions(line)
+                if header is not None:
+                    positions = header
+                    continue
+            if line == COPY_END:
+                return
+            # newlines in values are escaped, so one line contains one row
+            fields = line.split("\t")
+            # missing columns are reported as missing values
+            yield tuple(copy_row_field(fields, position) for position in positions)
+
+
+def csv_rows(input_file):
+    """Read rows from CSV file with header, yield values of validated columns."""
+    csv.field_size_limit(CSV_FIELD_SIZE_LIMIT)
+    with open(input_file, encoding="utf-8", newline="") as fin:
+        for row in csv.DictReader(fin):
+            yield tuple(row.get(column) for column in COLUMNS)
+
+
+def sqlite_rows(input_file):
+    """Read rows from table report in SQLite database, yield values of validated columns."""
+    # database is opened read only, so it is not created when it does not exist
+    connection = sqlite3.connect(f"file:{input_file}?mode=ro", uri=True)
+    try:
+        yield from connection.execute(f"SELECT {', '.join(COLUMNS)} FROM report")
+    finally:
+        connection.close()
+
+
+def table_rows(input_file):
+    """Read rows from dump of table, the format is selected by file suffix."""
+    suffix = os.path.splitext(input_file)[1].lower()
+    if suffix in SQLITE_SUFFIXES:
+        return sqlite_rows(input_file)
+    if suffix == CSV_SUFFIX:
+        return csv_rows(input_file)
+    return copy_rows(input_file)
+
+
+def row_batches(rows, batch_size=DEFAULT_BATCH_SIZE):
+    """Split rows into batches, every row is prefixed by its index (starting from 1)."""
+    indexed = ((index,) + tuple(row) for index, row in enumerate(rows, 1))
+    while True:
+        batch = list(islice(indexed, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def orgIDValidator(value):
+    """Validate organization ID, stored as number or as string in text dumps."""
+    if type(value) is str:
+        posIntInStringValidator(value)
+    else:
+        posIntValidator(value)
+
+
+def column_result(index, column, exception):
+    """Construct result for value refused in given column."""
+    result = exception_result(index, exception)
+    return result._replace(error_path=[column] + (result.error_path or []),
+                           message=f"row {index}: {column}: {result.message}")
+
+
+def check_row(validator, row):
+    """Validate one row, return structured result."""
+    index, org_id, cluster, report = row
+    checks = (("org_id", orgIDValidator, org_id),
+              ("cluster", uuidValidator, cluster),
+              ("report", lambda value: jsonInStrSchemaValidator(validator, value), report))
+    for column, check, value in checks:
+        try:
+            if isinstance(value, UndecodableField):
+                raise Invalid(value.message)
+            check(value)
+        except Exception as e:
+            return column_result(index, column, e)
+    return valid_result(index)
+
+
+def row_key(value):
+    """Convert value of key column to be stored in set of clusters, None if it can't be decoded."""
+    return None if isinstance(value, UndecodableField) else value
+
+
+def check_batch(validator, batch):
+    """Validate batch of rows, return keys and structured result of every row."""
+    return [(index, row_key(org_id), row_key(cluster),
+             check_row(validator, (index, org_id, cluster, report)))
+            for index, org_id, cluster, report in batch]
+
+
+def _init_worker(validator):
+    """Set validator used by worker process."""
+    global _worker_validator
+    _worker_validator = validator
+
+
+def _check_batch_in_worker(batch):
+    """Validate batch of rows in worker process."""
+    return check_batch(_worker_validator, batch)
+
+
+def checked_batches(validator, batches, jobs=1):
+    """Validate batches of rows, by a pool of worker processes when more jobs are requested.
+
+    Checked batches are yielded in the input order. Just a few batches are
+    sent to workers ahead, so the table is not read into memory at once.
+    """
+    if jobs <= 1:
+        for batch in batches:
+            yield check_batch(validator, batch)
+        return
+    with worker_pool_context().Pool(jobs, initializer=_init_worker,
+                                    initargs=(validator,)) as pool:
+        pending = deque()
+        for batch in batches:
+            pending.append(pool.apply_async(_check_batch_in_worker, (batch,)))
+            if len(pending) >= jobs * BATCHES_PER_WORKER:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+
+class ClusterSet:
+
+    """Set of clusters stored in SQLite database, with the first row of each cluster.
+
+    Database with empty filename is a temporary database on disk, which is
+    removed when it is closed.
+    """
+
+    def __init__(self, filename=""):
+        """Open the database and create table with clusters."""
+        self.connection = sqlite3.connect(filename)
+        with self.connection:
+            self.connection.execute("CREATE TABLE IF NOT EXISTS clusters ("
+                                    "cluster TEXT PRIMARY KEY, org_id, row INTEGER NOT NULL"
+                                    ") WITHOUT ROWID")
+
+    def __enter__(self):
+        """Use the set as a context manager."""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Close the database when leaving the context."""
+        self.close()
+
+    def close(self):
+        """Close the database."""
+        self.connection.close()
+
+    def add_rows(self, rows):
+        """Add clusters from rows (index, org_id, cluster) into the set.
+
+        For every row the first row with the same cluster is returned as
+        (index, org_id), or None when the cluster has not been seen yet.
+        """
+        clusters = list({cluster for _, _, cluster in rows if cluster is not None})
+        seen = {}
+        for start in range(0, len(clusters), CLUSTERS_PER_QUERY):
+            chunk = clusters[start:start + CLUSTERS_PER_QUERY]
+            query = ("SELECT cluster, row, org_id FROM clusters WHERE cluster IN "
+                     f"({', '.join('?' * len(chunk))})")
+            seen.update((cluster, (index, org_id))
+                        for cluster, index, org_id in self.connection.execute(query, chunk))
+
+        first_rows = []
+        new_clusters = []
+        for index, org_id, cluster in rows:
+            first = seen.get(cluster) if cluster is not None else None
+            first_rows.append(first)
+            if first is None and cluster is not None:
+                seen[cluster] = (index, org_id)
+                new_clusters.append((cluster, org_id, index))
+        with self.connection:
+            self.connection.executemany("INSERT INTO clusters VALUES (?, ?, ?)", new_clusters)
+        return first_rows
+
+
+def duplicate_result(index, org_id, first):
+    """Construct result for row with cluster stored already in given first row."""
+    first_index, first_org_id = first
+    if first_org_id == org_id:
+        message = f"row {index}: duplicate org_id+cluster, stored in row {first_index} already"
+    else:
+        message = (f"row {index}: cluster is stored for organization {first_org_id} "
+                   f"in row {first_index} already")
+    return ValidationResult(index, "invalid", ["cluster"], message)
+
+
+def table_results(validator, rows, clusters, jobs=1, batch_size=DEFAULT_BATCH_SIZE):
+    """Validate rows of table, yield structured result of every row and number of duplicates."""
+    for checked in checked_batches(validator, row_batches(rows, batch_size), jobs):
+        first_rows = clusters.add_rows([(index, org_id, cluster)
+                                        for index, org_id, cluster, _ in checked])
+        for i, (index, org_id, _, result) in enumerate(checked):
+            first = first_rows[i]
+            if first is None:
+                yield result, False
+            elif result.status == "valid":
+                yield duplicate_result(index, org_id, first), True
+            else:
+                # problem in row content is reported, duplicate is just counted
+                yield result, True
+
+
+def validate_table(validator, input_file, verbose, jobs=1, batch_size=DEFAULT_BATCH_SIZE):
+    """Validate dump of table report, return report with number of duplicate clusters."""
+    report = empty_report()
+    report["duplicates"] = 0
+    sink = PrintSink(verbose)
+    try:
+        with ClusterSet() as clusters:
+            for result, duplicate in table_results(validator, table_rows(input_file), clusters,
+                                                   jobs, batch_size):
+                count_result(report, result)
+                report["duplicates"] += duplicate
+                sink(result)
+    except (OSError, UnicodeDecodeError, csv.Error, sqlite3.Error) as e:
+        # results of rows read before the problem are kept
+        result = file_problem_result(e)
+        count_result(report, result)
+        sink(result)
+    finally:
+        sink.flush()
+    return report
+
+
+def cli_arguments(args=None):
+    """Retrieve all CLI arguments."""
+    parser = ArgumentParser(description="Validator for results stored in table report")
+    parser.add_argument("-i", "--input", dest="input", required=True,
+                        help="dump of table report (COPY text format, CSV, or SQLite)")
+    parser.add_argument("-v", "--verbose", dest="verbose", action="store_true", default=False,
+                        help="make it verbose")
+    parser.add_argument("-n", "--no-colors", dest="nocolors", action="store_true", default=None,
+                        help="disable color output")
+    parser.add_argument("-j", "--jobs", dest="jobs", type=int, default=1,
+                        help="number of worker processes used to validate rows")
+    parser.add_argument("--batch-size", dest="batch_size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help="number of rows validated by worker process at once")
+    parser.add_argument("-c", "--compile", dest="compile", action="store_true", default=False,
+                        help="compile schema into specialized validator before validation")
+    parser.add_argument("--memoize", dest="memoize", type=int, default=0,
+                        help="number of accepted sub-documents remembered to skip their validation")
+    parser.add_argument("-p", "--profile", dest="profile", action="store_true", default=False,
+                        help="measure time spent in validators")
+    parser.add_argument("--profile-json", dest="profile_json", metavar="FILE", default=None,
+                        help="store profile into JSON file")
+    # reports are decoded by validator, metrics are not exported by this script
+    parser.set_defaults(json_decoder="auto", metrics_port=None)
+    args = parser.parse_args(args)
+
+    # profile is collected by this process only, not by worker processes
+    if args.profile and args.jobs > 1:
+        parser.error("argument -p/--profile can't be used together with -j/--jobs")
+    return args
+
+
+def main():
+    """Entry point to this script."""
+    # Parse all CLI arguments.
+    args = cli_arguments()
+
+    # validator is compiled and measured according to CLI arguments
+    validator = prepare_validator(reportSchema, "results_in_rds", args, memoized_schemas)
+
+    # validate all rows from dump of table
+    report = validate_table(validator, args.input, args.verbose, args.jobs, args.batch_size)
+
+    # print report from schema validation
+    print_report(report, args.nocolors)
+    print(f"Duplicate clusters: {report['duplicates']}")
+
+    # print profile of validation when requested
+    print_profile(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+# vim: set fileencoding=utf-8
+
+# Copyright © 2024 Pavel Tisnovsky
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unit tests for results_in_rds module."""
+
+import csv
+import json
+import sqlite3
+import sys
+
+import pytest
+from ccx_ocp_results import reportSchema
+from results_in_rds import (
+    ClusterSet,
+    cli_arguments,
+    copy_field,
+    main,
+    row_batches,
+    table_rows,
+    validate_table,
+)
+
+CLUSTER = "5d5892d3-1f74-4ccf-91af-548dfc9767aa"
+OTHER_CLUSTER = "6d5892d3-1f74-4ccf-91af-548dfc9767ab"
+
+REPORT = {
+    "system": {"metadata": {}, "hostname": None},
+    "reports": [],
+    "fingerprints": [],
+    "skips": [],
+    "info": [],
+    "pass": [],
+}
+
+# rows stored in table: valid rows, wrong report, wrong cluster, duplicates
+ROWS = [
+    (1, CLUSTER, json.dumps(REPORT)),
+    (2, OTHER_CLUSTER, json.dumps(dict(REPORT, system={"hostname": None}))),
+    (2, "foo", json.dumps(REPORT)),
+    (1, CLUSTER, json.dumps(REPORT)),
+    (3, CLUSTER, json.dumps(REPORT)),
+]
+
+EXPECTED_REPORT = {"processed": 5, "valid": 1, "invalid": 4, "error": 0, "duplicates": 2}
+
+
+def copy_value(value):
+    """Encode one value into COPY text format."""
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n")
+
+
+def write_copy_dump(input_file, rows):
+    """Write rows in COPY text format, with all columns of table report."""
+    with open(input_file, "w", encoding="utf-8") as fout:
+        for org_id, cluster, report in rows:
+            values = (org_id, cluster, report, "2024-01-10 12:00:00", "2024-01-10 12:00:00", 42)
+            fout.write("\t".join(copy_value(value) for value in values) + "\n")
+
+
+def write_pg_dump_section(input_file, rows):
+    """Write data section of pg_dump output, with columns in different order than in table."""
+    with open(input_file, "w", encoding="utf-8") as fout:
+        fout.write('COPY public.report (cluster, "org_id", reported_at, report) FROM stdin;\n')
+        for org_id, cluster, report in rows:
+            values = (cluster, org_id, "2024-01-10 12:00:00", report)
+            fout.write("\t".join(copy_value(value) for value in values) + "\n")
+        # lines after the end of data are not rows
+        fout.write("\\.\n\n\n--\n-- PostgreSQL database dump complete\n--\n")
+
+
+def write_csv_dump(input_file, rows):
+    """Write rows into CSV file with header."""
+    with open(input_file, "w", encoding="utf-8", newline="") as fout:
+        writer = csv.writer(fout)
+        writer.writerow(("org_id", "cluster", "report", "reported_at"))
+        for row in rows:
+            writer.writerow(row + ("2024-01-10 12:00:00",))
+
+
+def write_sqlite_dump(input_file, rows):
+    """Write rows into table report in SQLite database."""
+    connection = sqlite3.connect(input_file)
+    with connection:
+        connection.execute("CREATE TABLE report (org_id INTEGER NOT NULL, cluster VARCHAR, "
+                           "report VARCHAR, reported_at TIMESTAMP)")
+        connection.executemany("INSERT INTO report VALUES (?, ?, ?, '2024-01-10')", rows)
+    connection.close()
+
+
+DUMP_WRITERS = {
+    "report.copy": write_copy_dump,
+    "report.sql": write_pg_dump_section,
+    "report.csv": write_csv_dump,
+    "report.db": write_sqlite_dump,
+}
+
+
+@pytest.fixture(params=sorted(DUMP_WRITERS))
+def dump(request, tmpdir):
+    """Dump of table report in all supported formats."""
+    input_file = str(tmpdir.join(request.param))
+    DUMP_WRITERS[request.param](input_file, ROWS)
+    return input_file
+
+
+def test_copy_field():
+    """Check that values in COPY text format are decoded."""
+    assert copy_field("\\N") is None
+    assert copy_field("foo") == "foo"
+    assert copy_field("a\\tb\\nc\\\\d\\101\\x42\\N") == "a\tb\nc\\dABN"
+    assert copy_field("\\\\101") == "\\101"
+
+
+def test_copy_field_escaped_bytes():
+    """Check that consecutive escaped bytes are decoded as UTF-8."""
+    assert copy_field("caf\\303\\251") == "café"
+    assert copy_field("\\xe2\\x82\\254 \\360\\x9f\\x98\\x80") == "€ 😀"
+    with pytest.raises(UnicodeDecodeError):
+        copy_field("caf\\303")
+
+
+def test_table_rows(dump):
+    """Check that validated columns are read from all formats."""
+    rows = [(int(org_id), cluster, report) for org_id, cluster, report in table_rows(dump)]
+    assert rows == ROWS
+
+
+def test_table_rows_copy_null(tmpdir):
+    """Check that NULL values and missing columns are read as None."""
+    input_file = tmpdir.join("report.copy")
+    input_file.write(f"1\t{CLUSTER}\t\\N\n2\n")
+    assert list(table_rows(str(input_file))) == [("1", CLUSTER, None), ("2", None, None)]
+
+
+def test_table_rows_copy_end(tmpdir):
+    """Check that rows are read just up to the end of data, header is recognized on first line."""
+    input_file = tmpdir.join("report.copy")
+    input_file.write(f"1\t{CLUSTER}\t{{}}\n\\.\n2\t{CLUSTER}\t{{}}\n")
+    assert list(table_rows(str(input_file))) == [("1", CLUSTER, "{}")]
+
+    # header without validated columns, and header in the middle of data
+    input_file.write("COPY report (org_id, id) FROM stdin;\n1\t2\nCOPY report (id) FROM stdin;\n")
+    assert list(table_rows(str(input_file))) == [("1", None, None),
+                                                 ("COPY report (id) FROM stdin;", None, None)]
+
+
+def test_row_batches():
+    """Check that rows are split into batches with indexes."""
+    batches = list(row_batches([("a",), ("b",), ("c",)], 2))
+    assert batches == [[(1, "a"), (2, "b")], [(3, "c")]]
+    assert list(row_batches([], 2)) == []
+
+
+def test_cluster_set():
+    """Check that the first row is found for clusters stored already."""
+    with ClusterSet() as clusters:
+        assert clusters.add_rows([(1, 1, CLUSTER), (2, 1, None), (3, 2, CLUSTER)]) == [
+            None, None, (1, 1)]
+        assert clusters.add_rows([(4, 1, OTHER_CLUSTER), (5, 3, CLUSTER)]) == [None, (1, 1)]
+
+
+@pytest.mark.parametrize("batch_size", (1, 2, 256))
+def test_validate_table(dump, capsys, batch_size):
+    """Check that wrong rows and duplicate clusters are reported."""
+    report = validate_table(reportSchema, dump, False, batch_size=batch_size)
+    assert report == EXPECTED_REPORT
+
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0].startswith("Validation error: row 2: report: ")
+    assert lines[0].endswith("@ data['system']['metadata']")
+    assert lines[1].startswith("Validation error: row 3: cluster: ")
+    assert lines[2:] == [
+        "Validation error: row 4: duplicate org_id+cluster, stored in row 1 already",
+        "Validation error: row 5: cluster is stored for organization 1 in row 1 already"]
+
+
+@pytest.mark.parametrize("value", ("", "{", "[]", "42", "\\N"))
+def test_validate_table_wrong_reports(tmpdir, capsys, value):
+    """Check that reports that are not JSON objects are refused."""
+    input_file = tmpdir.join("report.copy")
+    input_file.write(f"1\t{CLUSTER}\t{value}\n")
+
+    report = validate_table(reportSchema, str(input_file), False)
+    assert report == {"processed": 1, "valid": 0, "invalid": 1, "error": 0, "duplicates": 0}
+    assert "row 1: report: " in capsys.readouterr().out
+
+
+@pytest.mark.parametrize("verbose", (False, True))
+@pytest.mark.parametrize("jobs", (2, 3))
+def test_validate_table_in_parallel(tmpdir, capsys, verbose, jobs):
+    """Check that rows validated in parallel are reported the same as sequentially."""
+    input_file = str(tmpdir.join("report.copy"))
+    write_copy_dump(input_file, ROWS * 10)
+    expected = validate_table(reportSchema, input_file, verbose, batch_size=3)
+    expected_output = capsys.readouterr().out
+
+    report = validate_table(reportSchema, input_file, verbose, jobs, batch_size=3)
+    assert report == expected
+    assert report["duplicates"] == 47
+    assert capsys.readouterr().out == expected_output
+
+
+def test_validate_table_nonexistent_file():
+    """Check that missing dumps are reported."""
+    for input_file in ("this-does-not-exist.copy", "this-does-not-exist.db"):
+        report = validate_table(reportSchema, input_file, False)
+        assert report == {"processed": 0, "valid": 0, "invalid": 0, "error": 1, "duplicates": 0}
+
+
+def test_validate_table_escaped_bytes(tmpdir, capsys):
+    """Check that reports with characters escaped as bytes are decoded."""
+    report = dict(REPORT, system={"metadata": {"name": "café"}, "hostname": None})
+    input_file = str(tmpdir.join("report.copy"))
+    write_copy_dump(input_file, [(1, CLUSTER, json.dumps(report, ensure_ascii=False))])
+    with open(input_file, encoding="utf-8") as fin:
+        content = fin.read().replace("é", "\\303\\251")
+    with open(input_file, "w", encoding="utf-8") as fout:
+        fout.write(content)
+
+    assert list(table_rows(input_file))[0][2] == json.dumps(report, ensure_ascii=False)
+    assert validate_table(reportSchema, input_file, False)["valid"] == 1
+
+
+def test_validate_table_undecodable_field(tmpdir, capsys):
+    """Check that escaped bytes that are not UTF-8 are reported just for their row."""
+    input_file = tmpdir.join("report.copy")
+    input_file.write(f'1\t{CLUSTER}\t{{"a": "caf\\303"}}\n'
+                     f"2\t{OTHER_CLUSTER}\\377\t{{}}\n"
+                     f"1\t{CLUSTER}\t{json.dumps(REPORT)}\n")
+
+    report = validate_table(reportSchema, str(input_file), False)
+    assert report == {"processed": 3, "valid": 0, "invalid": 3, "error": 0, "duplicates": 1}
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0].startswith("Validation error: row 1: report: 'utf-8' codec can't decode")
+    assert lines[1].startswith("Validation error: row 2: cluster: 'utf-8' codec can't decode")
+    assert lines[2] == ("Validation error: row 3: "
+                        "duplicate org_id+cluster, stored in row 1 already")
+
+
+def test_cli_arguments():
+    """Check that just options used by this validator are accepted."""
+    args = cli_arguments(["-i", "report.csv", "-j", "2", "--batch-size", "10", "-c"])
+    assert (args.input, args.jobs, args.batch_size, args.compile) == ("report.csv", 2, 10, True)
+    with pytest.raises(SystemExit):
+        cli_arguments(["-i", "report.csv", "-m"])
+    with pytest.raises(SystemExit):
+        cli_arguments(["-i", "report.csv", "-p", "-j", "2"])
+
+
+def test_main(tmpdir, capsys, monkeypatch):
+    """Test the main function validating dump of table."""
+    input_file = str(tmpdir.join("report.csv"))
+    write_csv_dump(input_file, ROWS)
+
+    monkeypatch.setattr(sys, "argv", ["results_in_rds.py", "-i", input_file, "-n"])
+    main()
+    output = capsys.readouterr().out
+    assert "Processed messages: 5" in output
+    assert "Invalid messages:   4" in output
+    assert "Duplicate clusters: 2" in output
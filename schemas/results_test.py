@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# vim: set fileencoding=utf-8
+
+# Copyright © 2024 Pavel Tisnovsky
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unit tests for results module."""
+
+import io
+import pickle
+
+import pytest
+from results import (
+    ListSink,
+    NullSink,
+    PrintSink,
+    ValidationResult,
+    checkpoint_problem_result,
+    decoding_problem_result,
+    exception_result,
+    file_problem_result,
+    format_result,
+    valid_result,
+)
+from voluptuous import Invalid, MultipleInvalid, Required, Schema
+
+RESULTS = [
+    valid_result(1),
+    ValidationResult(2, "invalid", ["id"], "expected int for dictionary value @ data['id']"),
+    ValidationResult(3, "error", None, "'NoneType' object is not subscriptable"),
+    ValidationResult(None, "error", None, "[Errno 2] No such file or directory: 'foo'"),
+]
+
+
+def test_exception_result():
+    """Check results constructed for exceptions."""
+    schema = Schema({"report": {"id": int}})
+    with pytest.raises(MultipleInvalid) as excinfo:
+        schema({"report": {"id": "1"}})
+
+    result = exception_result(42, excinfo.value)
+    assert result == ValidationResult(42, "invalid", ["report", "id"],
+                                      "expected int for dictionary value @ data['report']['id']")
+
+    result = exception_result(1, Invalid("wrong value"))
+    assert result == ValidationResult(1, "invalid", [], "wrong value")
+    result = exception_result(1, ValueError("Empty payload"))
+    assert result == ValidationResult(1, "invalid", None, "Empty payload")
+    assert exception_result(1, KeyError("id")) == ValidationResult(1, "error", None, "'id'")
+
+
+def test_exception_result_markers():
+    """Check that markers in path are replaced by keys, so results can be pickled."""
+    schema = Schema({Required("report"): {Required("id"): int}})
+    with pytest.raises(MultipleInvalid) as excinfo:
+        schema({"report": {}})
+
+    result = exception_result(1, excinfo.value)
+    assert [type(key) for key in result.error_path] == [str, str]
+    assert pickle.loads(pickle.dumps(result)) == result
+
+
+def test_file_problem_result():
+    """Check results constructed for problems with input file."""
+    result = file_problem_result(FileNotFoundError(2, "No such file or directory"))
+    assert result.index is None
+    assert result.status == "error"
+    assert format_result(result) == "File-related problem: [Errno 2] No such file or directory"
+
+
+def test_problem_results():
+    """Check results constructed for problems with single message and checkpoint."""
+    result = decoding_problem_result(ValueError("Expecting value"))
+    assert result.index is None
+    assert result.status == "invalid"
+    assert format_result(result) == "Validation error: Expecting value"
+
+    result = decoding_problem_result(MemoryError("out of memory"))
+    assert result.status == "error"
+    assert format_result(result) == "Other problem: out of memory"
+
+    result = checkpoint_problem_result(ValueError("checkpoint of other file"))
+    assert result.status == "error"
+    assert format_result(result) == "Checkpoint-related problem: checkpoint of other file"
+
+
+def test_format_result_with_payload():
+    """Check that payload is formatted after the problem."""
+    result = ValidationResult(1, "invalid", ["id"], "wrong id", payload={"id": "x"})
+    assert format_result(result) == "Validation error: wrong id\n{'id': 'x'}"
+
+
+def test_format_result():
+    """Check that results are formatted the same way as problems printed by validators."""
+    assert [format_result(result) for result in RESULTS] == [
+        None,
+        "Validation error: expected int for dictionary value @ data['id']",
+        "Other problem: 'NoneType' object is not subscriptable",
+        "File-related problem: [Errno 2] No such file or directory: 'foo'"]
+
+
+@pytest.mark.parametrize("buffer_size", (0, 1, 2, 1000))
+def test_print_sink(buffer_size):
+    """Check that print sink writes all problems, regardless of buffer size."""
+    stream = io.StringIO()
+    sink = PrintSink(stream=stream, buffer_size=buffer_size)
+    for result in RESULTS:
+        sink(result)
+    sink.flush()
+
+    assert stream.getvalue() == (
+        "Validation error: expected int for dictionary value @ data['id']\n"
+        "Other problem: 'NoneType' object is not subscriptable\n"
+        "File-related problem: [Errno 2] No such file or directory: 'foo'\n")
+
+
+def test_print_sink_buffering():
+    """Check that lines are written when buffer is full or when flushed."""
+    stream = io.StringIO()
+    sink = PrintSink(stream=stream, buffer_size=2)
+    sink(RESULTS[1])
+    sink(RESULTS[2])
+    assert stream.getvalue() == ""
+    sink(RESULTS[3])
+    assert stream.getvalue().count("\n") == 3
+    sink(RESULTS[0])
+    sink.flush()
+    assert stream.getvalue().count("\n") == 3
+
+
+def test_print_sink_note():
+    """Check that informational lines are written in order with problems."""
+    stream = io.StringIO()
+    sink = PrintSink(stream=stream, buffer_size=10)
+    sink.note("Processed bytes 0-100: 2 messages")
+    sink(RESULTS[1])
+    sink.flush()
+    assert stream.getvalue() == (
+        "Processed bytes 0-100: 2 messages\n"
+        "Validation error: expected int for dictionary value @ data['id']\n")
+
+
+def test_print_sink_verbose(capsys):
+    """Check that all messages are reported by verbose sink printing to standard output."""
+    sink = PrintSink(verbose=True)
+    for result in RESULTS[:2]:
+        sink(result)
+
+    assert capsys.readouterr().out == (
+        "Reading message #1\n"
+        "Reading message #2\n"
+        "Validation error: expected int for dictionary value @ data['id']\n")
+
+
+def test_list_sink():
+    """Check that list sink collects problems, or all results."""
+    sink = ListSink()
+    for result in RESULTS:
+        sink(result)
+    sink.flush()
+    assert sink.results == RESULTS[1:]
+
+    sink = ListSink(all_results=True)
+    for result in RESULTS:
+        sink(result)
+    sink.note("not collected")
+    assert sink.results == RESULTS
+
+
+def test_null_sink(capsys):
+    """Check that null sink discards everything."""
+    sink = NullSink()
+    for result in RESULTS:
+        sink(result)
+    sink.note("not printed")
+    sink.flush()
+    assert capsys.readouterr().out == ""
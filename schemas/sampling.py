@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# vim: set fileencoding=utf-8
+
+# Copyright © 2024 Pavel Tisnovsky
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Sampled validation of big input files with one message per line.
+
+Only a given fraction of lines is validated, the other lines are skipped
+without being decoded. Lines are selected either randomly (each line with the
+given probability) or with a fixed stride and random phase. The random
+generator is seeded, so the same lines are selected when the same file is
+validated again with the same seed.
+
+The ratio of invalid messages in the whole file is estimated from the sample
+together with its confidence interval (Wilson score interval), which stays
+meaningful even for samples without any invalid message.
+"""
+
+import math
+import random
+
+# seed used to select lines by default, so sampled runs are repeatable
+DEFAULT_SAMPLE_SEED = 42
+
+# methods used to select lines
+SAMPLE_METHODS = ("random", "stride")
+
+# confidence level of estimated ratio of invalid messages and its z-score
+CONFIDENCE_LEVEL = 0.95
+CONFIDENCE_Z = 1.959963984540054
+
+
+class Sampler:
+
+    """Seeded selector of lines to be validated."""
+
+    def __init__(self, rate, seed=DEFAULT_SAMPLE_SEED, method="random"):
+        """Initialize sampler selecting given fraction of lines."""
+        if not 0 < rate <= 1:
+            raise ValueError(f"sample rate needs to be in range (0, 1], but got {rate}")
+        if method not in SAMPLE_METHODS:
+            raise ValueError(f"unknown sample method {method}")
+        self.rate = rate
+        self.method = method
+        self.random = random.Random(seed)
+        self.stride = max(1, round(1 / rate))
+        self.skipped = 0
+
+    def first_skip(self):
+        """Compute number of lines skipped before the first selected line."""
+        if self.method == "stride":
+            # random phase, so the same lines are not selected for all seeds
+            return self.random.randrange(self.stride)
+        return self.skip()
+
+    def skip(self):
+        """Compute number of lines skipped before the next selected line."""
+        if self.method == "stride":
+            return self.stride - 1
+        if self.rate >= 1:
+            return 0
+        # gaps between randomly selected lines are geometrically distributed,
+        # so the random generator is called once per selected line only
+        return int(math.log(1.0 - self.random.random()) / math.log(1.0 - self.rate))
+
+    def lines(self, mapped_file, start=0, end=None):
+        """Yield selected lines from mapped file, skipped lines are counted."""
+        line_end = mapped_file.line_end
+        view = mapped_file.view
+        size = mapped_file.size
+        end = size if end is None else min(end, size)
+
+        skip = self.first_skip()
+        while start < end:
+            stop = line_end(start)
+            if skip > 0:
+                skip -= 1
+                self.skipped += 1
+            else:
+                yield view[start:stop]
+                skip = self.skip()
+            start = stop
+
+
+def wilson_interval(failures, trials, z=CONFIDENCE_Z):
+    """Compute confidence interval of ratio of failures by Wilson score method."""
+    if trials == 0:
+        return 0.0, 1.0
+    ratio = failures / trials
+    denominator = 1 + z * z / trials
+    center = (ratio + z * z / (2 * trials)) / denominator
+    margin = z * math.sqrt(ratio * (1 - ratio) / trials + z * z / (4 * trials * trials)) / \
+        denominator
+    return max(0.0, center - margin), min(1.0, center + margin)
+
+
+def add_sample_statistics(report, sampler):
+    """Add sample rate, number of skipped messages and estimated ratio of invalid messages."""
+    failures = report["invalid"] + report["error"]
+    low, high = wilson_interval(failures, report["processed"])
+    report["sample_rate"] = sampler.rate
+    report["skipped"] = sampler.skipped
+    report["invalid_ratio"] = failures / report["processed"] if report["processed"] else 0.0
+    report["invalid_ratio_low"] = low
+    report["invalid_ratio_high"] = high
+    return report
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# vim: set fileencoding=utf-8
+
+# Copyright © 2024 Pavel Tisnovsky
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unit tests for sampling module."""
+
+import pytest
+from mapped_file import MappedFile
+from sampling import Sampler, add_sample_statistics, wilson_interval
+
+
+def sampled_lines(filename, sampler):
+    """Read lines selected by sampler as numbers."""
+    with MappedFile(filename) as mapped_file:
+        return [int(bytes(line)) for line in sampler.lines(mapped_file)]
+
+
+@pytest.fixture
+def numbers_file(tmpdir):
+    """File with 10000 lines containing their numbers."""
+    input_file = tmpdir.join("numbers.txt")
+    input_file.write("\n".join(str(i) for i in range(10000)) + "\n")
+    return str(input_file)
+
+
+@pytest.mark.parametrize("rate", (0, -0.5, 1.5))
+def test_sampler_wrong_rate(rate):
+    """Check that sample rate needs to be in range (0, 1]."""
+    with pytest.raises(ValueError):
+        Sampler(rate)
+
+
+def test_sampler_wrong_method():
+    """Check that unknown sample methods are refused."""
+    with pytest.raises(ValueError):
+        Sampler(0.5, method="reservoir")
+
+
+@pytest.mark.parametrize("method", ("random", "stride"))
+def test_sampler_all_lines(numbers_file, method):
+    """Check that all lines are selected for sample rate 1."""
+    sampler = Sampler(1, method=method)
+    assert sampled_lines(numbers_file, sampler) == list(range(10000))
+    assert sampler.skipped == 0
+
+
+def test_sampler_random_lines(numbers_file):
+    """Check that expected fraction of lines is selected randomly."""
+    sampler = Sampler(0.1)
+    lines = sampled_lines(numbers_file, sampler)
+
+    assert 900 < len(lines) < 1100
+    assert len(lines) + sampler.skipped == 10000
+    assert lines == sorted(set(lines))
+
+    # the same lines are selected with the same seed only
+    assert sampled_lines(numbers_file, Sampler(0.1)) == lines
+    assert sampled_lines(numbers_file, Sampler(0.1, seed=1)) != lines
+
+
+def test_sampler_stride_lines(numbers_file):
+    """Check that every Nth line is selected with the stride method."""
+    sampler = Sampler(0.01, method="stride")
+    lines = sampled_lines(numbers_file, sampler)
+
+    assert len(lines) == 100
+    assert sampler.skipped == 9900
+    assert lines == list(range(lines[0], 10000, 100))
+
+
+def test_sampler_byte_range(numbers_file):
+    """Check that lines are selected from the given byte range only."""
+    sampler = Sampler(1)
+    with MappedFile(numbers_file) as mapped_file:
+        lines = [bytes(line) for line in sampler.lines(mapped_file, 2, 8)]
+    assert lines == [b"1\n", b"2\n", b"3\n"]
+
+
+def test_wilson_interval():
+    """Check confidence intervals of ratio of failures."""
+    assert wilson_interval(0, 0) == (0.0, 1.0)
+
+    low, high = wilson_interval(0, 100)
+    assert low == pytest.approx(0.0, abs=1e-12)
+    assert high == pytest.approx(0.0370, abs=1e-4)
+
+    low, high = wilson_interval(50, 100)
+    assert low == pytest.approx(0.4038, abs=1e-4)
+    assert high == pytest.approx(0.5962, abs=1e-4)
+
+    low, high = wilson_interval(100, 100)
+    assert low == pytest.approx(0.9630, abs=1e-4)
+    assert high == pytest.approx(1.0, abs=1e-12)
+
+
+def test_add_sample_statistics():
+    """Check that estimated ratio of invalid messages is added into report."""
+    sampler = Sampler(0.5)
+    sampler.skipped = 90
+    report = add_sample_statistics({"processed": 100, "valid": 50, "invalid": 40, "error": 10},
+                                   sampler)
+
+    assert report["sample_rate"] == 0.5
+    assert report["skipped"] == 90
+    assert report["invalid_ratio"] == 0.5
+    assert report["invalid_ratio_low"] < 0.5 < report["invalid_ratio_high"]
+
+    report = add_sample_statistics({"processed": 0, "valid": 0, "invalid": 0, "error": 0},
+                                   sampler)
+    assert report["invalid_ratio"] == 0.0
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+# vim: set fileencoding=utf-8
+
+# Copyright © 2024 Pavel Tisnovsky
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Compiler of voluptuous schemas into specialized validator functions.
+
+Voluptuous interprets the schema for every validated message: it walks
+generic dictionaries, looks up `Required` and `Optional` markers, constructs
+output data structures and collects errors into lists. The compiler walks the
+schema just once and generates a tree of closures, each of them specialized
+for one schema node. These closures check the data, raise an exception when
+the data are not valid and return the same value as voluptuous would:
+dictionaries and lists are copied, values returned by validator functions
+replace the original values. Validator functions used in schemas are called
+directly, without any wrappers.
+
+When the fast path rejects the data, the original schema is called. It means
+that the compiled validator accepts and rejects exactly the same inputs as
+the original schema, returns the same values for accepted inputs and raises
+exactly the same exceptions with the same error paths.
+
+Schema nodes that are not supported by the compiler (for example `All`,
+`Exclusive` or keys with default values) are validated by voluptuous itself,
+but still as a part of the fast path.
+"""
+
+import inspect
+
+from memoization import MemoizedSchema, fingerprint
+from voluptuous import ALLOW_EXTRA, PREVENT_EXTRA, Any, Optional, Required, Schema, Undefined
+
+# types of values that are compared by equality in voluptuous schemas
+PRIMITIVE_TYPES = (bool, bytes, int, str, float, complex, type(None))
+
+
+class Rejected(Exception):
+
+    """Exception raised by compiled schema nodes when data are not valid."""
+
+
+def compile_schema(schema):
+    """Compile the schema into validator function with the same behaviour as the schema."""
+    check = compile_node(schema.schema, schema.required, schema.extra)
+
+    def validate(data):
+        """Validate data against the compiled schema."""
+        try:
+            return check(data)
+        except Exception:
+            # let the original schema report the problem
+            return schema(data)
+
+    return validate
+
+
+def compile_node(node, required=False, extra=PREVENT_EXTRA):
+    """Compile one schema node into a function returning validated data or raising an exception.
+
+    Parameters `required` and `extra` have the same meaning as in `Schema`
+    constructor, they are used for plain dictionaries and keys.
+    """
+    # nested schemas have their own settings
+    if isinstance(node, Schema):
+        return compile_node(node.schema, node.required, node.extra)
+
+    if isinstance(node, MemoizedSchema):
+        return compile_memoized(node)
+
+    # the order of checks follows the Schema._compile method
+    if isinstance(node, Any):
+        return compile_any(node, required, extra)
+
+    if hasattr(node, "__voluptuous_compile__"):
+        return compile_generic(node, required, extra)
+
+    if type(node) is dict:
+        return compile_dict(node, required, extra)
+
+    if type(node) is list:
+        return compile_list(node, required, extra)
+
+    if inspect.isclass(node):
+        return compile_type(node)
+
+    if type(node) in PRIMITIVE_TYPES:
+        return compile_literal(node)
+
+    # any exception, not just Invalid, raised by validator function means
+    # that the data are not valid, so the function can be used directly
+    if callable(node):
+        return node
+
+    return compile_generic(node, required, extra)
+
+
+def compile_memoized(node):
+    """Compile memoized schema, accepted data are remembered in its cache."""
+    check = compile_node(node.schema)
+    cache = node.cache
+
+    # accepted data are returned unchanged when found in cache, like
+    # MemoizedSchema does
+    def check_memoized(data):
+        key = fingerprint(data)
+        if key is not None and cache.get(key) is not None:
+            return data
+        output = check(data)
+        if key is not None:
+            cache.put(key, True)
+        return output
+
+    return check_memoized
+
+
+def compile_generic(node, required, extra):
+    """Compile schema node that is validated by voluptuous itself."""
+    return Schema(node, required=required, extra=extra)
+
+
+def compile_type(cls):
+    """Compile schema node that checks the type of value."""
+    def check_type(data):
+        if not isinstance(data, cls):
+            raise Rejected
+        return data
+
+    return check_type
+
+
+def compile_literal(literal):
+    """Compile schema node that checks the value itself."""
+    # voluptuous uses != operator to compare values
+    def check_literal(data):
+        if data != literal:
+            raise Rejected
+        return data
+
+    return check_literal
+
+
+def compile_any(node, required, extra):
+    """Compile Any() node with alternatives that are types or literals."""
+    # alternatives that might raise other exceptions than Invalid need to be
+    # validated by voluptuous to keep the same behaviour
+    if node.discriminant is not None or not all(
+            inspect.isclass(v) or type(v) in PRIMITIVE_TYPES for v in node.validators):
+        return compile_generic(node, required, extra)
+
+    types = tuple(v for v in node.validators if inspect.isclass(v))
+    literals = tuple(v for v in node.validators if not inspect.isclass(v))
+
+    def check_any(data):
+        if isinstance(data, types):
+            return data
+        for literal in literals:
+            if not data != literal:
+                return data
+        raise Rejected
+
+    return check_any
+
+
+def compile_list(node, required, extra):
+    """Compile list node with at most one alternative for its items."""
+    # empty list schema accepts only empty lists
+    if not node:
+        def check_empty_list(data):
+            if not isinstance(data, list) or data:
+                raise Rejected
+            return data
+
+        return check_empty_list
+
+    # voluptuous does not try other alternatives when one of them fails deeper
+    # in the structure, so more alternatives are left to voluptuous itself
+    if len(node) > 1:
+        return compile_generic(node, required, extra)
+
+    check_item = compile_node(node[0], required, extra)
+
+    def check_list(data):
+        if not isinstance(data, list):
+            raise Rejected
+        return type(data)([check_item(item) for item in data])
+
+    return check_list
+
+
+def dict_key(key, required):
+    """Retrieve key literal and required flag for the supported keys, None otherwise."""
+    # plain keys are required only when the whole schema requires them
+    if type(key) is str:
+        return key, required
+
+    # only simple markers are supported
+    if type(key) not in (Required, Optional) or type(key.schema) is not str:
+        return None
+    if not isinstance(key.default, Undefined):
+        return None
+    if isinstance(key, Required) and key.is_complex_key:
+        return None
+    return key.schema, isinstance(key, Required)
+
+
+def compile_keys(node, required, extra):
+    """Compile checks for values stored under simple keys in dictionary node.
+
+    Returns dictionary with check for each key together with tuple of
+    required keys, or None when the node contains keys that are not supported.
+    """
+    if extra not in (ALLOW_EXTRA, PREVENT_EXTRA):
+        return None
+
+    checks = {}
+    required_keys = []
+    for key, value in node.items():
+        compiled_key = dict_key(key, required)
+        if compiled_key is None or compiled_key[0] in checks:
+            return None
+        literal, is_required = compiled_key
+        checks[literal] = compile_node(value, required, extra)
+        if is_required:
+            required_keys.append(literal)
+
+    return checks, tuple(required_keys)
+
+
+def compile_dict(node, required, extra):
+    """Compile dictionary node with simple keys."""
+    compiled = compile_keys(node, required, extra)
+    if compiled is None:
+        return compile_generic(node, required, extra)
+
+    checks, required_keys = compiled
+    return dict_checker(checks, required_keys, extra == ALLOW_EXTRA)
+
+
+def compile_columns(schema):
+    """Compile flat dictionary schema into checks for individual columns.
+
+    Returns dictionary with check for each column together with tuple of
+    required columns, or None when the schema can't be checked column by
+    column.
+    """
+    if type(schema.schema) is not dict:
+        return None
+    return compile_keys(schema.schema, schema.required, schema.extra)
+
+
+def dict_checker(checks, required_keys, allow_extra):
+    """Construct function that checks dictionary with given checks for values."""
+    get_check = checks.get
+
+    def check_dict(data):
+        if not isinstance(data, dict):
+            raise Rejected
+        # output is constructed in the same way and order as in voluptuous
+        output = data.__class__()
+        for key, value in data.items():
+            check = get_check(key)
+            if check is not None:
+                output[key] = check(value)
+            elif allow_extra:
+                output[key] = value
+            else:
+                raise Rejected
+        for key in required_keys:
+            if key not in data:
+                raise Rejected
+        return output
+
+    return check_dict
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+# vim: set fileencoding=utf-8
+
+# Copyright © 2024 Pavel Tisnovsky
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unit tests for schema_compiler module."""
+
+import copy
+import json
+from os import path
+
+import ccx_ocp_results
+import parquet_input_rule_hits
+import platform_upload_announce_messages
+import pytest
+import sqs_messages
+from memoization import memoize_schemas
+from schema_compiler import compile_columns, compile_node, compile_schema
+from voluptuous import ALLOW_EXTRA, All, Any, Invalid, Length, Optional, Required, Schema
+
+# schemas to be compiled together with name of file with correct message
+topic_schemas = (
+        (ccx_ocp_results.schema, "ccx_ocp_results.json"),
+        (parquet_input_rule_hits.schema, "parquet_input_rule_hits.json"),
+        (platform_upload_announce_messages.schema, "platform_upload_announce_messages.json"),
+        (sqs_messages.schema, "sqs_messages.json"),
+        )
+
+# values used to replace the original values in messages
+replacement_values = (None, "", "xyzzy", 0, -1, 42, 1.5, True, [], [{}], {}, {"foo": "bar"})
+
+
+def load_message(filename):
+    """Load message stored in test_data directory."""
+    with open(path.join(path.dirname(__file__), "test_data", filename)) as fin:
+        return json.load(fin)
+
+
+def mutations(message):
+    """Generate all variants of message with exactly one node changed."""
+    yield message
+
+    if isinstance(message, dict):
+        yield [message]
+        variant = copy.copy(message)
+        variant["xyzzy"] = 42
+        yield variant
+        for key in message:
+            # missing key
+            variant = copy.copy(message)
+            del variant[key]
+            yield variant
+            # changed value
+            for value in replacement_values:
+                variant = copy.copy(message)
+                variant[key] = value
+                yield variant
+            # changed value deeper in the structure
+            for value in mutations(message[key]):
+                variant = copy.copy(message)
+                variant[key] = value
+                yield variant
+
+    elif isinstance(message, list):
+        yield message + [{}]
+        for index, item in enumerate(message):
+            for value in list(replacement_values) + list(mutations(item)):
+                variant = copy.copy(message)
+                variant[index] = value
+                yield variant
+
+
+def validation_outcome(validator, data, with_output=False):
+    """Validate data and return description of result, optionally with the returned value."""
+    try:
+        output = validator(data)
+    except Invalid as e:
+        return type(e), str(e), e.path
+    except Exception as e:
+        return type(e), str(e), None
+    return ("output", output) if with_output else None
+
+
+def assert_same_behaviour(schema, data):
+    """Check that compiled schema behaves exactly like the original one."""
+    expected = validation_outcome(schema, data, True)
+    compiled = validation_outcome(compile_schema(schema), data, True)
+    assert compiled == expected
+
+
+@pytest.mark.parametrize("schema, filename", topic_schemas)
+def test_compiled_schema_same_behaviour(schema, filename):
+    """Check that compiled schema accepts and rejects the same messages."""
+    message = load_message(filename)
+    validator = compile_schema(schema)
+
+    # the correct message must be accepted
+    validator(message)
+
+    checked = 0
+    for variant in mutations(message):
+        expected = validation_outcome(schema, variant, True)
+        assert validation_outcome(validator, variant, True) == expected
+        checked += 1
+
+    # make sure a lot of variants were really checked
+    assert checked > 100
+
+
+@pytest.mark.parametrize("cache_size", (1, 1000))
+@pytest.mark.parametrize("compiled", (False, True))
+@pytest.mark.parametrize("module, filename", ((ccx_ocp_results, "ccx_ocp_results.json"),
+                                              (parquet_input_rule_hits,
+                                               "parquet_input_rule_hits.json")))
+def test_memoized_schema_same_behaviour(module, filename, compiled, cache_size):
+    """Check that schema with memoized sub-schemas accepts and rejects the same messages."""
+    message = load_message(filename)
+    validator = memoize_schemas(module.schema, module.memoized_schemas, cache_size)
+    if compiled:
+        validator = compile_schema(validator)
+
+    # the same validator is used for all variants, so most of sub-documents
+    # are found in cache
+    checked = 0
+    for variant in mutations(message):
+        expected = validation_outcome(module.schema, variant)
+        assert validation_outcome(validator, variant) == expected
+        # refused sub-documents are not cached, so the outcome is the same
+        # when the variant is validated again
+        assert validation_outcome(validator, variant) == expected
+        checked += 1
+    assert checked > 100
+
+
+@pytest.mark.parametrize("value", (None, 1, "foo", "bar", [], {}))
+def test_compile_literal(value):
+    """Check compiled schema node with literal value."""
+    assert_same_behaviour(Schema("foo"), value)
+
+
+@pytest.mark.parametrize("value", (None, 1, True, 1.5, "foo", [], {}))
+def test_compile_type(value):
+    """Check compiled schema node with type."""
+    assert_same_behaviour(Schema(int), value)
+    assert_same_behaviour(Schema(str), value)
+    assert_same_behaviour(Schema(dict), value)
+
+
+@pytest.mark.parametrize("value", (None, 1, "foo", 1.5, [], {}))
+def test_compile_any(value):
+    """Check compiled Any node."""
+    assert_same_behaviour(Schema(Any(None, str)), value)
+    assert_same_behaviour(Schema(Any(int, "foo")), value)
+    # alternatives that are not supported by compiler
+    assert_same_behaviour(Schema(Any({"a": int}, [str])), value)
+
+
+@pytest.mark.parametrize("value", (None, [], [1], [1, 2], ["1"], [1, "1"], {}))
+def test_compile_list(value):
+    """Check compiled list nodes."""
+    assert_same_behaviour(Schema([]), value)
+    assert_same_behaviour(Schema([int]), value)
+    assert_same_behaviour(Schema([int, str]), value)
+
+
+@pytest.mark.parametrize("value", (None, {}, {"a": 1}, {"a": "1"}, {"b": 1}, {"a": 1, "b": 2},
+                                   {"a": 1, "c": "x"}, {"a": 1, "c": 1}, []))
+def test_compile_dict(value):
+    """Check compiled dict nodes."""
+    assert_same_behaviour(Schema({"a": int}), value)
+    assert_same_behaviour(Schema({Required("a"): int}), value)
+    assert_same_behaviour(Schema({Required("a"): int, Optional("c"): str}), value)
+    assert_same_behaviour(Schema({Required("a"): int}, extra=ALLOW_EXTRA), value)
+    assert_same_behaviour(Schema({"a": int}, required=True), value)
+    assert_same_behaviour(Schema({Optional("a"): int}, required=True), value)
+    # dictionaries that are not supported by compiler
+    assert_same_behaviour(Schema({Optional("a", default=1): int}), value)
+    assert_same_behaviour(Schema({str: int}), value)
+
+
+@pytest.mark.parametrize("value", ({"a": {}}, {"a": {"b": 1}}, {"a": {"b": "x"}}, {"a": {"c": 1}}))
+def test_compile_nested_dict(value):
+    """Check that nested dictionaries inherit settings while nested schemas don't."""
+    assert_same_behaviour(Schema({"a": {"b": int}}, extra=ALLOW_EXTRA, required=True), value)
+    assert_same_behaviour(Schema({"a": Schema({"b": int})}, extra=ALLOW_EXTRA, required=True),
+                          value)
+
+
+@pytest.mark.parametrize("value", ("", "x", "xyzzy", 1, None))
+def test_compile_generic(value):
+    """Check schema nodes that are validated by voluptuous itself."""
+    assert_same_behaviour(Schema(All(str, Length(min=1, max=3))), value)
+
+
+def test_compile_validator_function():
+    """Check that validator functions are used directly."""
+    def validator(value):
+        if value != 42:
+            raise Invalid("wrong value")
+
+    assert compile_node(validator) is validator
+    assert_same_behaviour(Schema({"a": validator}), {"a": 42})
+    assert_same_behaviour(Schema({"a": validator}), {"a": 1})
+
+
+def test_compile_validator_function_other_exception():
+    """Check that exceptions other than Invalid are propagated the same way."""
+    def validator(value):
+        assert value == 42
+
+    assert_same_behaviour(Schema({"a": validator, "b": int}), {"a": 1, "b": "x"})
+    assert_same_behaviour(Schema({"a": validator}), {"a": 42})
+
+
+def test_compile_columns():
+    """Check compilation of flat schema into checks for columns."""
+    def validator(value):
+        pass
+
+    compiled = compile_columns(Schema({Required("a"): validator, Optional("b"): int}))
+    assert compiled is not None
+
+    checks, required_columns = compiled
+    assert checks["a"] is validator
+    assert set(checks) == {"a", "b"}
+    assert required_columns == ("a",)
+
+
+def test_compile_columns_unsupported_schema():
+    """Check that schemas which can't be checked column by column are refused."""
+    assert compile_columns(Schema([int])) is None
+    assert compile_columns(Schema({str: int})) is None
+    assert compile_columns(Schema({Optional("a", default=1): int})) is None
+
+
+def test_compiled_schema_return_value():
+    """Check that compiled schema returns the same value as the original one."""
+    message = load_message("sqs_messages.json")
+    expected = sqs_messages.schema(message)
+    output = compile_schema(sqs_messages.schema)(message)
+    assert output == expected
+
+    # message body is returned decoded, just like from the original schema
+    body = output["Messages"][0]["Body"]
+    assert isinstance(body, dict)
+    assert body == json.loads(message["Messages"][0]["Body"])
+
+    # output is constructed, the input message is not changed
+    assert isinstance(message["Messages"][0]["Body"], str)
+
+
+def test_compiled_schema_return_transformed_values():
+    """Check that values returned by validator functions replace the original values."""
+    schema = Schema({Required("a"): lambda value: value * 2, Optional("b"): [int]},
+                    extra=ALLOW_EXTRA)
+    data = {"a": 21, "b": [1, 2], "c": "x"}
+    output = compile_schema(schema)(data)
+    assert output == schema(data) == {"a": 42, "b": [1, 2], "c": "x"}
+    assert output["b"] is not data["b"]
@@ -18,16 +18,29 @@
 """Validator for messages consumed from SQS."""
 
 
-from common import cli_arguments, print_report, validate_multiple_messages, validate_single_message
+from common import (
+    checkpoint_from_arguments,
+    cli_arguments,
+    max_errors_from_arguments,
+    prepare_validator,
+    print_profile,
+    print_report,
+    sampler_from_arguments,
+    sink_from_arguments,
+    validate_multiple_messages,
+    validate_single_message,
+)
 from validators import (
-    jsonInStrValidator,
+    jsonInStrSchemaValidator,
     md5Validator,
+    notEmptyStringValidator,
     posIntInStringValidator,
     posIntOrZeroValidator,
     posIntValidator,
+    s3KeyValidator,
     uuidValidator,
 )
-from voluptuous import Optional, Required, Schema
+from voluptuous import ALLOW_EXTRA, Optional, Required, Schema
 
 # Schema for HTTP headers data structure
 httpHeadersSchema = Schema(
@@ -56,13 +69,37 @@ attributesSchema = Schema(
             Required("SentTimestamp"): posIntInStringValidator,
          })
 
+# Schema for object stored in S3 bucket
+s3ObjectSchema = Schema(
+        {
+            Required("key"): s3KeyValidator,
+            Required("size"): posIntOrZeroValidator,
+            Required("eTag"): md5Validator,
+            Required("sequencer"): notEmptyStringValidator,
+         })
+
+# Schema for S3 event notification stored as JSON in message body, records
+# sent by S3 contain more attributes than the ones checked here
+s3EventSchema = Schema(
+        {
+            Required("Records"): [
+                Schema(
+                    {
+                        Required("s3"): Schema(
+                            {
+                                Required("object"): s3ObjectSchema,
+                            }, extra=ALLOW_EXTRA),
+                    }, extra=ALLOW_EXTRA),
+            ],
+         })
+
 # Schema for message data structure (sub-node in the main JSON)
 messageSchema = Schema(
         {
             Required("MessageId"): uuidValidator,
             Required("ReceiptHandle"): posIntInStringValidator,
             Required("MD5OfBody"): md5Validator,
-            Required("Body"): jsonInStrValidator,
+            Required("Body"): lambda value: jsonInStrSchemaValidator(s3EventSchema, value),
             Required("Attributes"): attributesSchema,
          })
 
@@ -82,16 +119,28 @@ def main():
     multiple = args.multiple
     input_file = args.input
 
+    # validator is compiled and measured according to CLI arguments
+    validator = prepare_validator(schema, "sqs_messages", args)
+
     if multiple:
         # process multiple messages stored in one input file
-        report = validate_multiple_messages(schema, input_file, verbose)
+        report = validate_multiple_messages(validator, input_file, verbose, args.jobs,
+                                            checkpoint_from_arguments(args),
+                                            args.dedup_cache,
+                                            max_errors_from_arguments(args),
+                                            sampler_from_arguments(args),
+                                            sink_from_arguments(args))
     else:
         # process single message stored in one input file
-        report = validate_single_message(schema, input_file, verbose)
+        report = validate_single_message(validator, input_file, verbose,
+                                         sink_from_arguments(args))
 
     # print report from schema validation
     print_report(report, args.nocolors)
 
+    # print profile of validation when requested
+    print_profile(args)
+
 
 if __name__ == "__main__":
     main()
@@ -17,6 +17,7 @@
 
 """Unit tests for sqs_messages module."""
 
+import json
 import sys
 
 import pytest
@@ -165,3 +166,31 @@ def test_validate_message_wrong_attributes(validation_schema, verbose, correct_m
     # it should fail
     with pytest.raises(Invalid):
         validate(schema, correct_message, verbose)
+
+
+# contents of message body refused by S3 event schema, and paths to failures
+wrong_bodies = (
+        ({}, ["Records"]),
+        ({"Records": {}}, ["Records"]),
+        ({"Records": [{}]}, ["Records", 0, "s3"]),
+        ({"Records": [{"s3": {"object": {"key": "foo", "size": 1, "eTag": "x" * 32,
+                                         "sequencer": "1"}}}]},
+         ["Records", 0, "s3", "object", "key"]),
+        )
+
+
+@pytest.mark.parametrize("body, error_path", wrong_bodies)
+def test_validate_message_wrong_body(validation_schema, correct_message, body, error_path):
+    """Test that JSON stored in message body is validated by S3 event schema."""
+    correct_message["Messages"][0]["Body"] = json.dumps(body)
+    # it should fail
+    with pytest.raises(Invalid) as excinfo:
+        validate(schema, correct_message, False)
+    assert excinfo.value.path == ["Messages", 0, "Body"] + error_path
+
+
+def test_validate_message_decoded_body(validation_schema, correct_message):
+    """Test that message body is decoded once and returned by the schema."""
+    body = correct_message["Messages"][0]["Body"]
+    validated = schema(correct_message)
+    assert validated["Messages"][0]["Body"] == json.loads(body)
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# vim: set fileencoding=utf-8
+
+# Copyright © 2024 Pavel Tisnovsky
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Long-running validation of messages consumed from Kafka topic.
+
+Messages are consumed in batches with bounded size, so at most one batch of
+messages is in flight at any time. Offsets are committed only after all
+messages from the batch have been validated. When the daemon is stopped or
+killed, messages from the unfinished batch are consumed again after restart.
+
+Throughput and consumer lag (number of messages in assigned partitions that
+have not been consumed yet) are printed periodically.
+
+The consumer is constructed by kafka-python package that needs to be
+installed for this mode. Any other object with the same `poll`, `commit`,
+`assignment`, `end_offsets`, `position`, and `close` methods can be used
+instead.
+
+Unit tests use an in-memory object implementing just this consumer
+interface, they don't speak Kafka protocol. So the daemon logic (batches,
+commits after validation, lag) is tested, but the consumer constructed by
+kafka_consumer() and its communication with a real broker are not.
+"""
+
+import time
+
+from common import count_result, empty_report, line_result
+from results import PrintSink
+
+try:
+    from kafka import KafkaConsumer
+except ImportError:
+    KafkaConsumer = None
+
+# maximum number of messages validated before offsets are committed
+DEFAULT_BATCH_SIZE = 100
+
+# how often (in seconds) throughput and lag are printed
+DEFAULT_REPORT_INTERVAL = 10.0
+
+# how long to wait for new messages in one poll
+POLL_TIMEOUT_MS = 1000
+
+
+def kafka_consumer(bootstrap_server, topic, group_id):
+    """Construct Kafka consumer with offsets committed manually."""
+    if KafkaConsumer is None:
+        raise ImportError("kafka-python package is required to consume messages from Kafka")
+    return KafkaConsumer(topic, bootstrap_servers=bootstrap_server, group_id=group_id,
+                         enable_auto_commit=False, auto_offset_reset="earliest")
+
+
+def consumer_lag(consumer):
+    """Compute number of messages in assigned partitions that have not been consumed yet."""
+    partitions = list(consumer.assignment())
+    if not partitions:
+        return 0
+    end_offsets = consumer.end_offsets(partitions)
+    return sum(end_offsets[partition] - consumer.position(partition)
+               for partition in partitions)
+
+
+def validate_record(schema, record, report, sink):
+    """Validate one message consumed from topic, count its result and pass it to sink."""
+    # message value is not decoded, JSON decoder accepts bytes too
+    result = line_result(schema, record.value, report["processed"] + 1)
+    count_result(report, result)
+    sink(result)
+
+
+def validate_batch(schema, batch, report, sink):
+    """Validate all messages from batch returned by consumer poll."""
+    for records in batch.values():
+        for record in records:
+            validate_record(schema, record, report, sink)
+
+
+def print_statistics(report, elapsed, lag):
+    """Display throughput of validation and consumer lag."""
+    throughput = report["processed"] / elapsed if elapsed > 0 else 0.0
+    print(f"Processed {report['processed']} messages "
+          f"({report['invalid']} invalid, {report['error']} errors), "
+          f"throughput: {throughput:.1f} messages/s, lag: {lag} messages")
+
+
+def serve(schema, consumer, verbose, batch_size=DEFAULT_BATCH_SIZE,
+          report_interval=DEFAULT_REPORT_INTERVAL, max_idle_polls=None, sink=None):
+    """Validate messages consumed from topic until the daemon is interrupted.
+
+    Results are passed to the sink the same way as by validation of input
+    files, problems are printed by default. When `max_idle_polls` is set,
+    the daemon stops after given number of consecutive polls that return no
+    messages.
+    """
+    report = empty_report()
+    if sink is None:
+        sink = PrintSink(verbose)
+
+    started = last_report = time.monotonic()
+    idle_polls = 0
+
+    try:
+        while max_idle_polls is None or idle_polls < max_idle_polls:
+            # at most batch_size messages are in flight
+            batch = consumer.poll(timeout_ms=POLL_TIMEOUT_MS, max_records=batch_size)
+            if batch:
+                idle_polls = 0
+                validate_batch(schema, batch, report, sink)
+                # results of the batch are written before its offsets are committed
+                sink.flush()
+                consumer.commit()
+            else:
+                idle_polls += 1
+
+            now = time.monotonic()
+            if now - last_report >= report_interval:
+                print_statistics(report, now - started, consumer_lag(consumer))
+                last_report = now
+    except KeyboardInterrupt:
+        sink.flush()
+        print("Interrupted, offsets of unfinished batch are not committed")
+    finally:
+        sink.flush()
+        consumer.close()
+
+    return report
@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+# vim: set fileencoding=utf-8
+
+# Copyright © 2024 Pavel Tisnovsky
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unit tests for validation_daemon module."""
+
+import json
+import sys
+from collections import namedtuple
+
+import pytest
+import validation_daemon
+from common import cli_arguments, sink_from_arguments, validate_multiple_messages
+from results import ListSink, ValidationResult
+from validation_daemon import consumer_lag, kafka_consumer, serve
+from voluptuous import Required, Schema
+
+TopicPartition = namedtuple("TopicPartition", ["topic", "partition"])
+ConsumerRecord = namedtuple("ConsumerRecord", ["topic", "partition", "offset", "value"])
+
+TOPIC = "test-topic"
+
+# simple schema used to validate messages in tests
+schema = Schema({Required("id"): int})
+
+
+class LocalBroker:
+
+    """Local stand-in for Kafka broker keeping messages and committed offsets in memory.
+
+    Just the consumer interface used by validation daemon is implemented,
+    Kafka protocol is not.
+    """
+
+    def __init__(self, partitions=2):
+        """Initialize broker with empty partitions."""
+        self.partitions = [[] for _ in range(partitions)]
+        self.committed = {}
+
+    def produce(self, value, partition=0):
+        """Append message to partition."""
+        self.partitions[partition].append(value)
+
+    def consumer(self, group_id="test-group"):
+        """Construct consumer that reads all partitions of the topic."""
+        return LocalConsumer(self, group_id)
+
+
+class LocalConsumer:
+
+    """Consumer with the same interface as KafkaConsumer used by validation daemon."""
+
+    def __init__(self, broker, group_id):
+        """Initialize consumer, start from committed offsets."""
+        self.broker = broker
+        self.group_id = group_id
+        self.positions = {}
+        for partition in range(len(broker.partitions)):
+            tp = TopicPartition(TOPIC, partition)
+            self.positions[tp] = broker.committed.get((group_id, tp), 0)
+        self.polls = []
+        self.commits = 0
+        self.closed = False
+
+    def poll(self, timeout_ms=0, max_records=None):
+        """Fetch at most max_records messages from all partitions."""
+        self.polls.append(max_records)
+        batch = {}
+        remaining = max_records
+        for tp in self.positions:
+            messages = self.broker.partitions[tp.partition]
+            position = self.positions[tp]
+            records = [ConsumerRecord(TOPIC, tp.partition, offset, messages[offset])
+                       for offset in range(position, min(len(messages), position + remaining))]
+            if records:
+                batch[tp] = records
+                self.positions[tp] += len(records)
+                remaining -= len(records)
+            if remaining == 0:
+                break
+        return batch
+
+    def commit(self):
+        """Commit current positions for all partitions."""
+        self.commits += 1
+        for tp, position in self.positions.items():
+            self.broker.committed[(self.group_id, tp)] = position
+
+    def committed_offset(self, tp):
+        """Retrieve offset committed for given partition."""
+        return self.broker.committed.get((self.group_id, tp), 0)
+
+    def assignment(self):
+        """Retrieve partitions assigned to this consumer."""
+        return set(self.positions)
+
+    def end_offsets(self, partitions):
+        """Retrieve offsets of the next messages to be produced into partitions."""
+        return {tp: len(self.broker.partitions[tp.partition]) for tp in partitions}
+
+    def position(self, tp):
+        """Retrieve offset of the next message to be consumed from partition."""
+        return self.positions[tp]
+
+    def close(self):
+        """Close the consumer."""
+        self.closed = True
+
+
+def produce_messages(broker, count):
+    """Produce given number of valid messages into all partitions."""
+    for i in range(count):
+        broker.produce(json.dumps({"id": i}).encode("utf-8"), i % len(broker.partitions))
+
+
+def test_serve_valid_messages():
+    """Check that all messages consumed from topic are validated and committed."""
+    broker = LocalBroker()
+    produce_messages(broker, 25)
+    consumer = broker.consumer()
+
+    report = serve(schema, consumer, False, batch_size=10, max_idle_polls=1)
+
+    assert report == {"processed": 25, "valid": 25, "invalid": 0, "error": 0}
+    assert consumer.closed
+    assert consumer_lag(consumer) == 0
+    assert broker.committed[("test-group", TopicPartition(TOPIC, 0))] == 13
+    assert broker.committed[("test-group", TopicPartition(TOPIC, 1))] == 12
+
+
+def test_serve_invalid_messages():
+    """Check that invalid messages are counted."""
+    broker = LocalBroker(partitions=1)
+    broker.produce(b'{"id": 1}')
+    broker.produce(b'{"id": "1"}')
+    broker.produce(b"not a JSON")
+    broker.produce(b"null")
+    broker.produce(b"[]")
+
+    report = serve(schema, broker.consumer(), False, max_idle_polls=1)
+
+    # list is not a dictionary, so the schema refuses it with Invalid exception
+    assert report == {"processed": 5, "valid": 1, "invalid": 4, "error": 0}
+
+
+@pytest.mark.parametrize("verbose", (False, True))
+def test_serve_prints_the_same_as_validator(tmpdir, capsys, verbose):
+    """Check that problems are printed the same way as by validator of input files."""
+    messages = [b'{"id": 1}', b'{"id": "1"}', b"not a JSON", b"null", b"[]"]
+    input_file = tmpdir.join("messages.json")
+    input_file.write_binary(b"\n".join(messages) + b"\n")
+    expected = validate_multiple_messages(schema, str(input_file), verbose)
+    expected_output = capsys.readouterr().out
+
+    broker = LocalBroker(partitions=1)
+    for message in messages:
+        broker.produce(message)
+    assert serve(schema, broker.consumer(), verbose, max_idle_polls=1) == expected
+    assert capsys.readouterr().out == expected_output
+
+
+def test_serve_sinks(capsys, monkeypatch):
+    """Check that results are passed to sink selected by CLI arguments."""
+    messages = [b'{"id": 1}', b'{"id": "1"}', b"not a JSON"]
+    broker = LocalBroker(partitions=1)
+    for message in messages:
+        broker.produce(message)
+
+    sink = ListSink(all_results=True)
+    report = serve(schema, broker.consumer(), False, max_idle_polls=1, sink=sink)
+    assert report == {"processed": 3, "valid": 1, "invalid": 2, "error": 0}
+    assert [result.index for result in sink.results] == [1, 2, 3]
+    assert sink.results[0] == ValidationResult(1, "valid", None, None)
+    assert [result.status for result in sink.results] == ["valid", "invalid", "invalid"]
+
+    # nothing but statistics is printed in quiet mode
+    monkeypatch.setattr(sys, "argv", ["test", "--serve", "--topic", TOPIC, "-q"])
+    broker = LocalBroker(partitions=1)
+    for message in messages:
+        broker.produce(message)
+    serve(schema, broker.consumer(), False, max_idle_polls=1,
+          sink=sink_from_arguments(cli_arguments(serve_mode=True)))
+    assert capsys.readouterr().out == ""
+
+
+def test_serve_other_problems():
+    """Check that other exceptions raised by schema are counted as errors."""
+    broker = LocalBroker(partitions=1)
+    produce_messages(broker, 3)
+
+    def validator(payload):
+        if payload["id"] == 1:
+            raise KeyError("id")
+
+    report = serve(validator, broker.consumer(), False, max_idle_polls=1)
+    assert report == {"processed": 3, "valid": 2, "invalid": 0, "error": 1}
+
+
+@pytest.mark.parametrize("batch_size", (1, 3, 10, 100))
+def test_serve_bounded_batches(batch_size):
+    """Check that at most batch_size messages are validated before offsets are committed."""
+    broker = LocalBroker()
+    produce_messages(broker, 30)
+    consumer = broker.consumer()
+
+    in_flight = []
+
+    def validator(payload):
+        # messages validated since the last commit
+        in_flight.append(payload["id"])
+        assert len(in_flight) <= batch_size
+
+    # wrap commit to reset the number of messages in flight
+    original_commit = consumer.commit
+
+    def commit():
+        in_flight.clear()
+        original_commit()
+
+    consumer.commit = commit
+
+    report = serve(validator, consumer, False, batch_size=batch_size, max_idle_polls=1)
+
+    assert report["valid"] == 30
+    assert set(consumer.polls) == {batch_size}
+    assert consumer.commits == -(-30 // batch_size)
+
+
+def test_serve_commit_after_validation():
+    """Check that offset of message is committed only after the message is validated."""
+    broker = LocalBroker()
+    produce_messages(broker, 20)
+    consumer = broker.consumer()
+
+    def validator(payload):
+        # offset of message being validated can't be committed yet
+        for tp in consumer.assignment():
+            assert consumer.committed_offset(tp) <= consumer.position(tp)
+        partition = payload["id"] % 2
+        offset = payload["id"] // 2
+        assert consumer.committed_offset(TopicPartition(TOPIC, partition)) <= offset
+
+    report = serve(validator, consumer, False, batch_size=4, max_idle_polls=1)
+    assert report["valid"] == 20
+
+
+def test_serve_interrupted():
+    """Check that unfinished batch is consumed again after restart."""
+    broker = LocalBroker(partitions=1)
+    produce_messages(broker, 10)
+
+    def interrupted_validator(payload):
+        if payload["id"] == 6:
+            raise KeyboardInterrupt()
+
+    consumer = broker.consumer()
+    report = serve(interrupted_validator, consumer, False, batch_size=4, max_idle_polls=1)
+
+    # only the first batch has been committed, the interrupted message is not counted
+    assert consumer.closed
+    assert report["processed"] == 6
+    assert broker.committed[("test-group", TopicPartition(TOPIC, 0))] == 4
+
+    # new consumer in the same group continues with the unfinished batch
+    validated = []
+    report = serve(lambda payload: validated.append(payload["id"]), broker.consumer(), False,
+                   batch_size=4, max_idle_polls=1)
+    assert validated == [4, 5, 6, 7, 8, 9]
+    assert report["valid"] == 6
+
+
+def test_serve_statistics(capsys):
+    """Check that throughput and lag are displayed."""
+    broker = LocalBroker(partitions=1)
+    produce_messages(broker, 5)
+
+    serve(schema, broker.consumer(), False, batch_size=2, report_interval=0, max_idle_polls=1)
+
+    captured = capsys.readouterr()
+    lines = captured.out.splitlines()
+    assert lines[0].startswith("Processed 2 messages (0 invalid, 0 errors), throughput: ")
+    assert lines[0].endswith("lag: 3 messages")
+    assert lines[-1].endswith("lag: 0 messages")
+
+
+def test_consumer_lag():
+    """Check computation of consumer lag."""
+    broker = LocalBroker(partitions=3)
+    produce_messages(broker, 12)
+    consumer = broker.consumer()
+    assert consumer_lag(consumer) == 12
+
+    consumer.poll(max_records=5)
+    assert consumer_lag(consumer) == 7
+
+    # consumer without assigned partitions
+    consumer.positions = {}
+    assert consumer_lag(consumer) == 0
+
+
+def test_kafka_consumer_without_kafka_package(monkeypatch):
+    """Check that missing kafka-python package is reported."""
+    monkeypatch.setattr(validation_daemon, "KafkaConsumer", None)
+    with pytest.raises(ImportError):
+        kafka_consumer("localhost:9092", TOPIC, "test-group")
+
+
+def test_kafka_consumer(monkeypatch):
+    """Check that Kafka consumer is constructed with manual commits."""
+    arguments = {}
+
+    def consumer_constructor(*args, **kwargs):
+        arguments["args"] = args
+        arguments["kwargs"] = kwargs
+
+    monkeypatch.setattr(validation_daemon, "KafkaConsumer", consumer_constructor)
+    kafka_consumer("localhost:9092", TOPIC, "test-group")
+
+    assert arguments["args"] == (TOPIC,)
+    assert arguments["kwargs"]["bootstrap_servers"] == "localhost:9092"
+    assert arguments["kwargs"]["group_id"] == "test-group"
+    assert arguments["kwargs"]["enable_auto_commit"] is False
+
+
+def test_cli_arguments_serve_mode(monkeypatch):
+    """Check CLI arguments used by serve mode."""
+    monkeypatch.setattr(sys, "argv", ["test", "--serve", "--topic", TOPIC, "--batch-size", "10"])
+    args = cli_arguments(serve_mode=True)
+    assert args.serve
+    assert args.input is None
+    assert args.topic == TOPIC
+    assert args.batch_size == 10
+
+
+@pytest.mark.parametrize("argv", (["test"], ["test", "--serve"]))
+def test_cli_arguments_serve_mode_missing_arguments(monkeypatch, argv):
+    """Check that input file or topic needs to be specified."""
+    monkeypatch.setattr(sys, "argv", argv)
+    with pytest.raises(SystemExit) as excinfo:
+        cli_arguments(serve_mode=True)
+    assert excinfo.value.code == 2
@@ -19,7 +19,6 @@
 
 
 import base64
-import datetime
 import json
 import math
 import re
@@ -28,6 +27,111 @@ from uuid import UUID
 
 from voluptuous import Invalid
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Regular expressions used by validators. All of them are compiled just once,
+# at module import, because validators are called for every node of every
+# validated message.
+KEY_VALUE_RE = re.compile(r"[A-Z0-9]+([_][A-Z0-9]+)+")
+
+RULE_FQDN_RE = re.compile(r"([a-zA-Z0-9_]+[.])+[a-z0-9_]+")
+RULE_FQDN_IN_BYTES_RE = re.compile(rb"([a-z0-9_]+[.])+[a-z0-9_]+")
+
+RULE_ID_RE = re.compile(r"[a-zA-Z0-9_]+([_][a-z0-9_]+)+\|[A-Z0-9_]+([_][A-Z0-9_]+)+")
+RULE_ID_IN_BYTES_RE = re.compile(rb"[A-Za-z0-9_]+([_][A-Za-z0-9_]+)+\|[A-Z0-9_]+([_][A-Z0-9_]+)+")
+
+# https://<hostname>/service_id/file_id?<credentials and other params>
+AWS_URL_RE = re.compile(
+    r"^(?:https://[^/]+\.s3\.amazonaws\.com/[0-9a-zA-Z/\-]+|"
+    r"https://s3\.[0-9a-zA-Z\-]+\.amazonaws\.com/[0-9a-zA-Z\-]+/[0-9a-zA-Z/\-]+|"
+    r"http://minio:9000/insights-upload-perma/[0-9a-zA-Z\.\-]+/[0-9a-zA-Z\-]+)\?"
+    r"X-Amz-Algorithm=AWS4-HMAC-SHA256&X-Amz-Credential=[^/]+$",
+)
+
+DOMAIN_RE = re.compile(r"((?!-)[A-Za-z0-9-]{1,63}(?<!-)\.)+[A-Za-z]{2,10}")
+DOMAIN_IN_BYTES_RE = re.compile(DOMAIN_RE.pattern.encode("ascii"))
+
+VERSION_RE = re.compile(r"[0-9]+\.[0-9]+\.[0-9]+.*")
+# versions with ASCII characters only, other versions need to be decoded first
+VERSION_IN_BYTES_RE = re.compile(rb"[0-9]+\.[0-9]+\.[0-9]+[\x00-\x09\x0b-\x7f]*")
+
+# path to Ceph consists of prefix and several parts separated by slashes,
+# the same parts are captured when paths are parsed by ceph_index module
+CEPH_PATH_PREFIX = r"archives/compressed/"
+CEPH_PATH_SELECTOR = r"[0-9a-f]{2}"
+CEPH_PATH_UUID = r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}"
+CEPH_PATH_MONTH = r"[0-9]{6}"
+CEPH_PATH_DAY = r"[0-9]{2}"
+CEPH_PATH_SEQUENCE = r"[0-9]+"
+CEPH_PATH_SUFFIX = r"\.tar\.gz"
+
+CEPH_PATH_RE = re.compile(CEPH_PATH_PREFIX +
+                          "/".join((CEPH_PATH_SELECTOR, CEPH_PATH_UUID, CEPH_PATH_MONTH,
+                                    CEPH_PATH_DAY, CEPH_PATH_SEQUENCE)) +
+                          CEPH_PATH_SUFFIX)
+CEPH_PATH_IN_BYTES_RE = re.compile(CEPH_PATH_RE.pattern.encode("ascii"))
+
+# UUID in canonical form (8-4-4-4-12 hexadecimal digits) as string or bytes
+UUID_RE = re.compile(r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}")
+UUID_IN_BYTES_RE = re.compile(UUID_RE.pattern.encode("ascii"))
+
+# key of object in S3 bucket: account number, cluster ID, time stamp and hash
+S3_KEY_RE = re.compile(r"[0-9]+/" + UUID_RE.pattern + r"/[0-9]{14}-[0-9a-fA-F]{32}")
+
+# Hash values are checked by one shared matcher per hash family (lower case
+# hexadecimal digits or hexadecimal digits in any case). Expected length of
+# hash value is checked separately.
+LOWER_HEXA_RE = re.compile(r"[a-f0-9]+")
+HEXA_RE = re.compile(r"[a-fA-F0-9]+")
+
+# Timestamps are parsed by the same regular expressions as used by
+# datetime.strptime for %Y, %m, %d, %H, %M, %S and %f directives, so the
+# validators accept exactly the same inputs, including one digit fields.
+TIMESTAMP_DATE = (r"(?P<Y>\d\d\d\d)-(?P<m>1[0-2]|0[1-9]|[1-9])"
+                  r"-(?P<d>3[0-1]|[1-2]\d|0[1-9]|[1-9]| [1-9])")
+TIMESTAMP_TIME = r"T(?P<H>2[0-3]|[0-1]\d|\d):(?P<M>[0-5]\d|\d):(?P<S>6[0-1]|[0-5]\d|\d)"
+TIMESTAMP_FRACTION = r"\.(?P<f>[0-9]{1,6})"
+
+TIMESTAMP_RE = re.compile(TIMESTAMP_DATE + TIMESTAMP_TIME + "Z", re.IGNORECASE)
+TIMESTAMP_OFFSET_RE = re.compile(TIMESTAMP_DATE + TIMESTAMP_TIME + TIMESTAMP_FRACTION +
+                                 r"\+00:00", re.IGNORECASE)
+TIMESTAMP_NO_Z_RE = re.compile(TIMESTAMP_DATE + TIMESTAMP_TIME, re.IGNORECASE)
+TIMESTAMP_MS_RE = re.compile(TIMESTAMP_DATE + TIMESTAMP_TIME + TIMESTAMP_FRACTION, re.IGNORECASE)
+
+# number of days in months in non-leap years
+DAYS_IN_MONTH = (0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+# orjson decodes integers that don't fit into 64 bits as floats, so documents
+# with 19 or more consecutive digits are decoded by the standard parser; digits
+# are replaced by zeros to find such sequences by a plain substring search
+DIGITS_TO_ZEROS = bytes.maketrans(b"123456789", b"000000000")
+LONG_NUMBER_IN_ZEROS = b"0" * 19
+
+
+def decodeJSONBytes(value, fallback=json.loads):
+    """Decode JSON stored in bytes, memoryview or string by orjson when it is available.
+
+    orjson accepts just documents that are accepted by the standard parser as
+    well. All other documents (refused by orjson, or with long integers) are
+    decoded by the fallback, so they are checked and reported the same way
+    as without orjson.
+    """
+    if orjson is not None:
+        if type(value) is str:
+            raw = value.encode("utf-8", "surrogatepass")
+        else:
+            # no copy is made for bytes, memoryview needs to be copied to be translated
+            raw = bytes(value)
+        if LONG_NUMBER_IN_ZEROS not in raw.translate(DIGITS_TO_ZEROS):
+            try:
+                return orjson.loads(raw)
+            except orjson.JSONDecodeError:
+                pass
+    return fallback(value)
+
 
 def intTypeValidator(value):
     """Validate value for any integer."""
@@ -171,6 +275,20 @@ def bytesTypeValidator(value):
         raise Invalid(f"byte array value expected, but got {type(value)} type instead")
 
 
+def bytesLikeTypeValidator(value):
+    """Validate value for byte array type or memory view of byte array."""
+    # memory views are used to access values without copying them
+    if type(value) is not bytes and type(value) is not memoryview:  # noqa E721
+        raise Invalid(f"byte array value expected, but got {type(value)} type instead")
+
+
+def decodeBytes(value):
+    """Decode byte array or memory view using default encoding."""
+    # decoding is needed just to construct error messages, or to check values
+    # that can't be checked directly on bytes
+    return str(value, "utf-8")
+
+
 def boolTypeValidator(value):
     """Validate value for bool type."""
     if type(value) is not bool:  # noqa E721
@@ -430,15 +548,34 @@ def hexaString32Validator(value):
         raise Invalid(f"non-hexadecimal char detected in: {value}")
 
 
+def isValidTimestamp(value, matcher, endpos):
+    """Check if value up to endpos is a timestamp representing existing date and time."""
+    # the same matching as done by strptime, including check for unconverted data
+    found = matcher.match(value, 0, endpos)
+    if found is None or found.end() != min(len(value), endpos):
+        return False
+
+    # hours, minutes, months, and day numbers are already checked by the matcher
+    year, month, day, second = found.group("Y", "m", "d", "S")
+    year = int(year)
+    month = int(month)
+    day = int(day)
+
+    # year zero and leap seconds are not supported by datetime
+    if year == 0 or int(second) > 59:
+        return False
+
+    if month == 2 and year % 4 == 0 and (year % 100 != 0 or year % 400 == 0):
+        return day <= 29
+    return day <= DAYS_IN_MONTH[month]
+
+
 def timestampValidator(value):
     """Validate value for timestamps."""
     stringTypeValidator(value)
 
-    timeformat = "%Y-%m-%dT%H:%M:%SZ"
-    try:
-        # try to parse the input value
-        datetime.datetime.strptime(value, timeformat)
-    except ValueError:
+    # timestamp format: %Y-%m-%dT%H:%M:%SZ
+    if not isValidTimestamp(value, TIMESTAMP_RE, len(value)):
         raise Invalid(f"invalid datetime value {value}")
 
 
@@ -446,11 +583,8 @@ def timestampValidatorOffset(value):
     """Validate value for timestamps with specified offsets."""
     stringTypeValidator(value)
 
-    timeformat = "%Y-%m-%dT%H:%M:%S.%f+00:00"
-    try:
-        # try to parse the input value
-        datetime.datetime.strptime(value, timeformat)
-    except ValueError:
+    # timestamp format: %Y-%m-%dT%H:%M:%S.%f+00:00
+    if not isValidTimestamp(value, TIMESTAMP_OFFSET_RE, len(value)):
         raise Invalid(f"invalid datetime value {value}")
 
 
@@ -458,11 +592,8 @@ def timestampValidatorNoZ(value):
     """Validate value for timestamps without zone info appended."""
     stringTypeValidator(value)
 
-    timeformat = "%Y-%m-%dT%H:%M:%S"
-    try:
-        # try to parse the input value
-        datetime.datetime.strptime(value, timeformat)
-    except ValueError:
+    # timestamp format: %Y-%m-%dT%H:%M:%S
+    if not isValidTimestamp(value, TIMESTAMP_NO_Z_RE, len(value)):
         raise Invalid(f"invalid datetime value {value}")
 
 
@@ -470,23 +601,18 @@ def timestampValidatorMs(value):
     """Validate value for timestamps without ms part, but with TZ info."""
     stringTypeValidator(value)
 
-    timeformat = "%Y-%m-%dT%H:%M:%S.%f"
-    try:
-        # the following timestamp can't be parsed directly by Python
-        # "2020-12-09T16:17:42.822020204Z"
-        if len(value) >= 26:
-            value = value[0:26]
-        # try to parse the input value
-        datetime.datetime.strptime(value, timeformat)
-    except ValueError:
-        raise Invalid(f"invalid datetime value {value}")
+    # timestamp format: %Y-%m-%dT%H:%M:%S.%f
+    # the following timestamp can't be parsed directly by Python
+    # "2020-12-09T16:17:42.822020204Z"
+    # so only the first 26 characters are checked
+    if not isValidTimestamp(value, TIMESTAMP_MS_RE, 26):
+        raise Invalid(f"invalid datetime value {value[0:26]}")
 
 
 def keyValueValidator(value):
     """Validate if value conformns to a key used in Insights Results."""
     stringTypeValidator(value)
 
-    KEY_VALUE_RE = re.compile(r"[A-Z0-9]+([_][A-Z0-9]+)+")
     if not KEY_VALUE_RE.fullmatch(value):
         raise Invalid(f"wrong key value '{value}'")
 
@@ -495,62 +621,43 @@ def ruleFQDNValidator(value):
     """Validate if value contains FQDN (fully-qualified name)."""
     stringTypeValidator(value)
 
-    FQDN_VALUE_RE = re.compile(r"([a-zA-Z0-9_]+[.])+[a-z0-9_]+")
-    if not FQDN_VALUE_RE.fullmatch(value):
+    if not RULE_FQDN_RE.fullmatch(value):
         raise Invalid(f"wrong FQDN '{value}'")
 
 
 def ruleFQDNInBytesValidator(value):
     """Validate if value contains FQDN (fully-qualified name)."""
     # check if the value has the expected type
-    bytesTypeValidator(value)
+    bytesLikeTypeValidator(value)
 
-    # use default encoding
-    value = value.decode("utf-8")
-
-    stringTypeValidator(value)
-
-    FQDN_VALUE_RE = re.compile(r"([a-z0-9_]+[.])+[a-z0-9_]+")
-    if not FQDN_VALUE_RE.fullmatch(value):
-        raise Invalid(f"wrong FQDN '{value}'")
+    # value is checked directly, without decoding
+    if not RULE_FQDN_IN_BYTES_RE.fullmatch(value):
+        raise Invalid(f"wrong FQDN '{decodeBytes(value)}'")
 
 
 def ruleIDValidator(value):
     """Validate if value contains rule ID."""
     stringTypeValidator(value)
 
-    FQDN_VALUE_RE = re.compile(r"[a-zA-Z0-9_]+([_][a-z0-9_]+)+\|[A-Z0-9_]+([_][A-Z0-9_]+)+")
-    if not FQDN_VALUE_RE.fullmatch(value):
+    if not RULE_ID_RE.fullmatch(value):
         raise Invalid(f"wrong FQDN '{value}'")
 
 
 def ruleIDInBytesValidator(value):
     """Validate if value contains rule ID."""
     # check if the value has the expected type
-    bytesTypeValidator(value)
+    bytesLikeTypeValidator(value)
 
-    # use default encoding
-    value = value.decode("utf-8")
-
-    stringTypeValidator(value)
-
-    FQDN_VALUE_RE = re.compile(r"[A-Za-z0-9_]+([_][A-Za-z0-9_]+)+\|[A-Z0-9_]+([_][A-Z0-9_]+)+")
-    if not FQDN_VALUE_RE.fullmatch(value):
-        raise Invalid(f"wrong FQDN '{value}'")
+    # value is checked directly, without decoding
+    if not RULE_ID_IN_BYTES_RE.fullmatch(value):
+        raise Invalid(f"wrong FQDN '{decodeBytes(value)}'")
 
 
 def urlToAWSValidator(value):
     """Validate if value conformns to AWS S3 URL."""
     stringTypeValidator(value)
 
-    # https://<hostname>/service_id/file_id?<credentials and other params>
-    HTTP_RE = re.compile(
-        r"^(?:https://[^/]+\.s3\.amazonaws\.com/[0-9a-zA-Z/\-]+|"
-        r"https://s3\.[0-9a-zA-Z\-]+\.amazonaws\.com/[0-9a-zA-Z\-]+/[0-9a-zA-Z/\-]+|"
-        r"http://minio:9000/insights-upload-perma/[0-9a-zA-Z\.\-]+/[0-9a-zA-Z\-]+)\?"
-        r"X-Amz-Algorithm=AWS4-HMAC-SHA256&X-Amz-Credential=[^/]+$",
-    )
-    if not HTTP_RE.fullmatch(value):
+    if not AWS_URL_RE.fullmatch(value):
         raise Invalid("wrong URL")
 
 
@@ -558,19 +665,40 @@ def domainValidator(value):
     """Validate if value conformns to (e-mail) domain."""
     stringTypeValidator(value)
 
-    DOMAIN_RE = re.compile(r"((?!-)[A-Za-z0-9-]{1,63}(?<!-)\.)+[A-Za-z]{2,10}")
     if not DOMAIN_RE.fullmatch(value):
         raise Invalid("wrong e-mail domain:" + value)
 
 
 def domainInBytesValidator(value):
     """Validate if value conformns to (e-mail) domain."""
-    bytesTypeValidator(value)
+    bytesLikeTypeValidator(value)
 
-    value = value.decode("utf-8")
+    # value is checked directly, without decoding
+    if not DOMAIN_IN_BYTES_RE.fullmatch(value):
+        raise Invalid("wrong e-mail domain:" + decodeBytes(value))
 
-    stringTypeValidator(value)
-    domainValidator(value)
+
+def isCanonicalUUID(value, version, matcher):
+    """Check if value is UUID in canonical form that is surely accepted by UUID constructor.
+
+    UUID constructor accepts also UUIDs in braces, with urn:uuid: prefix,
+    without hyphens etc., such values need to be checked by the constructor
+    itself. Please note that the constructor does not check the version
+    nibble stored in value, it just rewrites it, so it is not checked there
+    either.
+    """
+    # other versions and values of other types are checked by UUID constructor
+    return type(version) is int and 1 <= version <= 5 and matcher.fullmatch(value) is not None
+
+
+def constructUUID(value, version):
+    """Check if value conforms to UUID by constructing UUID object."""
+    # UUID needs at least 32 hexadecimal digits, all other characters are
+    # just removed from the value, so shorter values are refused immediately
+    if len(value) < 32:
+        raise ValueError("badly formed hexadecimal UUID string")
+
+    UUID(value, version=version)
 
 
 def uuidValidator(value, version=4):
@@ -580,150 +708,113 @@ def uuidValidator(value, version=4):
 
     # UUID version 4 is the most common version, but it is possible to specify
     # other version as well
-    UUID(value, version=version)
+    if not isCanonicalUUID(value, version, UUID_RE):
+        constructUUID(value, version)
 
 
 def uuidInBytesValidator(value, version=4):
     """Check if value conforms to UUID."""
     # check if the value has the expected type
-    bytesTypeValidator(value)
+    bytesLikeTypeValidator(value)
+
+    # UUID in canonical form can be checked directly on bytes
+    if isCanonicalUUID(value, version, UUID_IN_BYTES_RE):
+        return
 
     # use default encoding
-    value = value.decode("utf-8")
+    value = decodeBytes(value)
 
     # UUID version 4 is the most common version, but it is possible to specify
     # other version as well
-    UUID(value, version=version)
+    constructUUID(value, version)
 
 
-def md5Validator(value):
-    """Predicate that checks if the given value seems to be MD5 hash."""
+def hashValidator(value, length, matcher, name):
+    """Check if the given value seems to be a hash with given number of hexadecimal digits."""
     # check if the value has the expected type
     stringTypeValidator(value)
 
+    # check the length first, it is much cheaper than matching
+    if len(value) != length or not matcher.fullmatch(value):
+        raise Invalid(f"the value '{value}' does not seem to be {name} hash")
+
+
+def md5Validator(value):
+    """Predicate that checks if the given value seems to be MD5 hash."""
     # MD5 hash has 32 hexadecimal characters
-    if not re.fullmatch(r"^[a-f0-9]{32}$", value):
-        raise Invalid(f"the value '{value}' does not seem to be MD5 hash")
+    hashValidator(value, 32, LOWER_HEXA_RE, "MD5")
 
 
 def sha1Validator(value):
     """Predicate that checks if the given value seems to be SHA1 hash."""
-    # check if the value has the expected type
-    stringTypeValidator(value)
-
     # SHA-1 hash has 40 hexadecimal characters
-    if not re.fullmatch(r"^[a-f0-9]{40}$", value):
-        raise Invalid(f"the value '{value}' does not seem to be SHA1 hash")
+    hashValidator(value, 40, LOWER_HEXA_RE, "SHA1")
 
 
 def sha224Validator(value):
     """Predicate that checks if the given value seems to be SHA224 hash."""
-    # check if the value has the expected type
-    stringTypeValidator(value)
-
     # SHA-224 hash has 56 hexadecimal characters
-    if not re.fullmatch(r"^[a-fA-F0-9]{56}$", value):
-        raise Invalid(f"the value '{value}' does not seem to be SHA224 hash")
+    hashValidator(value, 56, HEXA_RE, "SHA224")
 
 
 def sha256Validator(value):
     """Predicate that checks if the given value seems to be SHA256 hash."""
-    # check if the value has the expected type
-    stringTypeValidator(value)
-
     # SHA-256 hash has 64 hexadecimal characters
-    if not re.fullmatch(r"^[a-fA-F0-9]{64}$", value):
-        raise Invalid(f"the value '{value}' does not seem to be SHA256 hash")
+    hashValidator(value, 64, HEXA_RE, "SHA256")
 
 
 def sha384Validator(value):
     """Predicate that checks if the given value seems to be SHA384 hash."""
-    # check if the value has the expected type
-    stringTypeValidator(value)
-
     # SHA-384 hash has 64 hexadecimal characters
-    if not re.fullmatch(r"^[a-fA-F0-9]{96}$", value):
-        raise Invalid(f"the value '{value}' does not seem to be SHA384 hash")
+    hashValidator(value, 96, HEXA_RE, "SHA384")
 
 
 def sha512Validator(value):
     """Predicate that checks if the given value seems to be SHA512 hash."""
-    # check if the value has the expected type
-    stringTypeValidator(value)
-
     # SHA-512 hash has 128 hexadecimal characters
-    if not re.fullmatch(r"^[a-fA-F0-9]{128}$", value):
-        raise Invalid(f"the value '{value}' does not seem to be SHA512 hash")
+    hashValidator(value, 128, HEXA_RE, "SHA512")
 
 
 def sha3_224Validator(value):
     """Predicate that checks if the given value seems to be SHA-3 224 hash."""
-    # check if the value has the expected type
-    stringTypeValidator(value)
-
     # SHA-3 224 hash has 56 hexadecimal characters
-    if not re.fullmatch(r"^[a-fA-F0-9]{56}$", value):
-        raise Invalid(f"the value '{value}' does not seem to be SHA-3 224 hash")
+    hashValidator(value, 56, HEXA_RE, "SHA-3 224")
 
 
 def sha3_256Validator(value):
     """Predicate that checks if the given value seems to be SHA-3 256 hash."""
-    # check if the value has the expected type
-    stringTypeValidator(value)
-
     # SHA-3 256 hash has 64 hexadecimal characters
-    if not re.fullmatch(r"^[a-fA-F0-9]{64}$", value):
-        raise Invalid(f"the value '{value}' does not seem to be SHA-3 256 hash")
+    hashValidator(value, 64, HEXA_RE, "SHA-3 256")
 
 
 def sha3_384Validator(value):
     """Predicate that checks if the given value seems to be SHA-3 384 hash."""
-    # check if the value has the expected type
-    stringTypeValidator(value)
-
     # SHA-3 384 hash has 64 hexadecimal characters
-    if not re.fullmatch(r"^[a-fA-F0-9]{96}$", value):
-        raise Invalid(f"the value '{value}' does not seem to be SHA-3 384 hash")
+    hashValidator(value, 96, HEXA_RE, "SHA-3 384")
 
 
 def sha3_512Validator(value):
     """Predicate that checks if the given value seems to be SHA-3 512 hash."""
-    # check if the value has the expected type
-    stringTypeValidator(value)
-
     # SHA-3 512 hash has 128 hexadecimal characters
-    if not re.fullmatch(r"^[a-fA-F0-9]{128}$", value):
-        raise Invalid(f"the value '{value}' does not seem to be SHA-3 512 hash")
+    hashValidator(value, 128, HEXA_RE, "SHA-3 512")
 
 
 def shake128Validator(value):
     """Predicate that checks if the given value seems to be SHAKE128 256-bit hash."""
-    # check if the value has the expected type
-    stringTypeValidator(value)
-
     # SHAKE128 256-bit hash has 64 hexadecimal characters
-    if not re.fullmatch(r"^[a-fA-F0-9]{64}$", value):
-        raise Invalid(f"the value '{value}' does not seem to be SHAKE128 256-bit hash")
+    hashValidator(value, 64, HEXA_RE, "SHAKE128 256-bit")
 
 
 def shake256Validator(value):
     """Predicate that checks if the given value seems to be SHAKE256 256-bit hash."""
-    # check if the value has the expected type
-    stringTypeValidator(value)
-
     # SHAKE256 256-bit hash has 64 hexadecimal characters
-    if not re.fullmatch(r"^[a-fA-F0-9]{64}$", value):
-        raise Invalid(f"the value '{value}' does not seem to be SHAKE256 256-bit hash")
+    hashValidator(value, 64, HEXA_RE, "SHAKE256 256-bit")
 
 
 def BLAKE2Validator(value):
     """Predicate that checks if the given value seems to be BLAKE2 256-bit hash."""
-    # check if the value has the expected type
-    stringTypeValidator(value)
-
     # BLAKE2 256-bit hash has 128 hexadecimal characters
-    if not re.fullmatch(r"^[a-fA-F0-9]{128}$", value):
-        raise Invalid(f"the value '{value}' does not seem to be BLAKE2 256-bit hash")
+    hashValidator(value, 128, HEXA_RE, "BLAKE2 256-bit")
 
 
 def b64IdentityValidator(identitySchema, value):
@@ -742,7 +833,7 @@ def b64IdentityValidator(identitySchema, value):
 
 
 def jsonInStrValidator(value):
-    """Validate if the value is JSON stored in string."""
+    """Validate if the value is JSON stored in string, return the decoded value."""
     # input must be a string
     stringTypeValidator(value)
 
@@ -750,57 +841,79 @@ def jsonInStrValidator(value):
     decoded = json.loads(value)
 
     assert decoded is not None
+    return decoded
+
+
+def jsonInStrSchemaValidator(schema, value):
+    """Validate JSON stored in string by given schema, return the decoded value."""
+    # the string is parsed just once, decoded value is validated directly;
+    # validators in schema return None, so the decoded value is returned
+    # instead of the value constructed by the schema
+    decoded = jsonInStrValidator(value)
+    schema(decoded)
+    return decoded
 
 
 def versionInBytesValidator(value):
     """Check if value conforms to version."""
     # check if the value has the expected type
-    bytesTypeValidator(value)
+    bytesLikeTypeValidator(value)
+
+    # versions with ASCII characters only are checked directly, without decoding
+    if VERSION_IN_BYTES_RE.fullmatch(value):
+        return
 
     # use default encoding
-    value = value.decode("utf-8")
+    value = decodeBytes(value)
 
-    VERSION_RE = re.compile(r"[0-9]+\.[0-9]+\.[0-9]+.*")
     if not VERSION_RE.fullmatch(value):
         raise Invalid(f"wrong version value '{value}'")
 
 
+def s3KeyValidator(value):
+    """Check if value conforms to key of object stored in S3 bucket."""
+    # check if the value has the expected type
+    stringTypeValidator(value)
+
+    if not S3_KEY_RE.fullmatch(value):
+        raise Invalid(f"wrong S3 key value '{value}'")
+
+
 def pathToCephValidator(value):
     """Check if value conforms to path to Ceph."""
     # check if the value has the expected type
     stringTypeValidator(value)
 
-    # construct regexp for path
-    PREFIX = r"archives/compressed/"
-    SELECTOR = r"[0-9a-f]{2}/"
-    UUID = r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}/"
-    DATETIME = r"[0-9]{6}/[0-9]{2}/"
-    TARBALL = r"[0-9]+\.tar\.gz"
-
-    PATH_RE = re.compile(PREFIX+SELECTOR+UUID+DATETIME+TARBALL)
-    if not PATH_RE.fullmatch(value):
+    if not CEPH_PATH_RE.fullmatch(value):
         raise Invalid(f"wrong path value '{value}'")
 
 
 def pathToCephInBytesValidator(value):
     """Check if value conforms to path to Ceph."""
     # check if the value has the expected type
-    bytesTypeValidator(value)
+    bytesLikeTypeValidator(value)
 
-    # use default encoding
-    value = value.decode("utf-8")
-
-    pathToCephValidator(value)
+    # value is checked directly, without decoding
+    if not CEPH_PATH_IN_BYTES_RE.fullmatch(value):
+        raise Invalid(f"wrong path value '{decodeBytes(value)}'")
 
 
 def jsonInBytesValidator(value):
-    """Validate if the value is JSON stored in string."""
+    """Validate if the value is JSON stored in byte array, return the decoded value."""
     # input must be a byte array
-    bytesTypeValidator(value)
+    bytesLikeTypeValidator(value)
 
-    value = value.decode("utf-8")
-
-    # try to parse into JSON
-    decoded = json.loads(value)
+    # try to parse into JSON, value is decoded from UTF-8 just when the
+    # standard parser needs to be used
+    decoded = decodeJSONBytes(value, lambda value: json.loads(decodeBytes(value)))
 
     assert decoded is not None
+    return decoded
+
+
+def jsonInBytesSchemaValidator(schema, value):
+    """Validate JSON stored in byte array by given schema, return the decoded value."""
+    # the byte array is parsed just once, decoded value is validated directly
+    decoded = jsonInBytesValidator(value)
+    schema(decoded)
+    return decoded
@@ -17,7 +17,10 @@
 
 """Unit tests for validators module."""
 
+import datetime
+import json
 import math
+from uuid import UUID
 
 import pytest
 
@@ -33,6 +36,8 @@ import pytest
 from validators import (
     BLAKE2Validator,
     b64IdentityValidator,
+    bytesTypeValidator,
+    decodeJSONBytes,
     domainInBytesValidator,
     domainValidator,
     emptyStringValidator,
@@ -43,6 +48,9 @@ from validators import (
     intTypeValidator,
     isNaNValidator,
     isNotNaNValidator,
+    jsonInBytesSchemaValidator,
+    jsonInBytesValidator,
+    jsonInStrSchemaValidator,
     jsonInStrValidator,
     keyValueValidator,
     md5Validator,
@@ -76,6 +84,7 @@ from validators import (
     ruleFQDNValidator,
     ruleIDInBytesValidator,
     ruleIDValidator,
+    s3KeyValidator,
     sha1Validator,
     sha3_224Validator,
     sha3_256Validator,
@@ -97,7 +106,7 @@ from validators import (
     uuidValidator,
     versionInBytesValidator,
 )
-from voluptuous import Invalid
+from voluptuous import Invalid, Schema
 
 # proper positive integers
 positive_int_values = (1, 2, 3, 127, 128, 255, 256,
@@ -2428,6 +2437,25 @@ def test_jsonInStrValidatorValidator_correct_json_values(value):
     jsonInStrValidator(value)
 
 
+@pytest.mark.parametrize("value", json_values)
+def test_jsonInStrValidator_decoded_value(value):
+    """Check that decoded JSON value is returned."""
+    assert jsonInStrValidator(value) == json.loads(value)
+
+
+def test_jsonInStrSchemaValidator():
+    """Check that JSON stored in string is validated by schema."""
+    schema = Schema({"a": str})
+    assert jsonInStrSchemaValidator(schema, '{"a":"b"}') == {"a": "b"}
+
+    # exception is expected
+    with pytest.raises(Invalid) as excinfo:
+        jsonInStrSchemaValidator(schema, '{"a":1}')
+    assert excinfo.value.path == ["a"]
+    with pytest.raises(ValueError):
+        jsonInStrSchemaValidator(schema, '{"a":')
+
+
 @pytest.mark.parametrize("value", not_string_type)
 def test_jsonInStrValidatorValidator_not_string_type(value):
     """Check if improper values (with wrong type) are validated."""
@@ -2512,3 +2540,330 @@ def test_domain_in_bytes_validator_wrong_input():
     # exception is expected
     with pytest.raises(Invalid):
         domainInBytesValidator(b".")
+
+
+# base value for UUID-like values used in differential tests
+uuid_base_value = "90e1013c-a2f6-433b-af13-f7373dafa5ed"
+
+# characters used to construct UUID-like values for differential tests,
+# including Arabic-Indic digit three and fullwidth digit zero
+uuid_alphabet = "0aF-g {}:_x\n\u0663\uff10"
+
+# versions used in differential tests
+uuid_versions = (None, 0, 1, 3, 4, 5, 6, True, 4.0)
+
+
+def uuid_like_values():
+    """Generate values similar to UUID, including values accepted by UUID in other forms."""
+    base = uuid_base_value
+    values = {
+            base,
+            base.upper(),
+            "{" + base + "}",
+            "{{" + base + "}}",
+            "urn:uuid:" + base,
+            "uuid:" + base,
+            "urn:" + base,
+            "URN:UUID:" + base,
+            base.replace("-", ""),
+            "-".join(base.replace("-", "")),
+            " " + base.replace("-", "") + " ",
+            "0x" + base.replace("-", "")[2:],
+            "_".join(base.split("-")),
+            base.replace("-", "")[:31],
+            }
+    # all values with one character deleted, changed or inserted
+    for i in range(len(base) + 1):
+        values.add(base[:i] + base[i + 1:])
+        for c in uuid_alphabet:
+            values.add(base[:i] + c + base[i + 1:])
+            values.add(base[:i] + c + base[i:])
+    return sorted(values)
+
+
+def reference_uuid_validator(value, version=4):
+    """Validate UUID the original way, by constructing UUID object."""
+    stringTypeValidator(value)
+    UUID(value, version=version)
+
+
+def reference_uuid_in_bytes_validator(value, version=4):
+    """Validate UUID stored in bytes the original way, by constructing UUID object."""
+    bytesTypeValidator(value)
+    UUID(value.decode("utf-8"), version=version)
+
+
+def validation_outcome(validator, *args):
+    """Call validator and return type and message of exception, if any."""
+    try:
+        validator(*args)
+    except Exception as e:
+        return type(e), str(e)
+    return None
+
+
+def test_uuid_validator_differential():
+    """Check that fast path in UUID validator behaves exactly like UUID constructor."""
+    values = uuid_like_values()
+    accepted = 0
+
+    for value in values:
+        for version in uuid_versions:
+            expected = validation_outcome(reference_uuid_validator, value, version)
+            assert validation_outcome(uuidValidator, value, version) == expected, value
+            accepted += expected is None
+
+    # make sure both accepted and refused values were checked
+    assert 0 < accepted < len(values) * len(uuid_versions)
+
+
+def test_uuid_in_bytes_validator_differential():
+    """Check that fast path in UUID validator behaves exactly like UUID constructor."""
+    values = [value.encode("utf-8") for value in uuid_like_values()]
+    # values that are not proper UTF-8
+    values.extend((b"\xff" * 36, uuid_base_value.encode("ascii") + b"\xff",
+                   b"\xff" + uuid_base_value.encode("ascii")[1:]))
+
+    for value in values:
+        for version in uuid_versions:
+            expected = validation_outcome(reference_uuid_in_bytes_validator, value, version)
+            assert validation_outcome(uuidInBytesValidator, value, version) == expected, value
+
+
+# timestamps that are checked by timestamp validators, together with formats
+# used by the original implementation based on datetime.strptime
+timestamp_formats = (
+        (timestampValidator, "%Y-%m-%dT%H:%M:%SZ", "2020-02-29T23:59:59Z"),
+        (timestampValidatorOffset, "%Y-%m-%dT%H:%M:%S.%f+00:00",
+         "2021-01-20T03:10:44.482612+00:00"),
+        (timestampValidatorNoZ, "%Y-%m-%dT%H:%M:%S", "2020-02-29T23:59:59"),
+        (timestampValidatorMs, "%Y-%m-%dT%H:%M:%S.%f", "2020-12-09T16:17:42.822020204Z"),
+        )
+
+# characters used to construct values similar to timestamps
+timestamp_alphabet = ("0", "1", "2", "3", "6", "9", "t", "z", "T", "Z", " ", ".", "-", ":",
+                      "+", "٣", "x")
+
+# dates and times that are on the edge of validity
+timestamp_edge_values = (
+        "2000-02-29", "1900-02-29", "2020-02-29", "2021-02-29", "2021-02-28", "2021-04-31",
+        "2021-12-31", "2021-01-32", "2021-13-01", "2021-00-01", "2021-01-00", "0000-01-01",
+        "0001-01-01", "9999-12-31", "2021-1-1", "2021-01- 1", "2021-01-  1", "٢٠٢١-01-01",
+        )
+timestamp_edge_times = (
+        "23:59:59", "24:00:00", "00:00:00", "0:0:0", "23:60:00", "23:59:60", "23:59:61",
+        "23:59:62", "1:2:3", "01:02:3", "١:02:03",
+        )
+
+
+def timestamp_like_values(base):
+    """Generate values similar to timestamp with all kinds of small changes."""
+    values = {base, base.lower(), base.upper(), base + " ", " " + base, base + "0", ""}
+    # all values with one character deleted, changed or inserted
+    for i in range(len(base) + 1):
+        values.add(base[:i] + base[i + 1:])
+        for c in timestamp_alphabet:
+            values.add(base[:i] + c + base[i + 1:])
+            values.add(base[:i] + c + base[i:])
+    # dates and times on the edge of validity
+    for date in timestamp_edge_values:
+        for time in timestamp_edge_times:
+            values.add(date + "T" + time + base[19:])
+    # fractions of seconds with different number of digits
+    if "." in base:
+        fraction_start = base.index(".") + 1
+        fraction_end = fraction_start
+        while fraction_end < len(base) and base[fraction_end].isdigit():
+            fraction_end += 1
+        for digits in range(9):
+            values.add(base[:fraction_start] + "1" * digits + base[fraction_end:])
+    return sorted(values)
+
+
+def reference_timestamp_validator(value, timeformat):
+    """Validate timestamp the original way, by using datetime.strptime."""
+    stringTypeValidator(value)
+    if len(value) >= 26 and timeformat == "%Y-%m-%dT%H:%M:%S.%f":
+        value = value[0:26]
+    try:
+        datetime.datetime.strptime(value, timeformat)
+    except ValueError:
+        raise Invalid(f"invalid datetime value {value}")
+
+
+@pytest.mark.parametrize("validator, timeformat, base", timestamp_formats)
+def test_timestamp_validator_differential(validator, timeformat, base):
+    """Check that timestamp validators behave exactly like datetime.strptime."""
+    values = timestamp_like_values(base)
+    accepted = 0
+
+    for value in values:
+        expected = validation_outcome(reference_timestamp_validator, value, timeformat)
+        assert validation_outcome(validator, value) == expected, value
+        accepted += expected is None
+
+    # make sure both accepted and refused values were checked
+    assert 0 < accepted < len(values)
+
+    # values with other types
+    for value in (None, 42, b"2020-02-29T23:59:59Z", [base]):
+        expected = validation_outcome(reference_timestamp_validator, value, timeformat)
+        assert validation_outcome(validator, value) == expected
+
+
+# validators checking bytes directly, with one proper value for each of them
+bytes_validators = (
+        (ruleFQDNInBytesValidator, b"a_b.d_f"),
+        (ruleIDInBytesValidator, b"foo_bar_baz|FOO_BAR_BAZ"),
+        (uuidInBytesValidator, b"123e4567-e89b-12d3-a456-426614174000"),
+        (domainInBytesValidator, b"test.gov"),
+        (pathToCephInBytesValidator,
+         b"archives/compressed/ff/ff32df5f-1234-4567-89ab-61ff59fb8298/202102/08/000359.tar.gz"),
+        (versionInBytesValidator, b"1.2.0-ci-1234"),
+        (jsonInBytesValidator, b'{"a":"b"}'),
+        )
+
+
+@pytest.mark.parametrize("validator, value", bytes_validators)
+def test_bytes_validators_memoryview(validator, value):
+    """Check that validators checking bytes accept memory views too."""
+    # exception is not expected
+    validator(memoryview(value))
+    validator(memoryview(b"xx" + value + b"yy")[2:-2])
+
+    # but other types are still refused
+    with pytest.raises(Invalid):
+        validator(bytearray(value))
+    with pytest.raises(Invalid):
+        validator(value.decode("utf-8"))
+
+
+@pytest.mark.parametrize("validator, value", bytes_validators)
+def test_bytes_validators_non_utf8_values(validator, value):
+    """Check that values that can't be decoded are refused."""
+    # exception is expected
+    with pytest.raises(ValueError):
+        validator(value + b"\xff")
+    with pytest.raises(ValueError):
+        validator(memoryview(value + b"\xff"))
+
+
+def test_bytes_validators_error_messages():
+    """Check that error messages contain decoded values."""
+    with pytest.raises(Invalid, match="wrong FQDN 'ěščř'"):
+        ruleFQDNInBytesValidator("ěščř".encode())
+    with pytest.raises(Invalid, match="wrong FQDN 'x|Y'"):
+        ruleIDInBytesValidator(memoryview(b"x|Y"))
+    with pytest.raises(Invalid, match="wrong e-mail domain:test"):
+        domainInBytesValidator(b"test")
+    with pytest.raises(Invalid, match="wrong path value 'archives/'"):
+        pathToCephInBytesValidator(b"archives/")
+    with pytest.raises(Invalid, match="wrong version value '1.2-ěščř'"):
+        versionInBytesValidator("1.2-ěščř".encode())
+
+
+def test_versionInBytesValidator_non_ascii_values():
+    """Check that versions with non-ASCII characters are accepted."""
+    # exception is not expected
+    versionInBytesValidator("1.2.0-ěščř".encode())
+
+
+@pytest.mark.parametrize("value", json_values + ("[NaN]", '"\\ud800"', "1e400"))
+def test_jsonInBytesValidator_correct_json_values(value):
+    """Check if proper values JSON are validated."""
+    # exception is not expected
+    jsonInBytesValidator(value.encode("utf-8"))
+
+
+# values that could be decoded differently by different parsers
+json_values_to_decode = json_values + (
+        "[NaN]", '"\\ud800"', "[1e400, 1.5]", "[1, 2e1]", '{"a": 1, "a": 2}', "[" + "9" * 30 + "]",
+        "[18446744073709551616, -9223372036854775809]")
+
+
+@pytest.mark.parametrize("value", json_values_to_decode)
+def test_jsonInBytesValidator_decoded_value(value):
+    """Check that decoded JSON value is the same as decoded by standard parser."""
+    decoded = jsonInBytesValidator(value.encode("utf-8"))
+    assert repr(decoded) == repr(json.loads(value))
+
+
+@pytest.mark.parametrize("value", json_values_to_decode)
+def test_decodeJSONBytes(value):
+    """Check that JSON in all supported types is decoded the same way as by standard parser."""
+    encoded = value.encode("utf-8", "surrogatepass")
+    expected = repr(json.loads(value))
+    assert repr(decodeJSONBytes(value)) == expected
+    assert repr(decodeJSONBytes(encoded)) == expected
+    decoded = decodeJSONBytes(memoryview(encoded), lambda data: json.loads(bytes(data)))
+    assert repr(decoded) == expected
+
+
+def test_decodeJSONBytes_fallback():
+    """Check that documents refused by orjson are passed to fallback."""
+    with pytest.raises(ValueError):
+        decodeJSONBytes(b"[1,", json.loads)
+    assert decodeJSONBytes(b"[NaN]", lambda data: "fallback") == "fallback"
+
+
+def test_jsonInBytesSchemaValidator():
+    """Check that JSON stored in byte array is validated by schema."""
+    schema = Schema({"a": [int]})
+    assert jsonInBytesSchemaValidator(schema, b'{"a":[1,2]}') == {"a": [1, 2]}
+
+    # exception is expected
+    with pytest.raises(Invalid) as excinfo:
+        jsonInBytesSchemaValidator(schema, b'{"a":[1,"2"]}')
+    assert excinfo.value.path == ["a", 1]
+    with pytest.raises(ValueError):
+        jsonInBytesSchemaValidator(schema, b'{"a":')
+
+
+@pytest.mark.parametrize("value", ("", " ", "A", "ěščřžýáíé", "null", "\ufeff{}", '{"a":}'))
+def test_jsonInBytesValidator_incorrect_json_values(value):
+    """Check if improper values JSON are validated."""
+    # exception is expected
+    with pytest.raises((AssertionError, ValueError)):
+        jsonInBytesValidator(value.encode("utf-8"))
+
+
+# proper keys of objects stored in S3
+s3_key_values = (
+        "7307752/4e696069-edf5-44dd-9f05-fcca2d14cdf1/20200609125740-113ebefe3cdd4a62b9d0e094213bf9e9",  # noqa: E501
+        "1/abcd1234-1234-ABCD-5678-1234abcd1234/20200609125740-1234567890ABCDEF1234567890abcdef",
+        )
+
+# improper keys of objects stored in S3
+improper_s3_key_values = (
+        "",
+        "7307752",
+        "/4e696069-edf5-44dd-9f05-fcca2d14cdf1/20200609125740-113ebefe3cdd4a62b9d0e094213bf9e9",
+        "x/4e696069-edf5-44dd-9f05-fcca2d14cdf1/20200609125740-113ebefe3cdd4a62b9d0e094213bf9e9",
+        "7307752/4e696069-edf5-44dd-9f05/20200609125740-113ebefe3cdd4a62b9d0e094213bf9e9",
+        "7307752/4e696069-edf5-44dd-9f05-fcca2d14cdf1/2020060912574-113ebefe3cdd4a62b9d0e094213bf9e9",  # noqa: E501
+        "7307752/4e696069-edf5-44dd-9f05-fcca2d14cdf1/20200609125740-113ebefe3cdd4a62b9d0e094213bf9e",  # noqa: E501
+        "7307752/4e696069-edf5-44dd-9f05-fcca2d14cdf1/20200609125740-113ebefe3cdd4a62b9d0e094213bf9e9/",  # noqa: E501
+        )
+
+
+@pytest.mark.parametrize("value", s3_key_values)
+def test_s3KeyValidator_proper_values(value):
+    """Check if proper keys are validated."""
+    # exception is not expected
+    s3KeyValidator(value)
+
+
+@pytest.mark.parametrize("value", improper_s3_key_values)
+def test_s3KeyValidator_improper_values(value):
+    """Check if improper keys are validated."""
+    # exception is expected
+    with pytest.raises(Invalid):
+        s3KeyValidator(value)
+
+
+@pytest.mark.parametrize("value", not_string_type)
+def test_s3KeyValidator_incorrect_types(value):
+    """Check if improper values (with wrong type) are validated."""
+    # exception is expected
+    with pytest.raises(Invalid):
+        s3KeyValidator(value)
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+
+# Copyright © 2024 Pavel Tisnovsky
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Generator of small rule_hits.parquet files used by unit tests.
+
+PyArrow is needed to write Parquet files. Files are written without
+compression and with version 1 data pages to be readable by the parquet
+package used by validators.
+"""
+
+import datetime
+import sys
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+CLUSTER_ID = b"123e4567-e89b-12d3-a456-426614174000"
+RULE_ID = b"pods_check|POD_ISSUE"
+ARCHIVE_PATH = \
+    b"archives/compressed/12/123e4567-e89b-12d3-a456-426614174000/202102/08/002219.tar.gz"
+
+rows = 10
+cluster_ids = [CLUSTER_ID] * rows
+rule_ids = [RULE_ID] * rows
+archive_paths = [ARCHIVE_PATH] * rows
+collected_at = [datetime.datetime(2021, 2, 8, 0, 22, 19)] * rows
+
+# some rows contain invalid values
+cluster_ids[1] = b"not-an-uuid"
+rule_ids[5] = b"wrong rule"
+cluster_ids[9] = b"123e4567"
+archive_paths[9] = b"archives/compressed/12/123e4567/202102/08/002219.tar.gz"
+
+columns = {
+    "cluster_id": pa.array(cluster_ids, pa.binary()),
+    "rule_id": pa.array(rule_ids, pa.binary()),
+    "collected_at": pa.array(collected_at, pa.timestamp("ms")),
+    "archive_path": pa.array(archive_paths, pa.binary()),
+}
+
+# optional extra column that is not allowed by schema
+if len(sys.argv) > 2 and sys.argv[2] == "--extra-column":
+    columns["extra"] = pa.array([b"extra"] * rows, pa.binary())
+
+pq.write_table(pa.table(columns), sys.argv[1], row_group_size=4, compression="NONE",
+               use_dictionary=False, data_page_version="1.0", version="1.0")